@@ -0,0 +1,211 @@
+"""Benchmark suite for the employee_events query layer and the report.
+
+Each suite is a generator function registered with `@suite`. It receives a
+`Context` for one generated database and yields `(name, func)` pairs, where
+`func` is a zero-argument callable timed by `run`. Results are written as
+JSON and can be compared against a stored baseline to flag regressions.
+Timings are machine-specific: baseline.json is one full run on the machine
+recorded in its `meta`, only meaningful to compare against there.
+
+Run it from the repository root:
+
+    python -m benchmarks --size 25x365 --size 100x730
+    python -m benchmarks --compare benchmarks/baseline.json
+    python -m benchmarks --save-baseline
+"""
+import importlib.util
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+baseline_path = Path(__file__).resolve().parent / 'baseline.json'
+
+# Part of the cached database names. Bump it whenever the schema or the
+# data generated by src/build_project_assets.py changes, so databases
+# cached by an older version are not reused.
+generator_version = 2
+
+# Generated history ends here rather than today, so a cached database
+# holds the same events whichever day it was built
+generated_until = date(2024, 6, 30)
+
+for path in (project_root / 'report', project_root / 'python-package'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+def load_build_script():
+    """Import src/build_project_assets.py.
+
+    src/ is not put on sys.path because its utils.py would shadow the
+    report's utils module.
+    """
+    path = project_root / 'src' / 'build_project_assets.py'
+    spec = importlib.util.spec_from_file_location('build_project_assets', path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so its functions can be pickled to generator processes
+    sys.modules.setdefault('build_project_assets', module)
+    spec.loader.exec_module(module)
+    return module
+
+
+suites = []
+
+
+def suite(func):
+    """Register a benchmark suite generator."""
+    suites.append(func)
+    return func
+
+
+class Context:
+    """A generated database of a given size, shared by every suite."""
+
+    def __init__(self, data_dir, employees, days, seed=0):
+        """Initialize the context, generating the database if needed.
+
+        Databases are cached under a name holding `generator_version`,
+        the size and the seed, so a cached database is only reused for
+        the same data.
+
+        Args:
+            data_dir (Path): Directory that caches generated databases
+            employees (int): Number of employees
+            days (int): Days of event history
+            seed (int): Seed of the generated data
+        """
+        self.employees = employees
+        self.days = days
+        self.seed = seed
+        self.teams = max(1, employees // 5)
+        self.db_path = Path(data_dir) / (
+            f'employee_events_v{generator_version}_{employees}x{days}'
+            f'_seed{seed}.db')
+
+        if not self.db_path.is_file():
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Built next to its final name and renamed once complete, so
+            # an interrupted build is never mistaken for a cached one
+            partial = self.db_path.with_name(self.db_path.name + '.partial')
+            partial.unlink(missing_ok=True)
+            load_build_script().build(
+                db_path=partial, model_path=None, n_employees=employees,
+                n_teams=self.teams, days=days, seed=seed,
+                end=generated_until, workers=None,
+            )
+            partial.replace(self.db_path)
+
+    @property
+    def size(self):
+        return f'{self.employees}x{self.days}'
+
+    def models(self):
+        """Return an Employee and a Team bound to this context's database."""
+        from employee_events import Employee, Team
+
+        return [Employee(self.db_path), Team(self.db_path)]
+
+    def entity_id(self, model):
+        """Return an id in the middle of the table, so lookups are not edge cases."""
+        count = self.employees if model.name == 'employee' else self.teams
+        return max(1, count // 2)
+
+
+def measure(func, min_rounds=5, min_time=0.5):
+    """Time `func` after one warm-up call.
+
+    Runs at least `min_rounds` rounds and keeps going until `min_time`
+    seconds have been spent.
+
+    Returns:
+        dict: min, median, mean and stdev in seconds, and the round count
+    """
+    func()
+
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'rounds': len(timings),
+    }
+
+
+def run(contexts, pattern='', min_rounds=5, min_time=0.5, report=print):
+    """Run every registered suite against every context.
+
+    Args:
+        contexts (list[Context]): The databases to benchmark
+        pattern (str): Only run benchmarks whose name contains this
+        min_rounds (int): Minimum timed rounds per benchmark
+        min_time (float): Minimum seconds spent per benchmark
+        report (callable): Called with one line of progress per benchmark
+
+    Returns:
+        dict: Metadata and results keyed by "size/suite.name"
+    """
+    results = {}
+    for context in contexts:
+        for bench_suite in suites:
+            for name, func in bench_suite(context):
+                key = f'{context.size}/{bench_suite.__name__}.{name}'
+                if pattern not in key:
+                    continue
+                stats = measure(func, min_rounds, min_time)
+                results[key] = stats
+                report(f"{key:<60} {stats['median'] * 1000:>10.3f} ms")
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.25):
+    """Find benchmarks whose median got slower than the baseline.
+
+    Args:
+        current (dict): Output of `run`
+        baseline (dict): A previously saved output of `run`
+        threshold (float): Allowed slowdown, 0.25 means 25%
+
+    Returns:
+        list[tuple]: (name, baseline median, current median, ratio) for each regression
+    """
+    regressions = []
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or before['median'] == 0:
+            continue
+        ratio = stats['median'] / before['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, before['median'], stats['median'], ratio))
+    return regressions
+
+
+def save(results, path):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+
+
+def load(path):
+    return json.loads(Path(path).read_text())
+
+
+from . import bench_queries, bench_components, bench_connections  # noqa: E402,F401  (registers suites)
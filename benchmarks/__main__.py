@@ -0,0 +1,70 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from . import Context, baseline_path, compare, load, run, save
+
+
+def parse_size(value):
+    employees, _, days = value.partition('x')
+    return int(employees), int(days or 365)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Benchmark the query layer and report rendering")
+    parser.add_argument('--size', action='append', type=parse_size,
+                        metavar='EMPLOYEESxDAYS',
+                        help="database size to generate, repeatable "
+                             "(default: 25x365)")
+    parser.add_argument('--data-dir', type=Path,
+                        default=Path(tempfile.gettempdir())
+                        / 'employee_events_benchmarks',
+                        help="where generated databases are cached")
+    parser.add_argument('-k', '--filter', default='',
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument('--min-rounds', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="minimum seconds per benchmark")
+    parser.add_argument('--output', type=Path, help="write results as JSON")
+    parser.add_argument('--compare', type=Path, nargs='?',
+                        const=baseline_path,
+                        help="baseline JSON to compare against "
+                             "(default: benchmarks/baseline.json)")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown before a benchmark counts as "
+                             "a regression")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="overwrite benchmarks/baseline.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = args.size or [(25, 365)]
+
+    contexts = [Context(args.data_dir, employees, days)
+                for employees, days in sizes]
+    results = run(contexts, args.filter, args.min_rounds, args.min_time)
+
+    if args.output:
+        save(results, args.output)
+    if args.save_baseline:
+        save(results, baseline_path)
+
+    if args.compare:
+        regressions = compare(results, load(args.compare), args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> "
+                  f"{after * 1000:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%} "
+              f"against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
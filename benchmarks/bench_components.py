@@ -0,0 +1,64 @@
+from functools import partial
+
+from . import suite
+
+
+@suite
+def components(context):
+    """Each chart and table in the dashboard, rendered on its own."""
+    import dashboard
+    from base_components import MatplotlibViz, DataTable
+
+    component_classes = [
+        cls for cls in vars(dashboard).values()
+        if isinstance(cls, type)
+        and issubclass(cls, (MatplotlibViz, DataTable))
+        and cls not in (MatplotlibViz, DataTable)
+    ]
+
+    for model in context.models():
+        entity_id = context.entity_id(model)
+        for cls in component_classes:
+            yield f'{model.name}.{cls.__name__}', partial(cls(), entity_id, model)
+
+
+@suite
+def pages(context):
+    """Full report pages, rendered to HTML as the routes do."""
+    import dashboard
+    from fastcore.xml import to_xml
+
+    def render(entity_id, model):
+        return to_xml(dashboard.report(entity_id, model))
+
+    for model in context.models():
+        yield f'{model.name}.report', partial(render, context.entity_id(model), model)
+
+
+class PrefetchedEvents:
+    """Model stand-in returning event counts fetched once up front."""
+
+    def __init__(self, model, entity_id):
+        self.name = model.name
+        self.counts = model.event_counts(entity_id, cumulative=True)
+
+    def event_counts(self, id, **kwargs):
+        return self.counts
+
+
+@suite
+def line_chart(context):
+    """LineChart drawing time with and without downsampling.
+
+    The event counts are fetched once, so only downsampling and drawing
+    are timed. Run with growing histories (e.g. --size 25x365 --size
+    25x3650) to check that the downsampled render time stays flat.
+    """
+    from dashboard import LineChart
+
+    for model in context.models():
+        entity_id = context.entity_id(model)
+        prefetched = PrefetchedEvents(model, entity_id)
+        for downsample in ['lttb', 'minmax', None]:
+            chart = LineChart(window=None, downsample=downsample)
+            yield f'{model.name}.{downsample or "full"}', partial(chart, entity_id, prefetched)
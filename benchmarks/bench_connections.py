@@ -0,0 +1,53 @@
+"""Connection setup and concurrent report queries per connection profile.
+
+Times opening a connection, and the report queries one at a time and from
+several threads at once, through the default and the read-only, memory
+mapped connection profile. The queries go through the models, so they
+include getting a connection for every query. See readers.py for the same
+comparison across processes, including memory.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from employee_events import ConnectionFactory, Employee, ReadOnlyConnectionFactory, Team
+
+from . import suite
+
+profiles = {
+    'default': ConnectionFactory,
+    'read_only': ReadOnlyConnectionFactory,
+}
+
+
+def open_and_close(factory):
+    factory().close()
+
+
+def read_each(models, context):
+    """Run event_counts for one entity of every model."""
+    for model in models:
+        model.event_counts(context.entity_id(model))
+
+
+def read_concurrently(pool, models, context):
+    """Run event_counts for every entity of every model on `pool`."""
+    calls = [
+        (model, entity_id)
+        for model in models
+        for entity_id in range(1, (context.employees if model.name == 'employee' else context.teams) + 1)
+    ]
+    for _ in pool.map(lambda call: call[0].event_counts(call[1]), calls):
+        pass
+
+
+@suite
+def connections(context, readers=8):
+    """Connection setup and concurrent report queries per connection profile."""
+    with ThreadPoolExecutor(max_workers=readers) as pool:
+        for name, profile in profiles.items():
+            factory = profile(context.db_path)
+            models = [Employee(connection_factory=factory), Team(connection_factory=factory)]
+
+            yield f'{name}.connect', partial(open_and_close, factory)
+            yield f'{name}.event_counts', partial(read_each, models, context)
+            yield f'{name}.concurrent_event_counts', partial(read_concurrently, pool, models, context)
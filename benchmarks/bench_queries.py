@@ -0,0 +1,126 @@
+from functools import partial
+
+from employee_events import SnapshotEngine
+
+from . import suite
+
+
+@suite
+def queries(context):
+    """Every public QueryBase, Employee and Team query."""
+    for model in context.models():
+        entity_id = context.entity_id(model)
+
+        yield f'{model.name}.names', model.names
+        for method in ['username', 'model_data', 'event_counts', 'notes']:
+            yield (f'{model.name}.{method}',
+                   partial(getattr(model, method), entity_id))
+        yield (f'{model.name}.search_notes',
+               partial(model.search_notes, 'safety', result='tuples'))
+
+
+@suite
+def snapshot(context):
+    """The queries answered from the in-memory snapshot, after it is loaded."""
+    engine = SnapshotEngine(path=context.db_path, check_interval=float('inf'))
+    engine.current()
+
+    for model in context.models():
+        model.snapshot = engine
+        entity_id = context.entity_id(model)
+
+        for method in ['model_data', 'event_counts', 'notes']:
+            yield (f'{model.name}.{method}',
+                   partial(getattr(model, method), entity_id))
+        yield (f'{model.name}.event_counts_cumulative',
+               partial(model.event_counts, entity_id, cumulative=True))
+
+    yield 'load', engine.reload
+
+
+def predict(model, entity_id, predictor, result):
+    """model_data plus predict_proba, as BarChart does, in a result mode."""
+    import numpy as np
+
+    data = model.model_data(entity_id, result=result)
+    if result == 'array':
+        data = np.column_stack([data[name].astype(float)
+                                for name in predictor.feature_names_in_])
+    return predictor.predict_proba(data)
+
+
+@suite
+def results(context):
+    """Per-call cost of each result mode for the small queries."""
+    from employee_events import result_modes
+    from utils import load_model
+
+    predictor = load_model()
+
+    for model in context.models():
+        entity_id = context.entity_id(model)
+
+        for result in result_modes:
+            yield (f'{model.name}.model_data.{result}',
+                   partial(model.model_data, entity_id, result=result))
+            yield (f'{model.name}.notes.{result}',
+                   partial(model.notes, entity_id, result=result))
+        for result in ('frame', 'array'):
+            yield (f'{model.name}.predict.{result}',
+                   partial(predict, model, entity_id, predictor, result))
+
+
+def score_one_by_one(context, predictor):
+    """The risk of every employee and team, one predict call each.
+
+    This is what the dashboard does.
+    """
+    for model in context.models():
+        for _, entity_id in model.names():
+            predict(model, entity_id, predictor, 'array')
+
+
+@suite
+def export(context):
+    """Risk of every employee and team: bulk export against one at a time."""
+    from employee_events import ConnectionFactory
+    from risk_export import export_lines
+    from utils import load_model
+
+    predictor = load_model()
+    connection_factory = ConnectionFactory(context.db_path)
+
+    yield 'one_by_one', partial(score_one_by_one, context, predictor)
+    for format in ('csv', 'jsonl'):
+        def export_all(format=format):
+            lines = export_lines(predictor, format, connection_factory)
+            return sum(map(len, lines))
+        yield format, export_all
+
+
+@suite
+def shards(context):
+    """Routed and fanned-out queries over shards of 10 teams."""
+    from employee_events import Employee, ShardRouter, Team, split_database
+    from risk_export import export_lines
+    from utils import load_model
+
+    directory = context.db_path.with_name(f'{context.db_path.stem}_shards')
+    if not directory.is_dir():
+        split_database(context.db_path, directory, teams_per_shard=10)
+    router = ShardRouter.from_directory(directory)
+    predictor = load_model()
+
+    for model in (Employee(router=router), Team(router=router)):
+        entity_id = context.entity_id(model)
+
+        yield f'{model.name}.names', model.names
+        for method in ['model_data', 'event_counts']:
+            yield (f'{model.name}.{method}',
+                   partial(getattr(model, method), entity_id))
+        yield (f'{model.name}.search_notes',
+               partial(model.search_notes, 'safety', result='tuples'))
+
+    def export_csv():
+        return sum(map(len, export_lines(predictor, 'csv', router=router)))
+    yield 'export.csv', export_csv
@@ -0,0 +1,388 @@
+"""Load test the dashboard routes.
+
+Replays a seeded mix of requests to `/`, `/employee/{id}`, `/team/{id}`,
+`/update_dropdown` and `/update_data` from `concurrency` concurrent
+clients, then reports requests per second and p50/p95/p99 latency per
+route. A few entities get most of the traffic, like real users looking
+up their own team. The ids follow a Zipf distribution over a shuffled
+list of the database's ids.
+
+The dashboard serves a database generated like the benchmark suites'
+(`--size`), or an existing file (`--db`). Three modes are available:
+
+    in process   the FastHTML app is called through ASGI in this process
+    --server     server.py is started on a free localhost port
+    --url        an already running server is loaded
+
+The same size, seed and request count always replay the same requests,
+so runs can be compared across commits. The first `--warmup` requests
+fill the caches and are not measured.
+
+Usage:
+
+    python -m benchmarks.load                     # in process, 25x365
+    python -m benchmarks.load --size 1000x365 --server --workers 4
+    python -m benchmarks.load --url http://127.0.0.1:5001 \
+        --db python-package/employee_events/employee_events.db
+    python -m benchmarks.load --output load.json --compare before.json
+"""
+import argparse
+import asyncio
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import Context, load, project_root, save
+
+# Relative frequency of each route in the replayed traffic
+route_mix = {
+    'root': 2,
+    'employee': 55,
+    'team': 25,
+    'update_dropdown': 10,
+    'update_data': 8,
+}
+
+
+def entity_ids(db_path):
+    """Return the employee and team ids of a database."""
+    from employee_events import Employee, Team
+
+    return [
+        sorted(id for _, id in model(db_path).names())
+        for model in (Employee, Team)
+    ]
+
+
+def workload(employee_ids, team_ids, n_requests, seed=0, skew=1.1):
+    """Return `n_requests` requests following `route_mix`.
+
+    Args:
+        employee_ids (list[int]): Employee ids to request
+        team_ids (list[int]): Team ids to request
+        n_requests (int): Number of requests
+        seed (int): Seed of the random choices
+        skew (float): Zipf exponent of the id popularity, 0 for uniform
+
+    Returns:
+        list[tuple]: (route, method, path, form data or None) per request
+    """
+    rng = random.Random(seed)
+
+    popular = {}
+    for name, ids in (('employee', employee_ids), ('team', team_ids)):
+        ids = list(ids)
+        rng.shuffle(ids)
+        weights = [1 / rank ** skew for rank in range(1, len(ids) + 1)]
+        popular[name] = ids, weights
+
+    def pick(name):
+        ids, weights = popular[name]
+        return rng.choices(ids, weights)[0]
+
+    requests = []
+    routes = rng.choices(list(route_mix), list(route_mix.values()),
+                         k=n_requests)
+    for route in routes:
+        if route == 'root':
+            requests.append((route, 'GET', '/', None))
+        elif route in ('employee', 'team'):
+            requests.append((route, 'GET', f'/{route}/{pick(route)}', None))
+        elif route == 'update_dropdown':
+            profile_type = rng.choice(['Employee', 'Team'])
+            path = f'/update_dropdown?profile_type={profile_type}'
+            requests.append((route, 'GET', path, None))
+        else:
+            name = rng.choice(['employee', 'team'])
+            form = {
+                'profile_type': name.title(),
+                'user-selection': str(pick(name)),
+            }
+            requests.append((route, 'POST', '/update_data', form))
+    return requests
+
+
+async def replay(client, requests, concurrency=16):
+    """Send `requests` through `client` from `concurrency` clients at once.
+
+    Redirects are not followed, so `/update_data` is measured on its own.
+
+    Returns:
+        tuple: (route, seconds, status or None on a connection error) per
+            request, and the elapsed seconds
+    """
+    import httpx
+
+    pending = iter(requests)
+    samples = []
+
+    async def client_loop():
+        # Every loop takes the next request from the shared iterator
+        for route, method, path, form in pending:
+            # The dropdown is requested by htmx, which gets a partial page
+            headers = None
+            if route == 'update_dropdown':
+                headers = {'HX-Request': 'true'}
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, data=form,
+                                                headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            samples.append((route, time.perf_counter() - t0, status))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """Requests per second, latency percentiles and errors per route.
+
+    Returns:
+        dict: route name (and "all" for every route) -> requests, errors,
+            rps, p50, p95, p99
+    """
+    by_route = {route: [] for route in [*route_mix, 'all']}
+    for route, seconds, status in samples:
+        by_route[route].append((seconds, status))
+        by_route['all'].append((seconds, status))
+
+    stats = {}
+    for route, results in by_route.items():
+        if not results:
+            continue
+        latencies = sorted(seconds for seconds, _ in results)
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100,
+                                             method='inclusive')
+        else:
+            quantiles = latencies * 99 or [0.0] * 99
+        stats[route] = {
+            'requests': len(results),
+            'errors': sum(status is None or status >= 400
+                          for _, status in results),
+            'rps': len(results) / elapsed if elapsed else 0.0,
+            'p50': quantiles[49],
+            'p95': quantiles[94],
+            'p99': quantiles[98],
+        }
+    return stats
+
+
+def in_process_client(db_path):
+    """An httpx client calling the dashboard app in this process."""
+    import httpx
+
+    os.environ['DASHBOARD_DB'] = str(db_path)
+    import dashboard
+
+    served = dashboard.connection_factory.path
+    if Path(served) != Path(db_path):
+        raise RuntimeError(
+            f"dashboard was already imported serving {served}")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=dashboard.app),
+                             base_url='http://dashboard', timeout=60)
+
+
+@contextmanager
+def start_server(db_path, workers=None, threads=8):
+    """Run server.py on a free localhost port serving `db_path`.
+
+    Yields:
+        str: The server's base URL
+    """
+    env = dict(os.environ, DASHBOARD_DB=str(db_path))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [
+        str(project_root / 'python-package'), env.get('PYTHONPATH'),
+    ]))
+    command = [sys.executable, 'server.py', '--port', '0',
+               '--threads', str(threads)]
+    if workers:
+        command += ['--workers', str(workers)]
+    proc = subprocess.Popen(command, cwd=project_root / 'report', env=env,
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        # Warm-up output may come first
+        for line in proc.stdout:
+            match = re.search(r'Serving on (http://[\d.]+:\d+)', line)
+            if match:
+                break
+        else:
+            raise RuntimeError(
+                f"server.py exited with {proc.wait()} before serving")
+        yield match.group(1)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+async def load_test(client, requests, concurrency=16, warmup=0):
+    """Replay `warmup` unmeasured requests, then measure the rest."""
+    await replay(client, requests[:warmup], concurrency)
+    samples, elapsed = await replay(client, requests[warmup:], concurrency)
+    return summarize(samples, elapsed)
+
+
+def run(args):
+    """Run the load test described by the command line arguments.
+
+    Returns:
+        dict: Metadata, the configuration and the stats per route
+    """
+    import httpx
+
+    if args.db:
+        db_path = args.db
+    else:
+        employees, _, days = args.size.partition('x')
+        context = Context(args.data_dir, int(employees), int(days or 365))
+        db_path = context.db_path
+
+    requests = workload(*entity_ids(db_path), args.requests + args.warmup,
+                        args.seed, args.skew)
+
+    async def against(url=None):
+        if url is None:
+            client = in_process_client(db_path)
+        else:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            client = httpx.AsyncClient(base_url=url, timeout=60,
+                                       limits=limits)
+        async with client:
+            return await load_test(client, requests, args.concurrency,
+                                   args.warmup)
+
+    if args.url:
+        mode, routes = 'url', asyncio.run(against(args.url))
+    elif args.server:
+        with start_server(db_path, args.workers, args.threads) as url:
+            mode, routes = 'server', asyncio.run(against(url))
+    else:
+        mode, routes = 'in_process', asyncio.run(against())
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'config': {
+            'mode': mode,
+            'database': args.db and str(args.db) or args.size,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'skew': args.skew,
+        },
+        'routes': routes,
+    }
+
+
+def compare(current, baseline, threshold=0.25):
+    """Find routes whose p50 or p95 latency grew by more than `threshold`.
+
+    Returns:
+        list[tuple]: (route, percentile, baseline seconds, current seconds,
+            ratio)
+    """
+    regressions = []
+    for route, stats in current['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+        for percentile in ('p50', 'p95'):
+            if not before[percentile]:
+                continue
+            ratio = stats[percentile] / before[percentile]
+            if ratio > 1 + threshold:
+                regressions.append((route, percentile, before[percentile],
+                                    stats[percentile], ratio))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.load',
+        description="Load test the dashboard routes")
+    parser.add_argument('--size', default='25x365', metavar='EMPLOYEESxDAYS',
+                        help="database size to generate")
+    parser.add_argument('--db', type=Path,
+                        help="serve this database instead of a generated one")
+    parser.add_argument('--data-dir', type=Path,
+                        default=Path(tempfile.gettempdir())
+                        / 'employee_events_benchmarks',
+                        help="where generated databases are cached")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--server', action='store_true',
+                      help="start server.py on localhost instead of in "
+                           "process")
+    mode.add_argument('--url', help="load a running server at this URL")
+    parser.add_argument('--workers', type=int, help="server.py workers")
+    parser.add_argument('--threads', type=int, default=8,
+                        help="server.py threads per worker")
+    parser.add_argument('--requests', type=int, default=1000,
+                        help="measured requests")
+    parser.add_argument('--warmup', type=int, default=100,
+                        help="unmeasured requests sent first")
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help="concurrent clients")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help="Zipf exponent of entity popularity, 0 for "
+                             "uniform")
+    parser.add_argument('--output', type=Path, help="write results as JSON")
+    parser.add_argument('--compare', type=Path,
+                        help="results JSON of an earlier run to compare "
+                             "against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed latency increase before a route "
+                             "counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+
+    print(f"{'route':<16} {'requests':>8} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in results['routes'].items():
+        print(f"{route:<16} {stats['requests']:>8} {stats['errors']:>6} "
+              f"{stats['rps']:>8.1f} {stats['p50'] * 1000:>8.1f} "
+              f"{stats['p95'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f}")
+
+    if args.output:
+        save(results, args.output)
+
+    if args.compare:
+        baseline = load(args.compare)
+        # Runs in process and against a server may be compared
+        config = baseline.get('config', {})
+        if config | {'mode': None} != results['config'] | {'mode': None}:
+            print(f"Note: {args.compare} was recorded with a different "
+                  f"configuration: {config}")
+        regressions = compare(results, baseline, args.threshold)
+        for route, percentile, before, after, ratio in regressions:
+            print(f"REGRESSION {route} {percentile}: {before * 1000:.1f} ms "
+                  f"-> {after * 1000:.1f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%} "
+              f"against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
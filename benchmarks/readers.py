@@ -0,0 +1,146 @@
+"""Compare connection profiles across concurrent reader processes.
+
+Starts reader processes per connection profile, like the workers of
+server.py. Every reader replays the employee and team event_counts queries
+for random ids, taking a connection for each query from the profile's
+`connection()` like QueryMixin does: the default profile opens one per
+query, the read-only profile reuses one per thread. Latency percentiles
+include getting the connection. Throughput and memory growth per reader
+are reported too:
+
+    python -m benchmarks.readers --readers 8 --queries 500
+
+RssAnon is memory private to a reader, which is where each connection's
+page cache lives. RssFile is file-backed memory, which is where memory
+mapped pages are counted; those pages are shared by every reader through
+the OS page cache.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from employee_events import add_query_listener, remove_query_listener
+
+from . import Context
+from .bench_connections import profiles
+
+
+def capture_queries(context):
+    """Return the SQL of the employee and team event_counts queries.
+
+    Returns:
+        list[tuple]: (sql, number of entities) per query, with the entity
+            id as the only parameter
+    """
+    events = []
+    add_query_listener(events.append)
+    try:
+        for model in context.models():
+            model.event_counts(context.entity_id(model))
+    finally:
+        remove_query_listener(events.append)
+
+    counts = [context.employees, context.teams]
+    return [(event.sql, count) for event, count in zip(events, counts)]
+
+
+def memory():
+    """Return this process's RssAnon and RssFile in bytes.
+
+    Falls back to the peak RSS, reported as RssAnon, where /proc is not
+    available.
+    """
+    usage = {'RssAnon': 0, 'RssFile': 0}
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                key, _, value = line.partition(':')
+                if key in usage:
+                    usage[key] = int(value.split()[0]) * 1024
+    except OSError:
+        usage['RssAnon'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return usage
+
+
+def reader(factory, queries, n_queries, seed, start_at):
+    """Replay `queries` through `factory` and return latencies and memory."""
+    rng = random.Random(seed)
+    before = memory()
+    # Start together so the readers actually overlap
+    time.sleep(max(0.0, start_at - time.time()))
+
+    latencies = []
+    for _ in range(n_queries):
+        sql, count = rng.choice(queries)
+        t0 = time.perf_counter()
+        with factory.connection() as conn:
+            conn.execute(sql, (rng.randint(1, count),)).fetchall()
+        latencies.append(time.perf_counter() - t0)
+    after = memory()
+
+    return latencies, {key: after[key] - before[key] for key in after}
+
+
+def compare_profiles(context, readers=8, n_queries=500):
+    """Run `readers` reader processes per profile.
+
+    Returns:
+        dict: Latency percentiles, throughput and mean memory growth per profile
+    """
+    queries = capture_queries(context)
+    mp = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+
+    results = {}
+    for name, profile in profiles.items():
+        factory = profile(context.db_path)
+        start_at = time.time() + 0.5
+        with mp.Pool(readers) as pool:
+            runs = pool.starmap(reader, [
+                (factory, queries, n_queries, seed, start_at) for seed in range(readers)
+            ])
+            elapsed = time.time() - start_at
+
+        latencies = sorted(latency for run, _ in runs for latency in run)
+        quantiles = statistics.quantiles(latencies, n=100)
+        results[name] = {
+            'p50': quantiles[49],
+            'p95': quantiles[94],
+            'p99': quantiles[98],
+            'queries_per_second': len(latencies) / elapsed,
+            'rss_anon': statistics.mean(usage['RssAnon'] for _, usage in runs),
+            'rss_file': statistics.mean(usage['RssFile'] for _, usage in runs),
+        }
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.readers',
+                                     description="Compare connection profiles under concurrent reader processes")
+    parser.add_argument('--size', default='25x365', metavar='EMPLOYEESxDAYS')
+    parser.add_argument('--data-dir', type=Path, default=Path(tempfile.gettempdir()) / 'employee_events_benchmarks')
+    parser.add_argument('--readers', type=int, default=8, help="concurrent reader processes")
+    parser.add_argument('--queries', type=int, default=500, help="queries per reader")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    employees, _, days = args.size.partition('x')
+    context = Context(args.data_dir, int(employees), int(days or 365))
+
+    results = compare_profiles(context, args.readers, args.queries)
+
+    print(f"{'profile':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/s':>9} {'RssAnon MiB':>12} {'RssFile MiB':>12}")
+    for name, stats in results.items():
+        print(f"{name:<10} {stats['p50'] * 1000:>8.3f} {stats['p95'] * 1000:>8.3f} {stats['p99'] * 1000:>8.3f} "
+              f"{stats['queries_per_second']:>9.0f} {stats['rss_anon'] / 2**20:>12.2f} {stats['rss_file'] / 2**20:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
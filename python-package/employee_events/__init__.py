@@ -1,4 +1,11 @@
 from .employee import Employee
 from .team import Team
 from .query_base import QueryBase
-from .sql_execution import *
\ No newline at end of file
+from .sql_execution import *
+from .timelines import create_team_timelines
+from .search import add_note_ids, create_notes_index
+from .indexes import create_indexes
+from .ingest import EventWriter, enable_wal
+from .snapshot import Snapshot, SnapshotEngine
+from .shards import ShardRouter, build_shard, split_database
+from .results import Record, record_type, result_modes
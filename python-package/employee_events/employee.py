@@ -1,12 +1,12 @@
+from __future__ import annotations
+
 # Import the QueryBase class
-from query_base import QueryBase  # Assuming the previous code is in query_base.py
+from .query_base import QueryBase, routed
 
-# Import dependencies needed for sql execution
-from sql_execution import execute_sql  # Hypothetical module for SQL execution
+from typing import TYPE_CHECKING, Iterator, List, Tuple
 
-import pandas as pd
-import sqlite3
-from typing import List, Tuple
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Employee(QueryBase):
@@ -23,21 +23,19 @@ class Employee(QueryBase):
         Returns:
             List[Tuple[str, int]]: List of tuples containing employee full name and ID
         """
+        if self.router is not None:
+            return [row for rows in self.fan_out("names") for row in rows]
+
         # Query 3
         query = """
-            SELECT full_name, employee_id
+            SELECT first_name || ' ' || last_name AS full_name
+                 , employee_id
             FROM employee
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Assuming execute_sql returns a list of tuples
-                result = execute_sql(conn, query)
-            return result
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+        return self.query(query)
 
+    @routed
     def username(self, id: int) -> List[Tuple[str]]:
         """Retrieve full name for a specific employee ID.
 
@@ -49,42 +47,72 @@ class Employee(QueryBase):
         """
         # Query 4
         query = f"""
-            SELECT full_name
+            SELECT first_name || ' ' || last_name AS full_name
             FROM {self.name}
-            WHERE employee_id = {id}
+            WHERE employee_id = ?
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Assuming execute_sql returns a list of tuples
-                result = execute_sql(conn, query)
-            return result
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+        return self.query(query, (id,))
 
-    def model_data(self, id: int) -> pd.DataFrame:
+    @routed
+    def model_data(self, id: int, result: str = "frame") -> pd.DataFrame:
         """Retrieve aggregated event data for machine learning model.
 
         Args:
             id (int): The employee ID to filter by
+            result (str): Result mode, see results.py
 
         Returns:
             pd.DataFrame: DataFrame containing positive and negative event sums
         """
+        if self.snapshot is not None:
+            return self.snapshot.model_data(self.name, id, result)
+
         query = f"""
             SELECT SUM(positive_events) positive_events
                  , SUM(negative_events) negative_events
             FROM {self.name}
             JOIN employee_events
                 USING(employee_id)
-            WHERE {self.name}.employee_id = {id}
+            WHERE {self.name}.employee_id = ?
+        """
+
+        return self.fetch(query, (id,), result)
+
+    def all_model_data(self, size: int = 10000, result: str = "array") -> Iterator:
+        """Stream the model_data event sums of every employee.
+
+        One aggregate query over employee_events, ordered by team, so all
+        members of a team arrive one after another. Employees without
+        events are included with sums of 0. Sharded layouts run it on
+        every shard in parallel and yield the shards in team order.
+
+        Args:
+            size (int): Employees per chunk
+            result (str): Result mode, see results.py
+
+        Yields:
+            Chunks with team_id, team_name, employee_id, full_name,
+            positive_events and negative_events columns
+        """
+        if self.router is not None:
+            yield from self.router.chain(lambda factory: self.on_shard(factory).all_model_data(size, result))
+            return
+
+        query = f"""
+            SELECT {self.name}.team_id
+                 , team.team_name
+                 , employee_id
+                 , first_name || ' ' || last_name AS full_name
+                 , COALESCE(SUM(positive_events), 0) positive_events
+                 , COALESCE(SUM(negative_events), 0) negative_events
+            FROM {self.name}
+            LEFT JOIN employee_events
+                USING(employee_id)
+            LEFT JOIN team
+                ON team.team_id = {self.name}.team_id
+            GROUP BY {self.name}.team_id, employee_id
+            ORDER BY {self.name}.team_id, employee_id
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(query, conn)
-            return df
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return pd.DataFrame()
+        yield from self.fetch_chunks(query, (), size, result)
@@ -0,0 +1,49 @@
+"""Indexes behind the id lookups of Employee and Team queries.
+
+pandas' `to_sql` only indexes the dataframe index column, so without
+these every query about one employee or team scans its tables, or makes
+SQLite build an automatic index on every call. With them:
+
+- `employee` and `team` are searched by their unique ids. SQLite then
+  knows a join to them yields at most one row, so rows keep the order of
+  the index they are read through.
+- `employee_events` is read by (employee_id, event_date), so an
+  employee's daily events come in date order without a sort, and by
+  (team_id, employee_id), so a team's events come grouped by member.
+- `notes` are read by (employee_id, note_date) and (team_id, note_date),
+  already in date order.
+- `employee` is also read by (team_id, employee_id), which orders the
+  bulk `all_model_data` query by team without a sort.
+
+tests/test_query_plans.py checks the query plans of every query against
+a generated database, so a query change that stops using an index fails
+the tests.
+
+Like the team timelines, tools that replace a table wholesale, such as
+pandas' `to_sql(if_exists='replace')`, drop its indexes with it and must
+call `create_indexes` again afterwards.
+"""
+import sqlite3
+
+index_schema = """
+CREATE UNIQUE INDEX IF NOT EXISTS employee_id ON employee (employee_id);
+CREATE INDEX IF NOT EXISTS employee_team ON employee (team_id, employee_id);
+CREATE UNIQUE INDEX IF NOT EXISTS team_id ON team (team_id);
+CREATE INDEX IF NOT EXISTS employee_events_employee ON employee_events (employee_id, event_date);
+CREATE INDEX IF NOT EXISTS employee_events_team ON employee_events (team_id, employee_id);
+CREATE INDEX IF NOT EXISTS notes_employee ON notes (employee_id, note_date);
+CREATE INDEX IF NOT EXISTS notes_team ON notes (team_id, note_date);
+"""
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    """Create the indexes used by Employee and Team queries.
+
+    Args:
+        conn (sqlite3.Connection): A writable connection to the database
+
+    Raises:
+        sqlite3.IntegrityError: If two employees or two teams share an id
+    """
+    with conn:
+        conn.executescript(index_schema)
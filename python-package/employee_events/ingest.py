@@ -0,0 +1,162 @@
+"""Live ingestion of employee events next to a serving dashboard.
+
+SQLite's default rollback journal locks readers out while a write
+commits. `EventWriter` switches the database to WAL mode, where writers
+append to a separate log and readers keep reading the last committed
+snapshot, so dashboard queries never wait on ingestion.
+
+WAL allows many readers but a single writer at a time. An EventWriter
+serializes the writes made through it, and writes from other processes
+wait up to its busy timeout for their turn.
+
+Committed pages are copied from the log back into the database by
+checkpoints. SQLite runs a PASSIVE checkpoint, which never blocks
+readers, whenever the log grows past `checkpoint_pages` pages. Call
+`checkpoint("TRUNCATE")` in a quiet period, or close the writer, to
+also shrink the log file back to zero bytes.
+
+WAL mode is persistent and needs a writable directory for the -wal and
+-shm files, so it is only enabled on databases a writer is attached to.
+The writer has no default path, so it is never attached to the packaged,
+read-only database by accident; that one keeps the rollback journal.
+
+Notes are given an explicit `note_id` key before anything is written,
+see `search.add_note_ids`; appended notes get the next free id.
+
+Usage:
+
+    with EventWriter("employee_events.db") as writer:
+        writer.append_events([
+            ("2024-01-02", 1, 1, 3, 0),   # event_date, employee_id, team_id, positive, negative
+        ])
+        writer.append_notes([(1, 1, "Led the safety drill", "2024-01-02")])
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from sqlite3 import connect
+from typing import Iterable
+
+from .search import add_note_ids, create_notes_index
+
+event_columns = ("event_date", "employee_id", "team_id", "positive_events", "negative_events")
+
+note_columns = ("employee_id", "team_id", "note", "note_date")
+
+checkpoint_modes = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def enable_wal(conn: sqlite3.Connection) -> None:
+    """Switch the database behind `conn` to WAL mode.
+
+    Raises:
+        sqlite3.OperationalError: If SQLite cannot use WAL for this
+            database, e.g. an in-memory database
+    """
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        raise sqlite3.OperationalError(f"Could not enable WAL mode, journal_mode is {mode}")
+
+
+class EventWriter:
+    """The single writer appending employee events to a WAL database."""
+
+    def __init__(self, path, timeout=5.0, checkpoint_pages=1000):
+        """Open the write connection and enable WAL mode.
+
+        Args:
+            path (str | Path): Path to the SQLite database file
+            timeout (float): Seconds to wait for another writer or a checkpoint
+            checkpoint_pages (int): Log size in pages that triggers a PASSIVE checkpoint
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # Transactions are managed explicitly, see `append_events`
+        self.conn = connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        enable_wal(self.conn)
+        # NORMAL only syncs at checkpoints in WAL mode. A power loss can
+        # drop the last commits but never corrupts the database.
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(f"PRAGMA wal_autocheckpoint = {int(checkpoint_pages)}")
+        if add_note_ids(self.conn):
+            create_notes_index(self.conn)
+
+    def append_events(self, rows: Iterable[tuple]) -> int:
+        """Insert event rows in one transaction.
+
+        The team timeline triggers update team_daily_events in the same
+        transaction, so readers see both or neither.
+
+        Args:
+            rows (Iterable[tuple]): Values in the order of `event_columns`
+
+        Returns:
+            int: Number of rows inserted
+        """
+        return self._insert("employee_events", event_columns, rows)
+
+    def append_notes(self, rows: Iterable[tuple]) -> int:
+        """Insert note rows in one transaction.
+
+        The notes search triggers index the new notes in the same
+        transaction (see search.py).
+
+        Args:
+            rows (Iterable[tuple]): Values in the order of `note_columns`
+
+        Returns:
+            int: Number of rows inserted
+        """
+        return self._insert("notes", note_columns, rows)
+
+    def _insert(self, table: str, columns: tuple, rows: Iterable[tuple]) -> int:
+        placeholders = ", ".join("?" for _ in columns)
+        columns = ", ".join(columns)
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so a concurrent
+            # writer waits for the busy timeout instead of failing on
+            # commit
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.executemany(
+                    f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def checkpoint(self, mode: str = "PASSIVE") -> tuple[int, int, int]:
+        """Copy committed pages from the log into the database.
+
+        PASSIVE never waits. FULL and RESTART wait for the busy timeout
+        for readers of old snapshots to finish, TRUNCATE also resets the
+        log file to zero bytes.
+
+        Args:
+            mode (str): One of `checkpoint_modes`
+
+        Returns:
+            tuple[int, int, int]: Whether the checkpoint was blocked (1) or
+                not (0), pages in the log and pages checkpointed
+        """
+        mode = mode.upper()
+        if mode not in checkpoint_modes:
+            raise ValueError(f"Unknown checkpoint mode {mode!r}, expected one of {checkpoint_modes}")
+        with self.lock:
+            return self.conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+    def close(self) -> None:
+        """Checkpoint and truncate the log, then close the connection."""
+        try:
+            self.checkpoint("TRUNCATE")
+        finally:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
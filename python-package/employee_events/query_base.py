@@ -1,24 +1,119 @@
-import pandas as pd
-import sqlite3
-from typing import List
-from abc import ABC, abstractmethod
+from __future__ import annotations
 
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from abc import ABC
+from functools import wraps
 
-class QueryBase(ABC):
+from .sql_execution import QueryMixin, ConnectionFactory, db_path
+from .results import check_result_mode, from_rows
+from .search import match_expression, notes_index_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .shards import ShardRouter
+    from .snapshot import SnapshotEngine
+
+# SQL expressions mapping a date to the first date of its bucket
+event_buckets = {
+    "day": "{}",
+    "week": "date({}, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', {})",
+}
+
+# Columns returned by `QueryBase.search_notes`
+search_columns = ("employee_id", "full_name", "team_id", "team_name", "note_date", "snippet", "rank")
+
+
+def routed(method):
+    """Run a query about one id on the shard holding that id.
+
+    Models without a router run the query unchanged.
+    """
+    @wraps(method)
+    def route(self, id, *args, **kwargs):
+        if self.router is not None:
+            self = self.shard_model(id)
+        return method(self, id, *args, **kwargs)
+    return route
+
+
+class QueryBase(QueryMixin, ABC):
     """Base class for querying employee_events database tables.
 
     This abstract base class provides common methods for querying
-    employee-related event data from different tables.
+    employee-related event data from different tables. Subclasses set
+    `name` to their table, whose primary key is `{name}_id`.
+
+    Given a `router`, the model reads a sharded layout (see shards.py):
+    queries about one id run on its shard, queries about every id run on
+    every shard.
     """
     name: str = ""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str = db_path, connection_factory: ConnectionFactory = None,
+                 snapshot: SnapshotEngine = None, router: ShardRouter = None):
         """Initialize QueryBase with database connection path.
 
         Args:
             db_path (str): Path to the SQLite database file
+            connection_factory (ConnectionFactory): Optional shared factory;
+                takes precedence over `db_path`
+            snapshot (SnapshotEngine): Optional in-memory snapshot answering
+                `event_counts`, `last_event_date`, `model_data` and `notes`
+                without SQL
+            router (ShardRouter): Optional router to the shards of a
+                sharded layout; takes precedence over `connection_factory`
+                and `db_path`
+        """
+        if router is not None and snapshot is not None:
+            raise ValueError("Snapshots of sharded layouts are not supported")
+        self.router = router
+        if router is None:
+            self.connection_factory = connection_factory or ConnectionFactory(db_path)
+            self.db_path = self.connection_factory.path
+        else:
+            # Every query goes to a shard's model, so a query that forgot
+            # to route fails instead of reading a single shard
+            self.connection_factory = None
+            self.db_path = None
+        self.snapshot = snapshot
+
+    def on_shard(self, connection_factory: ConnectionFactory) -> QueryBase:
+        """This model reading a single shard."""
+        return type(self)(connection_factory=connection_factory)
+
+    def shard_model(self, id: int) -> QueryBase:
+        """This model reading the shard holding `id`.
+
+        Unknown ids read the first shard, which answers with the same
+        empty results as an unsharded database.
+        """
+        return self.on_shard(self.router.shard(self.name, id) or self.router.factories[0])
+
+    def fan_out(self, method: str, *args, **kwargs) -> list:
+        """Call `method` on every shard in parallel.
+
+        Returns:
+            list: Each shard's result, in shard order
         """
-        self.db_path = db_path
+        return self.router.map(lambda factory: getattr(self.on_shard(factory), method)(*args, **kwargs))
+
+    @property
+    def id_column(self) -> str:
+        """Name of the id column for this table."""
+        return f"{self.name}_id"
+
+    def event_source(self) -> Tuple[str, str]:
+        """Where `event_counts` reads daily events from.
+
+        Returns:
+            Tuple[str, str]: The FROM clause, and the column compared
+                against the requested id
+        """
+        return (
+            f"{self.name} JOIN employee_events USING({self.id_column})",
+            f"{self.name}.{self.id_column}",
+        )
 
     def names(self) -> List[str]:
         """Return a list of names from the table.
@@ -28,82 +123,237 @@ class QueryBase(ABC):
         """
         return []
 
-    def event_counts(self, id: int) -> pd.DataFrame:
+    @routed
+    def event_counts(self, id: int, start: str = None, end: str = None,
+                     bucket: str = "day", cumulative: bool = False,
+                     result: str = "frame") -> pd.DataFrame:
         """Query event counts grouped by date for a specific ID.
 
         Args:
             id (int): The ID to filter events
+            start (str): Optional first date (YYYY-MM-DD) to return
+            end (str): Optional last date (YYYY-MM-DD) to return
+            bucket (str): Group dates by "day", "week" (starting Monday)
+                or "month"
+            cumulative (bool): Return running totals since the first
+                event instead of per-bucket counts. Totals are computed
+                in SQL, so only the requested buckets are returned.
+            result (str): Result mode, see results.py
 
         Returns:
-            pd.DataFrame: DataFrame containing event dates and counts
+            pd.DataFrame: DataFrame containing event dates and counts.
+                `event_date` holds the first date of each bucket.
         """
+        check_result_mode(result)
+        if bucket not in event_buckets:
+            raise ValueError(f"bucket must be one of {sorted(event_buckets)}, not {bucket!r}")
+        if self.snapshot is not None:
+            return self.snapshot.event_counts(self.name, id, start=start, end=end,
+                                              bucket=bucket, cumulative=cumulative,
+                                              result=result)
+        bucket_of = event_buckets[bucket]
+        source, id_column = self.event_source()
+
+        conditions = [f"{id_column} = ?"]
+        params = [id]
+        if end is not None:
+            conditions.append("event_date <= ?")
+            params.append(str(end))
+
+        if not cumulative:
+            if start is not None:
+                conditions.append("event_date >= ?")
+                params.append(str(start))
+
+            query = f"""
+                SELECT
+                    {bucket_of.format('event_date')} AS event_date,
+                    SUM(positive_events) AS positive_events,
+                    SUM(negative_events) AS negative_events
+                FROM {source}
+                WHERE {' AND '.join(conditions)}
+                GROUP BY 1
+                ORDER BY 1
+            """
+            return self.fetch(query, tuple(params), result)
+
+        # Running totals need every earlier event, so only the end of the
+        # range limits the scan. The start is applied to the totals.
+        outer = ""
+        if start is not None:
+            outer = f"WHERE event_date >= {bucket_of.format('?')}"
+            params.append(str(start))
+
         query = f"""
-            SELECT 
-                event_date,
-                SUM(CASE WHEN event_type = 'positive' THEN 1 ELSE 0 END) as positive_events,
-                SUM(CASE WHEN event_type = 'negative' THEN 1 ELSE 0 END) as negative_events
-            FROM {self.name}
-            WHERE employee_id = {id}
-            GROUP BY event_date
+            SELECT event_date, positive_events, negative_events FROM (
+                SELECT
+                    {bucket_of.format('event_date')} AS event_date,
+                    SUM(SUM(positive_events)) OVER running AS positive_events,
+                    SUM(SUM(negative_events)) OVER running AS negative_events
+                FROM {source}
+                WHERE {' AND '.join(conditions)}
+                GROUP BY 1
+                WINDOW running AS (ORDER BY {bucket_of.format('event_date')})
+            )
+            {outer}
             ORDER BY event_date
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(query, conn)
-            return df
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return pd.DataFrame()
+        return self.fetch(query, tuple(params), result)
+
+    @routed
+    def last_event_date(self, id: int) -> Optional[str]:
+        """Date of the last event of a specific ID.
+
+        Args:
+            id (int): The ID to filter events
+
+        Returns:
+            Optional[str]: The date (YYYY-MM-DD), None if there are no
+                events
+        """
+        if self.snapshot is not None:
+            return self.snapshot.last_event_date(self.name, id)
+
+        source, id_column = self.event_source()
 
-    def notes(self, id: int) -> pd.DataFrame:
+        query = f"""
+            SELECT MAX(event_date)
+            FROM {source}
+            WHERE {id_column} = ?
+        """
+
+        return self.query(query, (id,))[0][0]
+
+    @routed
+    def notes(self, id: int, result: str = "frame") -> pd.DataFrame:
         """Query notes for a specific ID.
 
         Args:
             id (int): The ID to filter notes
+            result (str): Result mode, see results.py
 
         Returns:
             pd.DataFrame: DataFrame containing note dates and notes
         """
+        if self.snapshot is not None:
+            return self.snapshot.notes(self.name, id, result)
+
         query = f"""
-            SELECT 
+            SELECT
                 note_date,
                 note
             FROM notes
-            WHERE employee_id = {id}
-            AND table_name = '{self.name}'
+            JOIN {self.name}
+                USING({self.id_column})
+            WHERE {self.name}.{self.id_column} = ?
             ORDER BY note_date
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(query, conn)
-            return df
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return pd.DataFrame()
+        return self.fetch(query, (id,), result)
 
+    def search_notes(self, query: str, scope: int = None, limit: int = 20, offset: int = 0,
+                     highlight: Tuple[str, str] = ("[", "]"), result: str = "frame") -> pd.DataFrame:
+        """Search the text of every note, best matches first.
 
-# Example implementation of a derived class
-class EmployeeEvents(QueryBase):
-    """Concrete class for querying employee events."""
-    name = "employee_events"
+        Uses the `notes_fts` full-text index (see search.py). Databases
+        built before it existed are searched with a slower LIKE scan,
+        newest notes first.
 
-    def names(self) -> List[str]:
-        """Return a list of employee names.
+        Sharded layouts search every shard and merge the best matches of
+        each. Ranks are computed per shard, from that shard's word
+        frequencies.
+
+        Args:
+            query (str): Words every returned note contains, see
+                `search.match_expression`
+            scope (int): Optional ID of this table to limit the search
+                to, e.g. one team's notes; None searches every note
+            limit (int): Maximum number of notes to return
+            offset (int): Number of best matches to skip, for paging
+            highlight (Tuple[str, str]): Inserted before and after every
+                matched word in the snippets
+            result (str): Result mode, see results.py
 
         Returns:
-            List[str]: List of employee names from the table
+            pd.DataFrame: employee_id, full_name, team_id, team_name,
+                note_date, the snippet of the note around the matches and
+                its rank, lower is better
         """
-        query = f"""
-            SELECT DISTINCT employee_name
-            FROM {self.name}
+        check_result_mode(result)
+        expression = match_expression(query)
+        if not expression:
+            return from_rows([], search_columns, result)
+
+        if self.router is not None:
+            if scope is not None:
+                return self.shard_model(scope).search_notes(query, scope, limit, offset, highlight, result)
+            rows = [row for rows in self.fan_out("search_notes", query, None, limit + offset, 0, highlight, "tuples")
+                    for row in rows]
+            # Newest first within a rank, as in the SQL below
+            rows.sort(key=lambda row: row[4], reverse=True)
+            rows.sort(key=lambda row: row[6])
+            return from_rows(rows[offset:offset + limit], search_columns, result)
+
+        conditions, params = [], []
+        # Matched notes are joined back by `note_id` from the index, or by
+        # rowid in the fallback scan below, where notes may have no ids
+        key = "note_id"
+        if self.connection_factory.has_table(notes_index_table):
+            # Rank and page inside the index, so only the returned notes
+            # are joined with their employee and team
+            conditions.append(f"{notes_index_table} MATCH ?")
+            params.extend([*highlight, expression])
+            if scope is not None:
+                conditions.append(f"rowid IN (SELECT note_id FROM notes WHERE {self.id_column} = ?)")
+                params.append(scope)
+            matches = f"""
+                SELECT rowid AS note_id
+                     , snippet({notes_index_table}, 0, ?, ?, '...', 16) AS snippet
+                     , rank
+                FROM {notes_index_table}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            """
+        else:
+            key = "rowid"
+            for word in query.split():
+                word = word.rstrip("*")
+                if word:
+                    conditions.append("note LIKE ? ESCAPE '\\'")
+                    params.append("%{}%".format(
+                        word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                    ))
+            if scope is not None:
+                conditions.append(f"{self.id_column} = ?")
+                params.append(scope)
+            matches = f"""
+                SELECT rowid AS note_id
+                     , note AS snippet
+                     , 0.0 AS rank
+                FROM notes
+                WHERE {' AND '.join(conditions)}
+                ORDER BY note_date DESC
+                LIMIT ? OFFSET ?
+            """
+
+        sql = f"""
+            SELECT notes.employee_id
+                 , first_name || ' ' || last_name AS full_name
+                 , notes.team_id
+                 , team_name
+                 , notes.note_date
+                 , matches.snippet
+                 , matches.rank
+            FROM ({matches}) AS matches
+            JOIN notes
+                ON notes.{key} = matches.note_id
+            LEFT JOIN employee
+                ON employee.employee_id = notes.employee_id
+            LEFT JOIN team
+                ON team.team_id = notes.team_id
+            ORDER BY matches.rank, notes.note_date DESC
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(query, conn)
-                return df['employee_name'].tolist()
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+        return self.fetch(sql, (*params, limit, offset), result)
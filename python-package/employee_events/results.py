@@ -0,0 +1,120 @@
+"""Lightweight result types for small query results.
+
+Building a pandas DataFrame costs far more than running a one-row query.
+Query methods that take a `result` argument can return their rows as:
+
+    "frame"    a pandas DataFrame (the default)
+    "tuples"   a list of tuples, as returned by sqlite3
+    "records"  a list of `__slots__` records with one attribute per column
+    "array"    a NumPy structured array with one field per column
+
+    Employee().model_data(1, result="array")["positive_events"]
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+result_modes = ("frame", "tuples", "records", "array")
+
+
+def check_result_mode(result: str) -> None:
+    if result not in result_modes:
+        raise ValueError(f"result must be one of {result_modes}, not {result!r}")
+
+
+class Record:
+    """Base class of the row types made by `record_type`."""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return self.__slots__ == other.__slots__ and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def _asdict(self) -> dict:
+        return dict(zip(self.__slots__, self))
+
+
+@lru_cache(maxsize=None)
+def record_type(columns: tuple) -> type:
+    """Return the Record subclass with one slot per column name.
+
+    Args:
+        columns (tuple): Column names, which must be valid identifiers
+    """
+    return type("Row", (Record,), {"__slots__": columns})
+
+
+def column_dtype(values: Sequence[Any]) -> str:
+    """The NumPy dtype holding `values`: int64, float64 or object.
+
+    NULLs in numeric columns become NaN, so they need float64.
+    """
+    numeric = [value for value in values if value is not None]
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in numeric):
+        return "object"
+    if len(numeric) == len(values) and all(isinstance(value, int) for value in numeric):
+        return "int64" if values else "float64"
+    return "float64"
+
+
+def structured_array(rows: list[tuple], columns: Sequence[str]) -> np.ndarray:
+    """Convert query rows to a NumPy structured array."""
+    import numpy as np
+
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    dtypes = [column_dtype(column) for column in values]
+    array = np.empty(len(rows), dtype=list(zip(columns, dtypes)))
+    for name, dtype, column in zip(columns, dtypes, values):
+        if dtype == "float64":
+            column = [np.nan if value is None else value for value in column]
+        array[name] = column
+    return array
+
+
+def from_rows(rows: list[tuple], columns: Sequence[str], result: str):
+    """Return query rows in the `result` mode."""
+    if result == "tuples":
+        return rows
+    if result == "records":
+        record = record_type(tuple(columns))
+        return [record(*row) for row in rows]
+    if result == "array":
+        return structured_array(rows, columns)
+
+    import pandas as pd
+    return pd.DataFrame.from_records(rows, columns=list(columns))
+
+
+def from_columns(columns: dict, result: str):
+    """Return NumPy column arrays in the `result` mode."""
+    check_result_mode(result)
+    if result == "frame":
+        import pandas as pd
+        return pd.DataFrame(columns)
+    if result == "array":
+        import numpy as np
+        names = list(columns)
+        array = np.empty(len(columns[names[0]]) if names else 0,
+                         dtype=[(name, values.dtype) for name, values in columns.items()])
+        for name, values in columns.items():
+            array[name] = values
+        return array
+
+    rows = list(zip(*(values.tolist() for values in columns.values())))
+    return from_rows(rows, list(columns), result)
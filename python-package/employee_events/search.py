@@ -0,0 +1,139 @@
+"""Full-text search over notes.
+
+`notes_fts` is an FTS5 index of `notes.note`. It stores only the index,
+not a copy of the text: it reads the notes back from the `notes` table
+by `note_id`. Triggers on `notes` keep it current on every insert, update
+and delete, so any ingestion path that writes notes through SQLite
+maintains it. A search is then an index lookup ranked by BM25 instead
+of a `LIKE '%...%'` scan of every note.
+
+Words are stemmed with the Porter stemmer, so "train" also finds
+"trained" and "training".
+
+`note_id` is the INTEGER PRIMARY KEY of `notes`, so it is the table's
+rowid. An implicit rowid would not do: VACUUM may renumber the rows of a
+table without one, and the index would silently point at the wrong
+notes. `add_note_ids` gives databases built before note ids existed
+their explicit key.
+
+Like the team timelines, tools that replace `notes` wholesale, such as
+pandas' `to_sql(if_exists='replace')`, drop the triggers with the table
+and must call `create_notes_index` again afterwards.
+"""
+import sqlite3
+
+notes_index_table = "notes_fts"
+
+notes_index_schema = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {notes_index_table} USING fts5(
+    note,
+    content='notes',
+    content_rowid='note_id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS {notes_index_table}_insert
+AFTER INSERT ON notes
+BEGIN
+    INSERT INTO {notes_index_table} (rowid, note) VALUES (NEW.note_id, NEW.note);
+END;
+
+CREATE TRIGGER IF NOT EXISTS {notes_index_table}_delete
+AFTER DELETE ON notes
+BEGIN
+    INSERT INTO {notes_index_table} ({notes_index_table}, rowid, note) VALUES ('delete', OLD.note_id, OLD.note);
+END;
+
+CREATE TRIGGER IF NOT EXISTS {notes_index_table}_update
+AFTER UPDATE OF note ON notes
+BEGIN
+    INSERT INTO {notes_index_table} ({notes_index_table}, rowid, note) VALUES ('delete', OLD.note_id, OLD.note);
+    INSERT INTO {notes_index_table} (rowid, note) VALUES (NEW.note_id, NEW.note);
+END;
+"""
+
+
+def add_note_ids(conn: sqlite3.Connection) -> bool:
+    """Give `notes` an explicit `note_id INTEGER PRIMARY KEY`.
+
+    Each note keeps its current rowid as its id, and the table keeps its
+    other columns and indexes. A search index keyed on the old implicit
+    rowids is dropped; call `create_notes_index` to rebuild it. Databases
+    whose notes already have ids, or no notes table, are left unchanged.
+
+    Args:
+        conn (sqlite3.Connection): A writable connection to the database
+
+    Returns:
+        bool: Whether a search index was dropped
+    """
+    def columns_without_ids():
+        columns = conn.execute("PRAGMA table_info(notes)").fetchall()
+        if not any(name == "note_id" for _, name, *_ in columns):
+            return columns
+
+    if not columns_without_ids():
+        return False
+
+    with conn:
+        # Python's sqlite3 only opens transactions for DML, so the
+        # statements below are made atomic explicitly. IMMEDIATE takes the
+        # write lock up front, so another writer adding the ids at the
+        # same time is waited for and seen below.
+        conn.execute("BEGIN IMMEDIATE")
+        columns = columns_without_ids()
+        if not columns:
+            return False
+        indexed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (notes_index_table,)).fetchone()
+        indexes = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'notes' AND sql IS NOT NULL"
+        ).fetchall()
+        names = ", ".join(f'"{name}"' for _, name, *_ in columns)
+        declared = ", ".join(f'"{name}" {type}' for _, name, type, *_ in columns)
+
+        # Dropping notes drops its triggers too
+        conn.execute(f"DROP TABLE IF EXISTS {notes_index_table}")
+        conn.execute(f"CREATE TABLE notes_with_ids (note_id INTEGER PRIMARY KEY, {declared})")
+        conn.execute(f"INSERT INTO notes_with_ids (note_id, {names}) SELECT rowid, {names} FROM notes")
+        conn.execute("DROP TABLE notes")
+        conn.execute("ALTER TABLE notes_with_ids RENAME TO notes")
+        for sql, in indexes:
+            conn.execute(sql)
+    return bool(indexed)
+
+
+def create_notes_index(conn: sqlite3.Connection) -> None:
+    """Create the notes search index and triggers, and rebuild the index.
+
+    Notes without an explicit `note_id` are given one first, see
+    `add_note_ids`.
+
+    Args:
+        conn (sqlite3.Connection): A writable connection to the database
+    """
+    add_note_ids(conn)
+    with conn:
+        conn.executescript(notes_index_schema)
+        conn.execute(f"INSERT INTO {notes_index_table} ({notes_index_table}) VALUES ('rebuild')")
+
+
+def match_expression(text: str) -> str:
+    """Turn free text into an FTS5 query matching notes with every word.
+
+    Every word is quoted, so punctuation and FTS5 operators in the text
+    are searched for literally instead of raising syntax errors. A word
+    ending in `*` matches any word starting with it.
+
+    Args:
+        text (str): The words to search for
+
+    Returns:
+        str: The MATCH expression, empty if `text` has no words
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"{}"{}'.format(word.replace('"', '""'), "*" if prefix else ""))
+    return " ".join(terms)
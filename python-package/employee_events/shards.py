@@ -0,0 +1,318 @@
+"""Sharded layouts: one employee_events database per range of team ids.
+
+A sharded layout is a directory of ordinary employee_events databases
+named `team_{first}-{last}.db`. Each holds the teams with ids from
+`first` to `last`, their employees, events and notes, with the same
+tables, indexes and triggers as a single database. Readers and writers
+of different teams then never touch the same file, and a shard can be
+rebuilt or moved without touching the others.
+
+`ShardRouter` maps ids to shards: team ids by their range, employee ids
+through a directory of every shard's employees, read on first use.
+`QueryBase` models given a `router` send queries about one id to its
+shard, and fan queries about everyone (`names`, `search_notes`,
+`all_model_data`) out to every shard in parallel threads and merge the
+results. SQLite releases the GIL while it runs a query, so shards are
+read concurrently.
+
+Employees are assumed to stay in their team: moving one to a team of
+another shard means rebuilding both shards.
+
+Usage:
+
+    split_database(db_path, "shards", teams_per_shard=10)
+    router = ShardRouter.from_directory("shards",
+                                        ReadOnlyConnectionFactory)
+    # Reads the shard of employee 7's team
+    Employee(router=router).event_counts(7)
+    # Reads every shard
+    Team(router=router).names()
+
+    # Rebuilds one shard in place
+    build_shard(db_path, "shards/team_1-10.db", 1, 10)
+"""
+from __future__ import annotations
+
+import bisect
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sqlite3 import connect
+from typing import Callable, Iterator, Optional
+
+from .search import create_notes_index, notes_index_table
+from .sql_execution import ConnectionFactory
+from .timelines import create_team_timelines
+
+# Tables copied into every shard, all of which have a team_id column
+shard_tables = ("team", "employee", "employee_events", "notes")
+
+shard_name = re.compile(r"team_(\d+)-(\d+)\.db")
+
+
+def shard_path(directory, first: int, last: int) -> Path:
+    """Path of the shard holding teams `first` to `last` in `directory`."""
+    return Path(directory) / f"team_{first}-{last}.db"
+
+
+def build_shard(source, path, first: int, last: int) -> Path:
+    """Copy teams `first` to `last` of the database `source` into a shard.
+
+    The shard is written next to `path` and moved over it once complete,
+    so readers of an existing shard keep reading the old file until they
+    reconnect.
+
+    Args:
+        source (str | Path): The database to copy from
+        path (str | Path): The shard to write
+        first (int): First team id of the shard
+        last (int): Last team id of the shard
+
+    Returns:
+        Path: The shard's path
+    """
+    path = Path(path)
+    partial = path.with_name(path.name + ".partial")
+    partial.unlink(missing_ok=True)
+
+    conn = connect(partial)
+    try:
+        conn.execute("ATTACH DATABASE ? AS source", (str(source),))
+        # Recreate the tables and their indexes as declared in the source
+        schema = conn.execute(f"""
+            SELECT sql FROM source.sqlite_master
+            WHERE tbl_name IN ({', '.join('?' for _ in shard_tables)})
+              AND type IN ('table', 'index') AND sql IS NOT NULL
+            ORDER BY type = 'index'
+        """, shard_tables).fetchall()
+        with conn:
+            for sql, in schema:
+                conn.execute(sql)
+            for table in shard_tables:
+                conn.execute(f"""
+                    INSERT INTO main.{table}
+                    SELECT * FROM source.{table}
+                    WHERE team_id BETWEEN ? AND ?
+                """, (first, last))
+        indexed = conn.execute(
+            "SELECT 1 FROM source.sqlite_master WHERE name = ?",
+            (notes_index_table,)).fetchone()
+        conn.execute("DETACH DATABASE source")
+
+        create_team_timelines(conn)
+        if indexed:
+            create_notes_index(conn)
+    finally:
+        conn.close()
+
+    os.replace(partial, path)
+    return path
+
+
+def split_database(source, directory, teams_per_shard: int = 1) -> list[Path]:
+    """Split the database `source` into shards of `teams_per_shard` teams.
+
+    Args:
+        source (str | Path): The database to split
+        directory (str | Path): Where to write the shards
+        teams_per_shard (int): Consecutive team ids per shard
+
+    Returns:
+        list[Path]: The shards, in team id order
+    """
+    conn = connect(source)
+    try:
+        team_ids = [row[0] for row in conn.execute(
+            "SELECT team_id FROM team ORDER BY team_id")]
+    finally:
+        conn.close()
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    shards = []
+    for i in range(0, len(team_ids), teams_per_shard):
+        ids = team_ids[i:i + teams_per_shard]
+        first, last = ids[0], ids[-1]
+        path = shard_path(directory, first, last)
+        shards.append(build_shard(source, path, first, last))
+    return shards
+
+
+class ShardRouter:
+    """Maps team and employee ids to the shard holding them.
+
+    The router only holds configuration and a directory of employees, so
+    like a ConnectionFactory it can be created before forking workers.
+    Threads are started per fan-out, never shared across a fork.
+    """
+
+    def __init__(self, shards: dict[tuple[int, int], ConnectionFactory],
+                 max_workers: int = 8):
+        """Initialize the router.
+
+        Args:
+            shards (dict): Connection factory of each shard, keyed by its
+                first and last team id. Ranges must not overlap.
+            max_workers (int): Most shards read at once by a fan-out
+        """
+        if not shards:
+            raise ValueError("A sharded layout needs at least one shard")
+        self.ranges = sorted(shards)
+        self.factories = [shards[team_range] for team_range in self.ranges]
+        for (_, last), (first, _) in zip(self.ranges, self.ranges[1:]):
+            if first <= last:
+                raise ValueError(
+                    f"Shards overlap: team {first} is in two shards")
+        self.max_workers = max_workers
+        self._employees = None
+
+    @classmethod
+    def from_directory(cls, directory,
+                       factory: Callable[..., ConnectionFactory]
+                       = ConnectionFactory,
+                       max_workers: int = 8, **options) -> ShardRouter:
+        """Route to the `team_{first}-{last}.db` shards in `directory`.
+
+        Args:
+            directory (str | Path): The sharded layout
+            factory (type): ConnectionFactory class, e.g.
+                ReadOnlyConnectionFactory, called with each shard's path
+                and `options`
+            max_workers (int): Most shards read at once by a fan-out
+        """
+        shards = {}
+        for path in Path(directory).iterdir():
+            match = shard_name.fullmatch(path.name)
+            if match:
+                team_range = int(match.group(1)), int(match.group(2))
+                shards[team_range] = factory(path, **options)
+        if not shards:
+            raise FileNotFoundError(
+                f"No team_{{first}}-{{last}}.db shards in {directory}")
+        return cls(shards, max_workers)
+
+    def team_shard(self, team_id: int) -> Optional[ConnectionFactory]:
+        """The shard holding team `team_id`, None if no range contains it."""
+        i = bisect.bisect_right(self.ranges, (team_id, float("inf"))) - 1
+        if i >= 0 and self.ranges[i][0] <= team_id <= self.ranges[i][1]:
+            return self.factories[i]
+        return None
+
+    def employee_shard(self, employee_id: int) -> Optional[ConnectionFactory]:
+        """The shard holding employee `employee_id`, None if no shard has them.
+
+        The directory of employees is read from every shard on first use,
+        and read again when an unknown id is requested after a shard
+        changed.
+        """
+        signature, employees = self._employees or (None, {})
+        if employee_id not in employees and signature != self.signature():
+            signature = self.signature()
+            employees = {}
+            ids = self.map(lambda factory: read_column(
+                factory, "SELECT employee_id FROM employee"))
+            for shard, shard_ids in enumerate(ids):
+                employees.update(dict.fromkeys(shard_ids, shard))
+            self._employees = signature, employees
+        shard = employees.get(employee_id)
+        return None if shard is None else self.factories[shard]
+
+    def shard(self, name: str, id: int) -> Optional[ConnectionFactory]:
+        """The shard holding `id` of table `name`, "employee" or "team"."""
+        if name == "team":
+            return self.team_shard(id)
+        if name == "employee":
+            return self.employee_shard(id)
+        raise ValueError(f"Cannot route ids of table {name!r}")
+
+    def map(self, func: Callable[[ConnectionFactory], object]) -> list:
+        """Call `func` with every shard's factory in parallel threads.
+
+        Returns:
+            list: The results, in shard order
+        """
+        if len(self.factories) == 1:
+            return [func(self.factories[0])]
+        workers = min(self.max_workers, len(self.factories))
+        with ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(func, self.factories))
+
+    def chain(self, func: Callable[[ConnectionFactory], Iterator],
+              prefetch: int = 2) -> Iterator:
+        """Yield everything `func` yields for every shard, in shard order.
+
+        Up to `max_workers` shards are read ahead in parallel threads, each
+        at most `prefetch` items ahead of the consumer, so memory stays
+        bounded however many shards there are. Closing the generator stops
+        the threads.
+        """
+        done = object()
+        stop = threading.Event()
+        queues = [queue.Queue(prefetch) for _ in self.factories]
+
+        def put(items, item):
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def pump(factory, items):
+            if stop.is_set():
+                return
+            iterator = None
+            try:
+                iterator = func(factory)
+                for item in iterator:
+                    if not put(items, (item, None)):
+                        return
+                put(items, (done, None))
+            except BaseException as e:
+                put(items, (done, e))
+            finally:
+                # Closes the shard's connection if the consumer stopped early
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+
+        pool = ThreadPoolExecutor(min(self.max_workers, len(self.factories)))
+        try:
+            for factory, items in zip(self.factories, queues):
+                pool.submit(pump, factory, items)
+            for items in queues:
+                while True:
+                    item, error = items.get()
+                    if error is not None:
+                        raise error
+                    if item is done:
+                        break
+                    yield item
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def signature(self) -> tuple:
+        """The signatures of every shard, see `ConnectionFactory.signature`."""
+        return tuple(factory.signature() for factory in self.factories)
+
+    def preload(self) -> list[str]:
+        """Check that every shard can be opened and read.
+
+        Returns:
+            list[str]: Names of the tables in the shards
+        """
+        tables = self.map(lambda factory: factory.preload())
+        return sorted(set().union(*tables))
+
+
+def read_column(factory: ConnectionFactory, sql: str) -> list:
+    """The first column of every row of `sql` in the database of `factory`."""
+    conn = factory()
+    try:
+        return [row[0] for row in conn.execute(sql)]
+    finally:
+        conn.close()
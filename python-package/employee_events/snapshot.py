@@ -0,0 +1,358 @@
+"""In-memory snapshot of the employee_events database.
+
+The whole dataset fits in memory as a handful of NumPy column arrays.
+`SnapshotEngine` loads them once and answers `event_counts`,
+`last_event_date`, `model_data` and `notes` for Employee and Team by
+slicing, without SQL or `pd.read_sql_query`:
+
+    engine = SnapshotEngine()
+    Employee(snapshot=engine).event_counts(1, cumulative=True)
+
+Events are stored twice, sorted by (employee_id, event_date) and by
+(team_id, event_date), with the row range of every id. A lookup is a
+dict lookup and a slice, and grouping into day, week or month buckets
+is a `np.add.reduceat` over already sorted dates.
+
+The engine checks the database file (and its WAL file) at most every
+`check_interval` seconds and loads a new snapshot when it changed. The
+new snapshot is built on the side and swapped in with one assignment, so
+lookups never see a half-loaded snapshot and are never blocked by a
+reload.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from .results import from_columns
+from .sql_execution import ConnectionFactory, db_path
+
+# numpy and pandas are imported on first use to keep importing
+# employee_events cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+def bucket_starts(dates: np.ndarray, bucket: str) -> np.ndarray:
+    """Map datetime64[D] dates to the first date of their bucket.
+
+    Matches the SQL expressions in `query_base.event_buckets`: weeks
+    start on Monday.
+    """
+    if bucket == "day":
+        return dates
+    if bucket == "week":
+        # Day 0 of datetime64, 1970-01-01, is a Thursday
+        days = dates.astype("int64")
+        return (days - (days + 3) % 7).astype("datetime64[D]")
+    if bucket == "month":
+        return dates.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Unknown bucket {bucket!r}")
+
+
+def to_date(value) -> np.datetime64:
+    import numpy as np
+
+    return np.datetime64(str(value)[:10], "D")
+
+
+def read_columns(conn, sql: str, dtypes: dict, chunk_size: int) -> dict:
+    """Read the rows of `sql` into one array per column.
+
+    The arrays are allocated from a count of the rows and filled
+    `chunk_size` rows at a time, so at most one chunk of rows is held as
+    Python tuples.
+
+    Args:
+        conn (sqlite3.Connection): Connection to read from
+        sql (str): Query returning the columns in the order of `dtypes`
+        dtypes (dict): Column name -> NumPy dtype
+        chunk_size (int): Rows fetched at a time
+
+    Returns:
+        dict: Column name -> array
+    """
+    import numpy as np
+
+    count, = conn.execute(f"SELECT COUNT(*) FROM ({sql})").fetchone()
+    columns = {name: np.empty(count, dtype=dtype)
+               for name, dtype in dtypes.items()}
+    cursor = conn.execute(sql)
+    filled = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for column, values in zip(columns.values(), zip(*rows)):
+            column[filled:filled + len(rows)] = values
+        filled += len(rows)
+    return columns
+
+
+class Partition:
+    """Rows sorted by an id column, then by date, with each id's row range."""
+
+    def __init__(self, ids: np.ndarray, dates: np.ndarray,
+                 **columns: np.ndarray):
+        import numpy as np
+
+        order = np.lexsort((dates, ids))
+        sorted_ids = ids[order]
+        self.dates = dates[order]
+        self.columns = {name: values[order]
+                        for name, values in columns.items()}
+
+        unique, starts = np.unique(sorted_ids, return_index=True)
+        stops = np.append(starts[1:], len(sorted_ids))
+        self.offsets = {
+            id: slice(start, stop)
+            for id, start, stop in zip(unique.tolist(), starts.tolist(),
+                                       stops.tolist())
+        }
+
+    def rows(self, id: int) -> slice:
+        """The row range of `id`, empty if it has no rows."""
+        return self.offsets.get(id, slice(0, 0))
+
+
+class Snapshot:
+    """Immutable column arrays of one consistent read of the database."""
+
+    def __init__(self, events: dict, notes: dict, signature=None):
+        """Index the columns of employee_events and notes.
+
+        Args:
+            events (dict): employee_id, team_id, event_date (datetime64[D]),
+                positive_events and negative_events arrays
+            notes (dict): employee_id, team_id, note_date and note arrays
+            signature: Identifies the database state the columns were read
+                from
+        """
+        self.signature = signature
+        self.events = {
+            name: Partition(
+                events[f"{name}_id"], events["event_date"],
+                employee_id=events["employee_id"],
+                positive_events=events["positive_events"],
+                negative_events=events["negative_events"],
+            )
+            for name in ("employee", "team")
+        }
+        self.notes_by = {
+            name: Partition(notes[f"{name}_id"], notes["note_date"],
+                            note=notes["note"])
+            for name in ("employee", "team")
+        }
+
+    @classmethod
+    def load(cls, conn, signature=None, chunk_size: int = 65536) -> Snapshot:
+        """Read employee_events and notes through `conn` in one transaction.
+
+        Args:
+            conn (sqlite3.Connection): Connection to read from
+            signature: Stored as the snapshot's `signature`
+            chunk_size (int): Rows fetched at a time, see `read_columns`
+        """
+        # One read transaction, so both tables come from the same commit
+        conn.execute("BEGIN")
+        try:
+            events = read_columns(conn, """
+                SELECT employee_id
+                     , team_id
+                     , event_date
+                     , COALESCE(positive_events, 0)
+                     , COALESCE(negative_events, 0)
+                FROM employee_events
+                ORDER BY employee_id, event_date
+            """, {
+                "employee_id": "int64",
+                "team_id": "int64",
+                "event_date": "datetime64[D]",
+                "positive_events": "int64",
+                "negative_events": "int64",
+            }, chunk_size)
+            notes = read_columns(conn, """
+                SELECT employee_id, team_id, note_date, note
+                FROM notes
+                ORDER BY employee_id, note_date
+            """, {
+                "employee_id": "int64",
+                "team_id": "int64",
+                "note_date": "object",
+                "note": "object",
+            }, chunk_size)
+        finally:
+            conn.rollback()
+
+        return cls(events, notes, signature)
+
+    def event_counts(self, name: str, id: int, start=None, end=None,
+                     bucket: str = "day", cumulative: bool = False,
+                     result: str = "frame") -> pd.DataFrame:
+        """Answer `QueryBase.event_counts` for the `name` table.
+
+        Returns the same columns and values as the SQL query.
+        """
+        import numpy as np
+
+        events = self.events[name]
+        rows = events.rows(int(id))
+        dates = events.dates[rows]
+        positive = events.columns["positive_events"][rows]
+        negative = events.columns["negative_events"][rows]
+
+        # Like the SQL, running totals are only limited by the end of the
+        # range and the start is applied to the totals
+        mask = None
+        if end is not None:
+            mask = dates <= to_date(end)
+        if start is not None and not cumulative:
+            after_start = dates >= to_date(start)
+            mask = after_start if mask is None else mask & after_start
+        if mask is not None:
+            dates, positive, negative = (dates[mask], positive[mask],
+                                         negative[mask])
+
+        keys = bucket_starts(dates, bucket)
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            keys = keys[starts]
+            positive = np.add.reduceat(positive, starts)
+            negative = np.add.reduceat(negative, starts)
+
+        if cumulative:
+            positive = positive.cumsum()
+            negative = negative.cumsum()
+            if start is not None:
+                first = bucket_starts(np.array([to_date(start)]), bucket)[0]
+                keep = keys >= first
+                keys, positive, negative = (keys[keep], positive[keep],
+                                            negative[keep])
+
+        return from_columns({
+            "event_date": np.datetime_as_string(keys, unit="D").astype(object),
+            "positive_events": positive,
+            "negative_events": negative,
+        }, result)
+
+    def last_event_date(self, name: str, id: int) -> Optional[str]:
+        """Answer `QueryBase.last_event_date` for the `name` table."""
+        import numpy as np
+
+        events = self.events[name]
+        dates = events.dates[events.rows(int(id))]
+        if not len(dates):
+            return None
+        return str(np.datetime_as_string(dates[-1], unit="D"))
+
+    def model_data(self, name: str, id: int,
+                   result: str = "frame") -> pd.DataFrame:
+        """Answer `Employee.model_data` or `Team.model_data`.
+
+        Employees get one row of event sums, teams one row per member.
+        """
+        import numpy as np
+
+        events = self.events[name]
+        rows = events.rows(int(id))
+        positive = events.columns["positive_events"][rows]
+        negative = events.columns["negative_events"][rows]
+
+        if name == "employee":
+            if not len(positive):
+                # SUM over no rows is NULL
+                none = np.array([None], dtype=object)
+                return from_columns({"positive_events": none,
+                                     "negative_events": none}, result)
+            return from_columns({
+                "positive_events": positive.sum(keepdims=True),
+                "negative_events": negative.sum(keepdims=True),
+            }, result)
+
+        _, member = np.unique(events.columns["employee_id"][rows],
+                              return_inverse=True)
+        positive = np.bincount(member, weights=positive).astype("int64")
+        negative = np.bincount(member, weights=negative).astype("int64")
+        return from_columns({
+            "positive_events": positive,
+            "negative_events": negative,
+        }, result)
+
+    def notes(self, name: str, id: int, result: str = "frame") -> pd.DataFrame:
+        """Answer `QueryBase.notes` for the `name` table."""
+        notes = self.notes_by[name]
+        rows = notes.rows(int(id))
+        return from_columns({
+            "note_date": notes.dates[rows].astype(object),
+            "note": notes.columns["note"][rows],
+        }, result)
+
+
+class SnapshotEngine:
+    """Keeps a current Snapshot of a database and reloads it on change."""
+
+    def __init__(self, connection_factory: ConnectionFactory = None,
+                 path=db_path, check_interval: float = 1.0):
+        """Initialize the engine. The snapshot is loaded on first use.
+
+        Args:
+            connection_factory (ConnectionFactory): Factory used to read
+                the database; takes precedence over `path`
+            path (str | Path): Path to the SQLite database file
+            check_interval (float): Seconds between checks for changes
+        """
+        self.connection_factory = connection_factory or ConnectionFactory(path)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._checked = 0.0
+
+    def current(self) -> Snapshot:
+        """Return the current snapshot, reloaded if the database changed."""
+        snapshot = self._snapshot
+        elapsed = time.monotonic() - self._checked
+        if snapshot is not None and elapsed < self.check_interval:
+            return snapshot
+
+        # Only the first load waits. While a reload runs, other threads
+        # keep answering from the previous snapshot.
+        if not self.lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            self._checked = time.monotonic()
+            signature = self.connection_factory.signature()
+            if snapshot is None or snapshot.signature != signature:
+                snapshot = self._snapshot = self._load(signature)
+            return snapshot
+        finally:
+            self.lock.release()
+
+    def reload(self) -> Snapshot:
+        """Load a new snapshot now, whether or not the database changed."""
+        with self.lock:
+            self._checked = time.monotonic()
+            self._snapshot = self._load(self.connection_factory.signature())
+            return self._snapshot
+
+    def _load(self, signature) -> Snapshot:
+        conn = self.connection_factory()
+        try:
+            return Snapshot.load(conn, signature)
+        finally:
+            conn.close()
+
+    def event_counts(self, name: str, id: int, **kwargs) -> pd.DataFrame:
+        return self.current().event_counts(name, id, **kwargs)
+
+    def last_event_date(self, name: str, id: int) -> Optional[str]:
+        return self.current().last_event_date(name, id)
+
+    def model_data(self, name: str, id: int,
+                   result: str = "frame") -> pd.DataFrame:
+        return self.current().model_data(name, id, result)
+
+    def notes(self, name: str, id: int, result: str = "frame") -> pd.DataFrame:
+        return self.current().notes(name, id, result)
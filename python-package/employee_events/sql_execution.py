@@ -1,54 +1,458 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from sqlite3 import connect
 from pathlib import Path
 from functools import wraps
-import pandas as pd
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional
+
+from .results import check_result_mode, from_rows
+
+# pandas is imported on first use in `pandas_query` to keep importing
+# employee_events cheap
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Using pathlib, create a db_path variable that points to the absolute path
 # for the employee_events.db file
 db_path = Path(__file__).parent.absolute() / "employee_events.db"
 
+logger = logging.getLogger(__name__)
+
+# Queries still finding the database locked after the connection's busy
+# timeout are retried this many times, after waiting `busy_backoff`
+# seconds, then twice as long before every further retry. After the last
+# retry the error is raised, so callers never mistake a busy database for
+# an empty result.
+busy_retries = 3
+busy_backoff = 0.05
+
+
+class QueryEvent(NamedTuple):
+    """A finished query, as passed to query listeners."""
+    name: str
+    sql: str
+    params: tuple
+    rows: Optional[int]
+    duration: float
+    error: Optional[Exception] = None
+
+
+# Callables receiving a QueryEvent after every QueryMixin query. Empty by
+# default, so queries pay nothing beyond a perf_counter call.
+query_listeners: list[Callable[[QueryEvent], None]] = []
+
+
+def add_query_listener(listener: Callable[[QueryEvent], None]) -> None:
+    """Call `listener` with a QueryEvent after every query."""
+    query_listeners.append(listener)
+
+
+def remove_query_listener(listener: Callable[[QueryEvent], None]) -> None:
+    """Stop calling a listener added with `add_query_listener`."""
+    query_listeners.remove(listener)
+
+
+def sqlite_error(error: Exception) -> Exception:
+    """The sqlite3 error behind `error`, which pandas may have wrapped."""
+    return error.__cause__ if isinstance(error.__cause__, sqlite3.Error) else error
+
+
+def is_busy(error: Exception) -> bool:
+    """Whether `error` is a query giving up on a lock held by another connection."""
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+class ConnectionFactory:
+    """Factory for connections to an employee_events database.
+
+    The factory only holds configuration, so it can be created once in a
+    parent process and inherited by forked workers. Connections are opened
+    by whichever process runs the query and are never shared across a fork.
+
+    `timeout` is SQLite's busy timeout: how long a query waits for a lock
+    held by another connection before failing with "database is locked".
+    In WAL mode (see ingest.py) readers only wait on the brief locks taken
+    by checkpoints, never on writers.
+    """
+
+    def __init__(self, path=db_path, timeout=5.0):
+        """Initialize the factory.
+
+        Args:
+            path (str | Path): Path to the SQLite database file
+            timeout (float): Seconds to wait for a locked database
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self._tables = None
+
+    def __call__(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a new connection to the database.
+
+        Args:
+            check_same_thread (bool): Passed to `sqlite3.connect`
+
+        Returns:
+            sqlite3.Connection: A new connection
+        """
+        return connect(self.path, timeout=self.timeout, check_same_thread=check_same_thread)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """A connection for running one query, closed afterwards."""
+        conn = self()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def preload(self) -> list[str]:
+        """Check that the database can be opened and read.
+
+        Intended to run once at startup, so a missing or corrupt database
+        fails before any worker starts serving requests.
+
+        Returns:
+            list[str]: Names of the tables in the database
+        """
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Database file not found at {self.path}")
+
+        # Taken before reading, so a write committed meanwhile makes
+        # `has_table` read the list again
+        signature = self.signature()
+        conn = self()
+        try:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"
+            ).fetchall()
+        finally:
+            conn.close()
+        self._tables = signature, frozenset(row[0] for row in rows)
+        return [row[0] for row in rows]
+
+    def signature(self) -> tuple:
+        """Modification time and size of the database and its WAL file.
+
+        Changes whenever a write is committed, so it can be used to
+        invalidate anything derived from the database.
+        """
+        signature = []
+        for file in (self.path, self.path.with_name(self.path.name + "-wal")):
+            try:
+                stat = os.stat(file)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def has_table(self, name: str) -> bool:
+        """Whether the database has table `name`.
+
+        The table list is read by this method or by `preload`, and cached
+        until the database's `signature` changes, e.g. when a rebuild
+        adds the team timelines or the notes search index.
+        """
+        signature, tables = self._tables or (None, None)
+        if tables is None or signature != self.signature():
+            self.preload()
+            signature, tables = self._tables
+        return name in tables
+
+
+class ReadOnlyConnectionFactory(ConnectionFactory):
+    """Factory for read-only connections tuned for serving reports.
+
+    Connections are opened with `mode=ro`, so the database is never
+    created or written by accident, and configured with:
+
+    - `mmap_size`: read pages through a memory map of the file instead of
+      copying them into each connection's cache. The mapping is shared by
+      every connection and every forked worker through the OS page cache.
+    - `cache_size`: a larger page cache for pages outside the map
+    - `temp_store=MEMORY`: sorts and temporary tables never touch disk
+    - `query_only`: reject writes even through ATTACHed databases
+
+    `immutable=True` additionally tells SQLite the file cannot change, so
+    it skips file locking and change detection. Only use it for database
+    files nothing writes to while the dashboard runs: the team timeline
+    triggers mean any write to employee_events changes the file, and
+    WAL mode needs locking to see committed writes.
+
+    Queries reuse one connection per thread (see `connection`), so the
+    PRAGMAs run and the page cache fills once per thread instead of once
+    per query.
+    """
+
+    def __init__(self, path=db_path, timeout=5.0, immutable=False, mmap_size=256 * 2**20, cache_size=64 * 2**20,
+                 reuse=True):
+        """Initialize the factory.
+
+        Args:
+            path (str | Path): Path to the SQLite database file
+            timeout (float): Seconds to wait for a locked database
+            immutable (bool): Open the file with `immutable=1`
+            mmap_size (int): Bytes of the file to memory map, 0 disables it
+            cache_size (int): Bytes of page cache per connection
+            reuse (bool): Keep one connection per thread for queries
+                instead of opening one per query
+        """
+        super().__init__(path, timeout)
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.reuse = reuse
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Open connections stay in the process that opened them
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _local=threading.local())
+
+    @property
+    def uri(self) -> str:
+        """The `file:` URI the connections are opened with."""
+        params = "mode=ro&immutable=1" if self.immutable else "mode=ro"
+        return f"{self.path.absolute().as_uri()}?{params}"
+
+    def __call__(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a new read-only connection to the database.
+
+        Args:
+            check_same_thread (bool): Passed to `sqlite3.connect`
+
+        Returns:
+            sqlite3.Connection: A new, configured connection
+        """
+        conn = connect(self.uri, uri=True, timeout=self.timeout, check_same_thread=check_same_thread)
+        # A negative cache_size is a size in KiB rather than in pages
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-(int(self.cache_size) // 1024)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """This thread's connection for running one query.
+
+        Opened on the thread's first query, and opened again in a forked
+        process or once the database file has been replaced, e.g. by a
+        rebuild: an open connection keeps reading the file it was opened
+        on. Committed writes to the same file are seen by the next query.
+        """
+        if not self.reuse:
+            with super().connection() as conn:
+                yield conn
+            return
+
+        try:
+            stat = os.stat(self.path)
+            key = os.getpid(), stat.st_dev, stat.st_ino
+        except FileNotFoundError:
+            # Opening the connection raises the error
+            key = None
+        cached_key, conn = getattr(self._local, "connection", (None, None))
+        if conn is None or key is None or key != cached_key:
+            if conn is not None and cached_key[0] == os.getpid():
+                conn.close()
+            conn = self()
+            self._local.connection = key, conn
+        yield conn
+
+
 # OPTION 1: MIXIN
 class QueryMixin:
     """Mixin class providing methods for executing SQL queries.
 
     Offers utility methods to execute SQL queries and return results
-    as pandas DataFrames or lists of tuples.
+    as pandas DataFrames, lists of tuples or the lightweight types in
+    results.py. Connections come from the instance's `connection_factory`.
     """
+    connection_factory: ConnectionFactory = ConnectionFactory()
 
-    def pandas_query(self, sql_query: str) -> pd.DataFrame:
+    def pandas_query(self, sql_query: str, params: tuple = (), name: str = None) -> pd.DataFrame:
         """Execute an SQL query and return the result as a pandas DataFrame.
 
         Args:
             sql_query (str): The SQL query to execute
+            params (tuple): Values bound to the query's placeholders
+            name (str): Name of the query passed to query listeners,
+                defaults to the calling method's
 
         Returns:
             pd.DataFrame: DataFrame containing the query results
         """
+        import pandas as pd
+
+        name = self._query_name(name)
+        start = time.perf_counter()
         try:
-            with connect(db_path) as conn:
-                df = pd.read_sql_query(sql_query, conn)
-            return df
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
+            df = self._execute(lambda conn: pd.read_sql_query(sql_query, conn, params=params))
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            # pandas wraps errors raised while executing the query
+            e = sqlite_error(e)
+            self._log_error(e)
+            self._notify_listeners(name, sql_query, params, None, start, e)
+            if is_busy(e):
+                raise e
             return pd.DataFrame()
 
-    def query(self, sql_query: str) -> list[tuple]:
+        self._notify_listeners(name, sql_query, params, len(df), start)
+        return df
+
+    def query(self, sql_query: str, params: tuple = (), name: str = None) -> list[tuple]:
         """Execute an SQL query and return the result as a list of tuples.
 
         Args:
             sql_query (str): The SQL query to execute
+            params (tuple): Values bound to the query's placeholders
+            name (str): Name of the query passed to query listeners,
+                defaults to the calling method's
 
         Returns:
             list[tuple]: List of tuples containing the query results
         """
+        return self.fetch(sql_query, params, result="tuples", name=self._query_name(name))
+
+    def fetch(self, sql_query: str, params: tuple = (), result: str = "frame", name: str = None):
+        """Execute an SQL query and return the result in a `result` mode.
+
+        Every mode but "frame" skips pandas entirely, see results.py.
+
+        Args:
+            sql_query (str): The SQL query to execute
+            params (tuple): Values bound to the query's placeholders
+            result (str): "frame", "tuples", "records" or "array"
+            name (str): Name of the query passed to query listeners,
+                defaults to the calling method's
+
+        Returns:
+            The query results as a DataFrame, a list of tuples, a list of
+            records or a NumPy structured array
+        """
+        check_result_mode(result)
+        name = self._query_name(name)
+        if result == "frame":
+            return self.pandas_query(sql_query, params, name)
+
+        def execute(conn):
+            cursor = conn.execute(sql_query, params)
+            return cursor.fetchall(), [column[0] for column in cursor.description or ()]
+
+        start = time.perf_counter()
+        try:
+            rows, columns = self._execute(execute)
+        except sqlite3.Error as e:
+            self._log_error(e)
+            self._notify_listeners(name, sql_query, params, None, start, e)
+            if is_busy(e):
+                raise
+            return from_rows([], [], result)
+
+        self._notify_listeners(name, sql_query, params, len(rows), start)
+        return from_rows(rows, columns, result)
+
+    def fetch_chunks(self, sql_query: str, params: tuple = (), size: int = 10000,
+                     result: str = "array", name: str = None) -> Iterator:
+        """Execute an SQL query and yield its rows `size` at a time.
+
+        Only one chunk is held in memory at a time. The connection stays
+        open until the generator is exhausted or closed. The generator may
+        be resumed from different threads, e.g. by a streaming HTTP
+        response, but never from two threads at once. Chunks already
+        yielded cannot be taken back, so a busy database is not retried:
+        the error is raised.
+
+        Args:
+            sql_query (str): The SQL query to execute
+            params (tuple): Values bound to the query's placeholders
+            size (int): Rows per chunk
+            result (str): "frame", "tuples", "records" or "array"
+            name (str): Name of the query passed to query listeners,
+                defaults to the method iterating the chunks
+
+        Yields:
+            Up to `size` rows in the `result` mode
+        """
+        check_result_mode(result)
+        name = self._query_name(name)
+        start = time.perf_counter()
+        rows = 0
+        conn = self.connection_factory(check_same_thread=False)
         try:
-            with connect(db_path) as conn:
-                cursor = conn.cursor()
-                result = cursor.execute(sql_query).fetchall()
-            return result
+            cursor = conn.execute(sql_query, params)
+            columns = [column[0] for column in cursor.description or ()]
+            while True:
+                chunk = cursor.fetchmany(size)
+                if not chunk:
+                    break
+                rows += len(chunk)
+                yield from_rows(chunk, columns, result)
         except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+            self._log_error(e)
+            self._notify_listeners(name, sql_query, params, None, start, e)
+            if is_busy(e):
+                raise
+            return
+        finally:
+            conn.close()
+
+        self._notify_listeners(name, sql_query, params, rows, start)
+
+    def _execute(self, execute: Callable[[sqlite3.Connection], object]):
+        """Return `execute(conn)` for a connection from the factory.
+
+        Retried with exponential backoff while the database stays locked
+        for longer than the busy timeout, see `busy_retries`.
+        """
+        for attempt in range(busy_retries + 1):
+            try:
+                with self.connection_factory.connection() as conn:
+                    return execute(conn)
+            except Exception as e:
+                if attempt == busy_retries or not is_busy(sqlite_error(e)):
+                    raise
+            time.sleep(busy_backoff * 2 ** attempt)
+
+    def _log_error(self, error):
+        if is_busy(error):
+            logger.error(
+                "Database busy for more than %ss in %d attempts, increase "
+                "the connection factory's timeout or checkpoint less often: %s",
+                self.connection_factory.timeout, busy_retries + 1, error,
+            )
+        else:
+            logger.error("Database error: %s", error)
+
+    def _query_name(self, name):
+        # Name a query after the method that called `query`, `fetch`,
+        # `pandas_query` or `fetch_chunks`, e.g. "Employee.event_counts".
+        # Those pass the name on explicitly, so it is always looked up
+        # exactly two frames up, whatever wraps the calling method.
+        if name is not None or not query_listeners:
+            return name
+        return f"{type(self).__name__}.{sys._getframe(2).f_code.co_name}"
+
+    def _notify_listeners(self, name, sql_query, params, rows, start, error=None):
+        if not query_listeners:
+            return
+
+        duration = time.perf_counter() - start
+        event = QueryEvent(name or type(self).__name__, sql_query, tuple(params), rows, duration, error)
+        for listener in query_listeners:
+            listener(event)
 
 # Leave this code unchanged
 def query(func):
@@ -1,11 +1,13 @@
+from __future__ import annotations
+
 # Import the QueryBase class
-from query_base import QueryBase  # Assuming QueryBase is in query_base.py
+from .query_base import QueryBase, routed
+from .timelines import team_timeline_table
+
+from typing import TYPE_CHECKING, List, Tuple
 
-# Import dependencies for sql execution
-from sql_execution import execute_sql  # Hypothetical module for SQL execution
-import pandas as pd
-import sqlite3
-from typing import List, Tuple
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Team(QueryBase):
@@ -16,27 +18,38 @@ class Team(QueryBase):
     """
     name: str = "team"
 
+    def event_source(self) -> Tuple[str, str]:
+        """Read team timelines from the materialized per-team daily totals.
+
+        Falls back to aggregating member events for databases built
+        before `team_daily_events` existed.
+
+        Returns:
+            Tuple[str, str]: The FROM clause, and the column compared
+                against the requested id
+        """
+        if self.connection_factory.has_table(team_timeline_table):
+            return team_timeline_table, "team_id"
+        return super().event_source()
+
     def names(self) -> List[Tuple[str, int]]:
         """Retrieve team names and IDs of all teams.
 
         Returns:
             List[Tuple[str, int]]: List of tuples containing team name and ID
         """
+        if self.router is not None:
+            return [row for rows in self.fan_out("names") for row in rows]
+
         # Query 5
         query = """
             SELECT team_name, team_id
             FROM team
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Assuming execute_sql returns a list of tuples
-                result = execute_sql(conn, query)
-            return result
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+        return self.query(query)
 
+    @routed
     def username(self, id: int) -> List[Tuple[str]]:
         """Retrieve team name for a specific team ID.
 
@@ -50,27 +63,25 @@ class Team(QueryBase):
         query = f"""
             SELECT team_name
             FROM {self.name}
-            WHERE team_id = {id}
+            WHERE team_id = ?
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Assuming execute_sql returns a list of tuples
-                result = execute_sql(conn, query)
-            return result
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return []
+        return self.query(query, (id,))
 
-    def model_data(self, id: int) -> pd.DataFrame:
+    @routed
+    def model_data(self, id: int, result: str = "frame") -> pd.DataFrame:
         """Retrieve aggregated event data for machine learning model.
 
         Args:
             id (int): The team ID to filter by
+            result (str): Result mode, see results.py
 
         Returns:
             pd.DataFrame: DataFrame containing positive and negative event sums
         """
+        if self.snapshot is not None:
+            return self.snapshot.model_data(self.name, id, result)
+
         query = f"""
             SELECT positive_events, negative_events FROM (
                 SELECT employee_id
@@ -79,15 +90,9 @@ class Team(QueryBase):
                 FROM {self.name}
                 JOIN employee_events
                     USING(team_id)
-                WHERE {self.name}.team_id = {id}
+                WHERE {self.name}.team_id = ?
                 GROUP BY employee_id
             )
         """
 
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                df = pd.read_sql_query(query, conn)
-            return df
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return pd.DataFrame()
+        return self.fetch(query, (id,), result)
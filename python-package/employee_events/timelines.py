@@ -0,0 +1,81 @@
+"""Materialized per-team daily event totals.
+
+`team_daily_events` holds one row per team and event date. Triggers on
+`employee_events` keep it current on every insert, update and delete, so
+any ingestion path that writes rows through SQLite maintains it. Team
+timelines are then a single range read on the table's primary key,
+whatever the size of the team.
+
+Tools that replace `employee_events` wholesale, like pandas'
+`to_sql(if_exists='replace')`, drop the triggers with the table and must
+call `create_team_timelines` again afterwards.
+"""
+import sqlite3
+
+team_timeline_table = "team_daily_events"
+
+team_timeline_schema = f"""
+CREATE TABLE IF NOT EXISTS {team_timeline_table} (
+    team_id INTEGER NOT NULL,
+    event_date TEXT NOT NULL,
+    positive_events INTEGER NOT NULL DEFAULT 0,
+    negative_events INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (team_id, event_date)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS {team_timeline_table}_insert
+AFTER INSERT ON employee_events
+BEGIN
+    INSERT INTO {team_timeline_table} (team_id, event_date, positive_events, negative_events)
+    VALUES (NEW.team_id, NEW.event_date,
+            COALESCE(NEW.positive_events, 0), COALESCE(NEW.negative_events, 0))
+    ON CONFLICT (team_id, event_date) DO UPDATE SET
+        positive_events = positive_events + excluded.positive_events,
+        negative_events = negative_events + excluded.negative_events;
+END;
+
+CREATE TRIGGER IF NOT EXISTS {team_timeline_table}_delete
+AFTER DELETE ON employee_events
+BEGIN
+    UPDATE {team_timeline_table} SET
+        positive_events = positive_events - COALESCE(OLD.positive_events, 0),
+        negative_events = negative_events - COALESCE(OLD.negative_events, 0)
+    WHERE team_id = OLD.team_id AND event_date = OLD.event_date;
+END;
+
+CREATE TRIGGER IF NOT EXISTS {team_timeline_table}_update
+AFTER UPDATE OF team_id, event_date, positive_events, negative_events ON employee_events
+BEGIN
+    UPDATE {team_timeline_table} SET
+        positive_events = positive_events - COALESCE(OLD.positive_events, 0),
+        negative_events = negative_events - COALESCE(OLD.negative_events, 0)
+    WHERE team_id = OLD.team_id AND event_date = OLD.event_date;
+
+    INSERT INTO {team_timeline_table} (team_id, event_date, positive_events, negative_events)
+    VALUES (NEW.team_id, NEW.event_date,
+            COALESCE(NEW.positive_events, 0), COALESCE(NEW.negative_events, 0))
+    ON CONFLICT (team_id, event_date) DO UPDATE SET
+        positive_events = positive_events + excluded.positive_events,
+        negative_events = negative_events + excluded.negative_events;
+END;
+"""
+
+
+def create_team_timelines(conn: sqlite3.Connection) -> None:
+    """Create the team timeline table and triggers, and rebuild its rows.
+
+    Args:
+        conn (sqlite3.Connection): A writable connection to the database
+    """
+    with conn:
+        conn.executescript(team_timeline_schema)
+        conn.execute(f"DELETE FROM {team_timeline_table}")
+        conn.execute(f"""
+            INSERT INTO {team_timeline_table} (team_id, event_date, positive_events, negative_events)
+            SELECT team_id
+                 , event_date
+                 , COALESCE(SUM(positive_events), 0)
+                 , COALESCE(SUM(negative_events), 0)
+            FROM employee_events
+            GROUP BY team_id, event_date
+        """)
@@ -1,5 +1,6 @@
 from .base_component import BaseComponent
 from .dropdown import Dropdown
 from .radio import Radio
-from .matplotlib_viz import MatplotlibViz
-from .data_table import DataTable
\ No newline at end of file
+from .matplotlib_viz import MatplotlibViz, load_matplotlib
+from .data_table import DataTable
+from .downsampling import downsamplers
\ No newline at end of file
@@ -1,5 +1,9 @@
 class BaseComponent:
 
+    # Optional cache of rendered output, keyed by `cache_key`. See
+    # caching.py in the report.
+    cache = None
+
     def build_component(self, entity_id, model):
         raise NotImplementedError
     
@@ -8,10 +12,26 @@ class BaseComponent:
     
 
     def component_data(self, entity_id, model):
-        raise NotImplemented
+        raise NotImplementedError
+
+    def cache_key(self, entity_id, model):
+        # Everything the rendered output depends on besides the data
+        return (self, model.name, entity_id)
 
     def __call__(self, entity_id, model):
 
+        if self.cache is not None:
+            return self.cache.get(
+                self.cache_key(entity_id, model),
+                lambda: self.render(entity_id, model),
+            )
+
+        return self.render(entity_id, model)
+
+    def render(self, entity_id, model):
+
+        # Components are shared between requests, so everything a render
+        # needs is passed down from here. Never store it on `self`.
         component = self.build_component(entity_id, model)
 
-        return self.outer_div(component)
\ No newline at end of file
+        return self.outer_div(component)
@@ -1,5 +1,5 @@
 from .base_component import BaseComponent
-from fasthtml.common import Table, Tr, Th, Td
+from fastcore.xml import Table, Tr, Th, Td
 
 
 class DataTable(BaseComponent):
@@ -11,21 +11,15 @@ class DataTable(BaseComponent):
 
             data = self.component_data(entity_id, model)
 
-            table = Table(
-                Tr(
-                    Th(column) for column in data.columns
-                )
+            header = Tr(
+                Th(column) for column in data.columns
             )
 
-            for data_row in data.to_numpy():
+            rows = [
+                Tr(Td(val) for val in data_row)
+                for data_row in data.to_numpy()
+            ]
 
-                table_row = Tr(
-                    Td(val) for val in data_row
-                )
-
-                children = (*table.children, table_row)
-                table.children = children
-            
-            return table
+            return Table(header, *rows)
             
-        
\ No newline at end of file
+        
@@ -0,0 +1,86 @@
+'''
+Downsampling for long time series.
+
+Both functions return the indices of the points to keep, so several series
+sharing an x axis can be reduced independently. numpy is imported inside
+the functions to keep importing the report app cheap.
+'''
+
+
+def lttb(x, y, threshold):
+    '''
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+
+    Keeps the first and last points and, from each of `threshold - 2`
+    equally sized buckets in between, the point forming the largest
+    triangle with the previously kept point and the average of the next
+    bucket. Preserves peaks and the overall shape of the line.
+    '''
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Buckets only hold a handful of points, so plain Python floats are
+    # much faster here than numpy calls on tiny slices
+    x = np.asarray(x, dtype=float).tolist()
+    y = np.asarray(y, dtype=float).tolist()
+
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_end <= next_start:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / count
+        avg_y = sum(y[next_start:next_end]) / count
+
+        ax, ay = x[a], y[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        indices.append(a)
+
+    indices.append(n - 1)
+    return np.array(indices)
+
+
+def minmax(x, y, threshold):
+    '''
+    Keep the minimum and maximum of each of `(threshold - 2) // 2` buckets, plus
+    the first and last points. Cheaper than LTTB and never hides an
+    extreme value.
+    '''
+    import numpy as np
+
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, (threshold - 2) // 2 + 1).astype(int)
+    keep = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            keep.append(start + int(bucket.argmin()))
+            keep.append(start + int(bucket.argmax()))
+
+    return np.unique(keep)
+
+
+downsamplers = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
@@ -1,5 +1,5 @@
 from .base_component import BaseComponent
-from fasthtml.common import Select, Label, Div, Option
+from fastcore.xml import Select, Label, Div, Option
 
 class Dropdown(BaseComponent):
 
@@ -12,7 +12,7 @@ class Dropdown(BaseComponent):
     def build_component(self, entity_id, model):
         options = []
         for text, value in self.component_data(entity_id, model):
-            option = Option(text, value=value, selected="selected" if str(value) == entity_id else "")
+            option = Option(text, value=value, selected="selected" if str(value) == str(entity_id) else "")
             options.append(option)
 
 
@@ -29,12 +29,23 @@ class Dropdown(BaseComponent):
             )
         
         return selector
+
+    def component_label(self, entity_id, model):
+        return self.label
+
+    def render(self, entity_id, model):
+
+        # The label is resolved per call rather than assigned to
+        # `self.label`, so one dropdown instance can render concurrently
+        component = self.build_component(entity_id, model)
+        label = self.component_label(entity_id, model)
+
+        return self.outer_div(component, label)
     
-    def outer_div(self, child):
+    def outer_div(self, child, label=None):
 
         return Div(
-            Label(self.label, _for=self.id),
+            Label(self.label if label is None else label, _for=self.id),
             child,
             id=self.id,
         )
-    
\ No newline at end of file
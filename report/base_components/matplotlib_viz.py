@@ -1,54 +1,125 @@
 from .base_component import BaseComponent
 
-import matplotlib.pyplot
-from fasthtml.common import Img
-import matplotlib.pylab as plt
-import matplotlib
+from fastcore.xml import Img
+from functools import lru_cache
 import io
 import base64
+import threading
 
-# This is necessary to prevent matplotlib from causing memory leaks
-# https://stackoverflow.com/questions/31156578/matplotlib-doesnt-release-memory-after-savefig-and-close
-matplotlib.use('Agg')
-matplotlib.rcParams['savefig.transparent'] = True
-matplotlib.rcParams['savefig.format'] = 'png'
+
+@lru_cache(maxsize=None)
+def load_matplotlib():
+    '''
+    Import and configure matplotlib on first use and return the Figure class.
+    Importing matplotlib is a large part of the app's start-up time, so it
+    is deferred until the first chart is rendered.
+    '''
+    import matplotlib
+
+    # This is necessary to prevent matplotlib from causing memory leaks
+    # https://stackoverflow.com/questions/31156578/matplotlib-doesnt-release-memory-after-savefig-and-close
+    matplotlib.use('Agg')
+    matplotlib.rcParams['savefig.transparent'] = True
+    matplotlib.rcParams['savefig.format'] = 'png'
+
+    from matplotlib.figure import Figure
+    return Figure
 
 
 def matplotlib2fasthtml(func):
     '''
     Copy of https://github.com/koaning/fh-matplotlib, which is currently hardcoding the 
     image format as jpg. png or svg is needed here.
+
+    Unlike the original, this does not go through pyplot's global "current
+    figure". The wrapped function returns its own Figure, so concurrent
+    renders never draw into or save each other's figures.
     '''
     def wrapper(*args, **kwargs):
-        # Reset the figure to prevent accumulation. Maybe we need a setting for this?
-        fig = plt.figure()
-
         # Run function as normal
-        func(*args, **kwargs)
+        fig = func(*args, **kwargs)
 
         # Store it as base64 and put it into an image.
         my_stringIObytes = io.BytesIO()
-        plt.savefig(my_stringIObytes)
+        fig.savefig(my_stringIObytes)
         my_stringIObytes.seek(0)
-        my_base64_jpgData = base64.b64encode(my_stringIObytes.read()).decode()
+        my_base64_pngData = base64.b64encode(my_stringIObytes.read()).decode()
 
-        # Close the figure to prevent memory leaks
-        plt.close(fig)
-        plt.close('all')
-        return Img(src=f'data:image/jpg;base64, {my_base64_jpgData}')
+        # Figures created with `subplots` below are not registered with
+        # pyplot, so they are released as soon as they go out of scope
+        return Img(src=f'data:image/png;base64, {my_base64_pngData}')
     return wrapper
 
 
 class MatplotlibViz(BaseComponent):
+    '''
+    Base class of the chart components.
+
+    Subclasses either implement `visualization`, which returns a new Figure
+    for every render, or `create_template` and `update`. A template is a
+    figure with its axes, styling, titles and artists already created. Each
+    thread keeps one template per chart and every render only updates the
+    data of its artists before the figure is saved, which saves building
+    and styling a figure per render.
+    '''
 
     @matplotlib2fasthtml
     def build_component(self, entity_id, model):
-        return self.visualization(entity_id, model)
-    
-    
+        if type(self).create_template is MatplotlibViz.create_template:
+            return self.visualization(entity_id, model)
+
+        fig = self.template()
+        self.update(fig, entity_id, model)
+        return fig
+
     def visualization(self, entity_id, model):
         pass
 
+    def create_template(self):
+        '''
+        Return a new, styled figure whose data `update` fills in. Subclasses
+        implementing it must implement `update` too.
+        '''
+        return None
+
+    def update(self, fig, entity_id, model):
+        '''
+        Replace the data of the template's artists with the entity's.
+        '''
+        raise NotImplementedError
+
+    def template(self):
+        '''
+        This thread's template figure, created on first use. Templates are
+        never shared between threads, so concurrent renders cannot draw
+        into each other's figures.
+        '''
+        templates = self.thread_state()
+        fig = getattr(templates, 'fig', None)
+        if fig is None:
+            fig = templates.fig = self.create_template()
+        return fig
+
+    def thread_state(self):
+        '''
+        This thread's namespace holding its template figure as `fig`.
+        `create_template` and `update` keep any other state of the
+        template here, never on the component, which every thread shares.
+        '''
+        # Created on first use, so defining a component at import time
+        # does not import matplotlib
+        templates = self.__dict__.get('_templates')
+        if templates is None:
+            templates = self.__dict__.setdefault('_templates', threading.local())
+        return templates
+
+    def subplots(self, **kwargs):
+        # Thread-safe replacement for `plt.subplots`
+        Figure = load_matplotlib()
+        fig = Figure()
+        ax = fig.subplots(**kwargs)
+        return fig, ax
+
     def set_axis_styling(self, ax, bordercolor='white', fontcolor='white'):
         
         ax.title.set_color(fontcolor)
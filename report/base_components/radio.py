@@ -1,5 +1,5 @@
 from .base_component import BaseComponent
-from fasthtml.common import Input, Label, Div
+from fastcore.xml import Input, Label, Div
 
 class Radio(BaseComponent):
 
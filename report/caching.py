@@ -0,0 +1,88 @@
+"""Bounded caches of rendered charts and predicted risks.
+
+Set DASHBOARD_CACHE_SIZE to the number of entries each cache may hold,
+e.g. 1024, to enable them. Every entry is tagged with the database
+signature (modification time and size of the database and its WAL file)
+it was computed from. When a write changes the signature, the caches
+empty themselves, so nothing older than the data is ever served.
+
+Caches live in process memory. server.py fills them before forking when
+DASHBOARD_WARMUP_BUDGET is set (see warmup.py), so every worker starts
+with the parent's entries.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_size():
+    """Entries per cache, from DASHBOARD_CACHE_SIZE. 0 disables caching."""
+    return int(os.environ.get('DASHBOARD_CACHE_SIZE', 0))
+
+
+class VersionedCache:
+    """Thread-safe LRU cache emptied whenever `version()` changes."""
+
+    def __init__(self, maxsize=1024, version=lambda: None, check_interval=1.0):
+        """Initialize the cache.
+
+        Args:
+            maxsize (int): Entries kept before the least recently used is dropped
+            version (callable): Returns a token identifying the data the
+                cached values were computed from
+            check_interval (float): Seconds between calls to `version`
+        """
+        self.maxsize = maxsize
+        self.version = version
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._checked = float('-inf')
+
+    def current_version(self):
+        """The data version, re-read at most every `check_interval` seconds."""
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            version = self.version()
+            with self.lock:
+                self._checked = now
+                if version != self._version:
+                    self._version = version
+                    self.entries.clear()
+        return self._version
+
+    def get(self, key, compute):
+        """Return the cached value for `key`, computing and storing it on a miss.
+
+        `compute` runs without the lock held, so two threads missing the
+        same key at once may both compute it.
+        """
+        version = self.current_version()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self.lock:
+            # Drop values computed from data that changed meanwhile
+            if version == self._version:
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,5 +1,4 @@
-from fastcore.xml import FT
-from fasthtml.common import Div
+from fastcore.xml import FT, Div
 
 class CombinedComponent:
 
@@ -29,10 +28,13 @@ class CombinedComponent:
     
     def outer_div(self, children, div_args):
 
-        self.outer_div_type.children = ()
+        # `outer_div_type` is a class-level template shared by every
+        # request. Calling it would append to its children in place,
+        # so each render builds a fresh element from its tag and attrs.
+        template = self.outer_div_type
+        outer_div = FT(template.tag, (), dict(template.attrs))
 
-        return self.outer_div_type(
+        return outer_div(
             *children,
             **div_args
         )
-    
\ No newline at end of file
@@ -1,5 +1,5 @@
 from .combined_component import CombinedComponent
-from fasthtml.common import Button, Form, Group
+from fastcore.xml import Button
 
 class FormGroup(CombinedComponent):
 
@@ -16,6 +16,10 @@ class FormGroup(CombinedComponent):
         return children
 
     def outer_div(self, children, div_args):
+        # fasthtml's Form and Group add htmx/pico specific attributes, but
+        # importing them is slow, so wait until the first form is rendered
+        from fasthtml.components import Form
+        from fasthtml.pico import Group
 
         return Form(Group(*children), **div_args)
     
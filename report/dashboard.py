@@ -1,11 +1,27 @@
-from fasthtml.common import *
-import matplotlib.pyplot as plt
+import logging
+import os
+import warnings
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+from fasthtml.core import FastHTML, serve
+from fastcore.xml import A, Button, Div, Form, H1, Input, Label, Mark, Option, P, Select, Span, Table, Td, Th, Tr
 
 # Import QueryBase, Employee, Team from employee_events
-from employee_events import QueryBase, Employee, Team
+from employee_events import QueryBase, Employee, Team, ReadOnlyConnectionFactory, SnapshotEngine, db_path
+from employee_events.query_base import event_buckets
 
-# Import the load_model function from the utils.py file
-from utils import load_model
+# Import the LazyModel descriptor from the utils.py file
+from utils import LazyModel, feature_matrix
+
+import caching
+import instrumentation
+import profiling
+import risk_export
+import warmup
 
 # Import parent classes for subclassing
 from base_components import (
@@ -13,35 +29,73 @@ from base_components import (
     BaseComponent,
     Radio,
     MatplotlibViz,
-    DataTable
+    DataTable,
+    downsamplers,
 )
 from combined_components import FormGroup, CombinedComponent
 
+class ChartRange(NamedTuple):
+    """Dates and bucket of the event chart requested with a report.
+
+    Fields left as None use the LineChart's defaults.
+    """
+    start: str = None
+    end: str = None
+    bucket: str = None
+
+# The chart range of the report being rendered. Components are shared
+# between requests and only called with an entity id and a model, so the
+# report routes set it around each render, see `render_report`.
+chart_range = ContextVar('chart_range', default=ChartRange())
+
+def parse_chart_range(start='', end='', bucket=''):
+    """Validate the `start`, `end` and `bucket` query parameters of a report.
+
+    Args:
+        start (str): First date to plot (YYYY-MM-DD), or empty
+        end (str): Last date to plot (YYYY-MM-DD), or empty
+        bucket (str): "day", "week" or "month", or empty
+
+    Returns:
+        ChartRange: The requested range, None for empty parameters
+
+    Raises:
+        ValueError: If a date or the bucket is invalid
+    """
+    # strptime accepts the same formats on every Python version, unlike
+    # date.fromisoformat, which accepts basic ISO 8601 from 3.11 on
+    start, end = [datetime.strptime(value, '%Y-%m-%d').date().isoformat() if value else None
+                  for value in (start, end)]
+    if bucket and bucket not in event_buckets:
+        raise ValueError(f"bucket must be one of {sorted(event_buckets)}, not {bucket!r}")
+    return ChartRange(start, end, bucket or None)
+
 # Create a subclass of base_components/Dropdown called ReportDropdown
 class ReportDropdown(Dropdown):
     """Dropdown component for selecting report entities (employees or teams)."""
 
-    def build_component(self, model=None, asset_id=None):
-        """Build the dropdown component with a label based on the model name.
+    def component_label(self, entity_id=None, model=None):
+        """Label the dropdown with the model's name.
+
+        The label is returned for each render instead of being assigned to
+        `self.label`, because a single ReportDropdown instance is shared by
+        every request through DashboardFilters.children.
 
         Args:
+            entity_id: Optional ID for pre-selecting an option
             model: The model instance (Employee or Team)
-            asset_id: Optional ID for pre-selecting an option
 
         Returns:
-            fast_html component: The rendered dropdown component
+            str: The label text
         """
-        # Set the label attribute to the model's name
-        self.label = model.name if model else self.label
-        # Return the output from the parent class's build_component method
-        return super().build_component(model, asset_id)
+        return model.name if model else self.label
 
-    def component_data(self, model=None, asset_id=None):
+    def component_data(self, entity_id=None, model=None):
         """Retrieve data for the dropdown from the model's names method.
 
         Args:
+            entity_id: Optional ID for pre-selecting an option
             model: The model instance (Employee or Team)
-            asset_id: Optional ID for pre-selecting an option
 
         Returns:
             list: List of tuples containing names and IDs
@@ -55,12 +109,12 @@ class ReportDropdown(Dropdown):
 class Header(BaseComponent):
     """Header component displaying the model's name."""
 
-    def build_component(self, model=None, asset_id=None):
+    def build_component(self, entity_id=None, model=None):
         """Build an H1 component with the model's name.
 
         Args:
+            entity_id: Optional ID (not used in this component)
             model: The model instance (Employee or Team)
-            asset_id: Optional ID (not used in this component)
 
         Returns:
             fast_html component: H1 element with the model's name
@@ -72,95 +126,245 @@ class Header(BaseComponent):
 class LineChart(MatplotlibViz):
     """Line chart visualizing cumulative positive and negative event counts."""
 
-    def visualization(self, model, asset_id):
-        """Generate a line chart of cumulative event counts.
+    def __init__(self, start=None, end=None, bucket="day", window=365, downsample="lttb", max_points=None):
+        """Configure the default range and resolution of the chart.
+
+        Reports requested with `start`, `end` or `bucket` query parameters
+        override these defaults, see ChartRange.
 
         Args:
+            start: Optional first date (YYYY-MM-DD) to plot
+            end: Optional last date (YYYY-MM-DD) to plot
+            bucket: Plot one point per "day", "week" or "month"
+            window: Without a start, plot this many days up to the last
+                event (or `end`). None plots the whole history.
+            downsample: "lttb", "minmax" or None to plot every point
+            max_points: Points kept per line when downsampling, defaults
+                to the width of the plot area in pixels
+        """
+        self.start = start
+        self.end = end
+        self.bucket = bucket
+        self.window = window
+        self.downsample = downsample
+        self.max_points = max_points
+
+    def cache_key(self, entity_id, model):
+        # Charts of different ranges are cached separately
+        return super().cache_key(entity_id, model) + (chart_range.get(),)
+
+    def plotted_range(self, asset_id, model):
+        """The first date, last date and bucket to plot.
+
+        Args:
+            asset_id: The ID to plot the events of
             model: The model instance (Employee or Team)
-            asset_id: The ID to filter event counts
 
         Returns:
-            matplotlib.figure.Figure: The generated line chart
+            tuple: start and end (YYYY-MM-DD or None) and the bucket
         """
-        # Pass asset_id to the model's event_counts method
-        df = model.event_counts(asset_id)
-        
-        # Use pandas .fillna to fill nulls with 0
-        df = df.fillna(0)
-        
-        # Set the date column as the index
-        df = df.set_index('event_date')
-        
-        # Sort the index
-        df = df.sort_index()
-        
-        # Use .cumsum to get cumulative counts
-        df = df.cumsum()
-        
-        # Set dataframe columns to ['Positive', 'Negative']
-        df.columns = ['Positive', 'Negative']
-        
-        # Initialize a matplotlib subplot
-        fig, ax = plt.subplots()
-        
-        # Plot the cumulative counts
-        df.plot(ax=ax)
-        
+        requested = chart_range.get()
+        start = requested.start or self.start
+        end = requested.end or self.end
+        bucket = requested.bucket or self.bucket
+
+        # Bound the default range, so long histories are not read and
+        # returned one day at a time
+        if start is None and self.window is not None:
+            last = model.last_event_date(asset_id)
+            if last is not None:
+                if end is not None:
+                    last = min(last, end)
+                start = (date.fromisoformat(last) - timedelta(days=self.window - 1)).isoformat()
+
+        return start, end, bucket
+
+    def create_template(self):
+        """Create the styled line chart figure, without data.
+
+        Returns:
+            matplotlib.figure.Figure: Figure with one empty line per count
+        """
+        import numpy as np
+
+        # Initialize a matplotlib subplot with a date x axis
+        fig, ax = self.subplots()
+        ax.xaxis.update_units(np.array([], dtype='datetime64[ns]'))
+
+        # One line per cumulative count, filled in by `update`
+        for column in ['Positive', 'Negative']:
+            ax.plot([], [], label=column)
+        ax.legend()
+        fig.autofmt_xdate()
+
         # Set axis styling with black border and font color
-        self.set_axis_styling(ax=ax, border_color='black', font_color='black')
-        
+        self.set_axis_styling(ax=ax, bordercolor='black', fontcolor='black')
+
         # Set title and labels
         ax.set_title('Cumulative Event Counts')
         ax.set_xlabel('Date')
         ax.set_ylabel('Event Count')
-        
+
+        # Autoscaling keeps the previous limits when there is no data, so
+        # `update` restores these for entities without events. They are
+        # kept with this thread's template, not on the shared component.
+        self.thread_state().empty_limits = ax.get_xlim(), ax.get_ylim()
+
         return fig
 
+    def update(self, fig, asset_id, model):
+        """Plot the cumulative event counts of an employee or a team.
+
+        Args:
+            fig (matplotlib.figure.Figure): Figure from `create_template`
+            asset_id: The ID to filter event counts
+            model: The model instance (Employee or Team)
+        """
+        import pandas as pd
+
+        # Pass asset_id to the model's event_counts method. The running
+        # totals are computed in SQL, one row per plotted point.
+        start, end, bucket = self.plotted_range(asset_id, model)
+        df = model.event_counts(
+            asset_id,
+            start=start,
+            end=end,
+            bucket=bucket,
+            cumulative=True,
+        )
+
+        # Use pandas .fillna to fill nulls with 0
+        df = df.fillna(0)
+
+        # Set the date column as the index
+        df = df.set_index(pd.to_datetime(df['event_date']))
+        df = df[['positive_events', 'negative_events']]
+
+        # Replace the data of the template's lines. More points than the
+        # plot is wide only cost draw time, so long histories are
+        # downsampled first.
+        ax = fig.axes[0]
+        max_points = self.max_points or int(ax.get_window_extent().width)
+        x = df.index.to_numpy()
+        for line, column in zip(ax.get_lines(), df.columns):
+            y = df[column].to_numpy()
+            if self.downsample:
+                keep = downsamplers[self.downsample](x.astype('int64'), y, max_points)
+                line.set_data(x[keep], y[keep])
+            else:
+                line.set_data(x, y)
+
+        # Rescale the axes to the new data
+        if len(x):
+            ax.relim()
+            ax.autoscale_view()
+        else:
+            xlim, ylim = self.thread_state().empty_limits
+            ax.set_xlim(xlim, auto=None)
+            ax.set_ylim(ylim, auto=None)
+
 # Create a subclass of base_components/MatplotlibViz called BarChart
 class BarChart(MatplotlibViz):
     """Bar chart visualizing predicted recruitment risk."""
     
-    # Create a predictor class attribute using load_model
-    predictor = load_model()
+    # Create a predictor class attribute that loads the model on first use
+    predictor = LazyModel()
+
+    # Optional cache of predicted risks, see caching.py
+    risk_cache = None
 
-    def visualization(self, model, asset_id):
-        """Generate a bar chart of predicted recruitment risk.
+    def risk(self, asset_id, model):
+        """Predict the recruitment risk of an employee or a team.
 
         Args:
+            asset_id: The ID to predict for
             model: The model instance (Employee or Team)
-            asset_id: The ID to filter model data
 
         Returns:
-            matplotlib.figure.Figure: The generated bar chart
+            float: The predicted probability, averaged over a team's members
         """
-        # Pass asset_id to the model's model_data method
-        data = model.model_data(asset_id)
-        
+        # Pass asset_id to the model's model_data method. A structured
+        # array skips building a DataFrame, and scikit-learn validates a
+        # plain array several times faster than a DataFrame.
+        data = model.model_data(asset_id, result="array")
+
+        # Pick the features by name, in the order the model was fitted on
+        X = feature_matrix(self.predictor, data)
+
         # Pass data to the predictor's predict_proba method
-        predictions = self.predictor.predict_proba(data)
-        
+        predictions = self.predictor.predict_proba(X)
+
         # Index the second column of predict_proba output
         prob = predictions[:, 1]
-        
+
         # Set pred based on model name
         if model.name == "team":
-            pred = prob.mean()  # Mean for team
-        else:
-            pred = prob[0]  # First value for employee
-        
+            return prob.mean()  # Mean for team
+        return prob[0]  # First value for employee
+
+    def create_template(self):
+        """Create the styled bar chart figure, with a bar of zero width.
+
+        Returns:
+            matplotlib.figure.Figure: Figure with a single horizontal bar
+        """
         # Initialize a matplotlib subplot
-        fig, ax = plt.subplots()
-        
+        fig, ax = self.subplots()
+
         # Run provided code unchanged
-        ax.barh([''], [pred])
+        ax.barh([''], [0])
         ax.set_xlim(0, 1)
         ax.set_title('Predicted Recruitment Risk', fontsize=20)
-        
+
         # Set axis styling with black border and font color
-        self.set_axis_styling(ax=ax, border_color='black', font_color='black')
-        
+        self.set_axis_styling(ax=ax, bordercolor='black', fontcolor='black')
+
         return fig
 
+    def update(self, fig, asset_id, model):
+        """Set the bar to the predicted recruitment risk.
+
+        Args:
+            fig (matplotlib.figure.Figure): Figure from `create_template`
+            asset_id: The ID to filter model data
+            model: The model instance (Employee or Team)
+        """
+        if self.risk_cache is not None:
+            pred = self.risk_cache.get((model.name, asset_id), lambda: self.risk(asset_id, model))
+        else:
+            pred = self.risk(asset_id, model)
+
+        # The x limits are fixed, so only the bar changes
+        bar, = fig.axes[0].patches
+        bar.set_width(pred)
+
+class ChartRangeForm(BaseComponent):
+    """Form choosing the dates and bucket of the event chart."""
+
+    def build_component(self, entity_id=None, model=None):
+        """Build a form reloading the report with the chosen range.
+
+        Args:
+            entity_id: The ID the report is about
+            model: The model instance (Employee or Team)
+
+        Returns:
+            fast_html component: Form with date inputs and a bucket select
+        """
+        requested = chart_range.get()
+        bucket = requested.bucket or Visualizations.children[0].bucket
+        options = [
+            Option(name.title(), value=name, selected="selected" if name == bucket else "")
+            for name in event_buckets
+        ]
+        return Form(
+            Label('From', Input(type='date', name='start', value=requested.start or '')),
+            Label('To', Input(type='date', name='end', value=requested.end or '')),
+            Label('Per', Select(*options, name='bucket')),
+            Button('Plot'),
+            action=f'/{model.name}/{entity_id}', method='get', cls='grid',
+        )
+
 # Create a subclass of combined_components/CombinedComponent called Visualizations
 class Visualizations(CombinedComponent):
     """Component combining LineChart and BarChart visualizations."""
@@ -174,12 +378,12 @@ class Visualizations(CombinedComponent):
 class NotesTable(DataTable):
     """Table component displaying notes data."""
 
-    def component_data(self, model=None, entity_id=None):
+    def component_data(self, entity_id=None, model=None):
         """Retrieve notes data for the given model and entity ID.
 
         Args:
-            model: The model instance (Employee or Team)
             entity_id: The ID to filter notes
+            model: The model instance (Employee or Team)
 
         Returns:
             pd.DataFrame: DataFrame containing notes data
@@ -187,6 +391,8 @@ class NotesTable(DataTable):
         # Pass entity_id to the model's notes method
         if model and entity_id:
             return model.notes(entity_id)
+
+        import pandas as pd
         return pd.DataFrame()
 
 # Provided DashboardFilters class (unchanged)
@@ -215,61 +421,223 @@ class Report(CombinedComponent):
     children = [
         Header(),
         DashboardFilters(),
+        ChartRangeForm(),
         Visualizations(),
         NotesTable()
     ]
 
-# Initialize a fasthtml app
-app = FastAPI()
+# Initialize a fasthtml app. Session cookies are signed with
+# DASHBOARD_SECRET_KEY, or else with a random key FastHTML writes to
+# .sesskey in the working directory on first start. Neither is committed.
+app = FastHTML(secret_key=os.environ.get('DASHBOARD_SECRET_KEY') or None)
 
 # Initialize the Report class
 report = Report()
 
+# A single connection factory shared by every request. The dashboard never
+# writes, so connections are read-only and memory map the database file.
+# Each route thread reuses one connection across queries. Connections are
+# opened again in every process, so the factory is safe to create before
+# the server forks workers. Set DASHBOARD_DB to serve another database
+# file, e.g. one generated for a load test.
+connection_factory = ReadOnlyConnectionFactory(os.environ.get('DASHBOARD_DB') or db_path)
+
+# Set DASHBOARD_SNAPSHOT=1 to answer event_counts, last_event_date,
+# model_data and notes from an in-memory snapshot of the database instead
+# of SQL. It is loaded on first use, and reloaded when the database file
+# changes.
+snapshot = SnapshotEngine(connection_factory) if os.environ.get('DASHBOARD_SNAPSHOT', '').lower() in ('1', 'true', 'yes') else None
+
+# Set DASHBOARD_CACHE_SIZE to cache rendered charts and predicted risks
+# until the database changes, see caching.py
+chart_cache = risk_cache = None
+if caching.cache_size() > 0:
+    chart_cache = caching.VersionedCache(caching.cache_size(), connection_factory.signature)
+    risk_cache = caching.VersionedCache(caching.cache_size(), connection_factory.signature)
+    LineChart.cache = BarChart.cache = chart_cache
+    BarChart.risk_cache = risk_cache
+
+logger = logging.getLogger('dashboard')
+
+# BarChart passes the predictor plain arrays with the features in the
+# order it was fitted on, so the warning about missing feature names
+# does not apply
+warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+
+# Opt-in query/render/prediction timing and a /metrics route,
+# see instrumentation.py
+if instrumentation.enabled():
+    instrumentation.install(app)
+
+# Opt-in sampling profiler for the report routes, see profiling.py
+if profiling.sample_rate() > 0:
+    profiling.install(app)
+
+# Streamed CSV/JSON lines export of every employee's and team's risk,
+# see risk_export.py
+risk_export.install(app, BarChart, connection_factory)
+
+# Set DASHBOARD_WARMUP_BUDGET to render every report in the background
+# at startup, see warmup.py. server.py warms up before forking instead.
+if warmup.budget() > 0:
+    app.router.on_startup.append(partial(warmup.start_background, report, connection_factory, snapshot))
+
+def render_report(entity_id, model, start='', end='', bucket=''):
+    """Render the report of an entity with the requested chart range.
+
+    Returns:
+        fast_html component: The rendered report, or a 400 response when
+            a query parameter is invalid
+    """
+    try:
+        requested = parse_chart_range(start, end, bucket)
+    except ValueError as e:
+        from starlette.responses import Response
+        return Response(str(e), status_code=400)
+
+    token = chart_range.set(requested)
+    try:
+        return report(entity_id, model)
+    finally:
+        chart_range.reset(token)
+
 # Create a route for a GET request to the root
 @app.get("/")
 def get_root():
     """Render the report for a default employee with ID 1."""
-    return report(Employee(), 1)
+    return report(1, Employee(connection_factory=connection_factory, snapshot=snapshot))
 
 # Create a route for a GET request with parameterized employee ID
 @app.get("/employee/{id}")
-def get_employee(id: str):
+@profiling.sampled
+def get_employee(id: str, start: str = '', end: str = '', bucket: str = ''):
     """Render the report for an employee with the specified ID.
 
     Args:
         id (str): The employee ID
+        start (str): Optional first date of the event chart (YYYY-MM-DD)
+        end (str): Optional last date of the event chart (YYYY-MM-DD)
+        bucket (str): Optional "day", "week" or "month" chart resolution
 
     Returns:
         fast_html component: The rendered report
     """
-    return report(Employee(), int(id))
+    model = Employee(connection_factory=connection_factory, snapshot=snapshot)
+    return render_report(int(id), model, start, end, bucket)
 
 # Create a route for a GET request with parameterized team ID
 @app.get("/team/{id}")
-def get_team(id: str):
+@profiling.sampled
+def get_team(id: str, start: str = '', end: str = '', bucket: str = ''):
     """Render the report for a team with the specified ID.
 
     Args:
         id (str): The team ID
+        start (str): Optional first date of the event chart (YYYY-MM-DD)
+        end (str): Optional last date of the event chart (YYYY-MM-DD)
+        bucket (str): Optional "day", "week" or "month" chart resolution
 
     Returns:
         fast_html component: The rendered report
     """
-    return report(Team(), int(id))
+    model = Team(connection_factory=connection_factory, snapshot=snapshot)
+    return render_report(int(id), model, start, end, bucket)
+
+# Snippet highlight markers, replaced by <mark> elements when rendered
+search_highlight = ('\x02', '\x03')
+
+# Notes per search results page
+search_page_size = 20
+
+def highlighted(snippet):
+    """Wrap the matched words of a search snippet in Mark elements.
+
+    The note text stays escaped; only the markers become markup.
+    """
+    start, end = search_highlight
+    parts = []
+    for i, part in enumerate(snippet.split(start)):
+        if i:
+            matched, _, part = part.partition(end)
+            parts.append(Mark(matched))
+        parts.append(part)
+    return Span(*parts)
+
+def search_results(query, page, model, scope=None):
+    """Render a page of note search results with links to the next pages.
+
+    Args:
+        query (str): The words to search for
+        page (int): Page number, starting at 1
+        model: The model instance (Employee or Team) that `scope` is an ID of
+        scope: Optional ID limiting the search to one employee or team
+
+    Returns:
+        fast_html component: The search form and the matching notes
+    """
+    form = Form(
+        Input(type='search', name='q', value=query, placeholder='Search notes'),
+        *([Input(type='hidden', name=model.name, value=scope)] if scope is not None else []),
+        Button('Search'),
+        action='/search', method='get',
+    )
+    if not query.strip():
+        return Div(H1('Search notes'), form)
+
+    # One extra row tells whether there is a next page
+    rows = model.search_notes(query, scope, limit=search_page_size + 1,
+                              offset=(page - 1) * search_page_size,
+                              highlight=search_highlight, result='records')
+    header = Tr(Th('Date'), Th('Employee'), Th('Team'), Th('Note'))
+    table = Table(header, *[
+        Tr(Td(row.note_date), Td(A(row.full_name, href=f'/employee/{row.employee_id}')),
+           Td(A(row.team_name, href=f'/team/{row.team_id}')), Td(highlighted(row.snippet)))
+        for row in rows[:search_page_size]
+    ])
+
+    def page_link(label, number):
+        params = {'q': query, 'page': number, **({model.name: scope} if scope is not None else {})}
+        return A(label, href='/search?' + urlencode(params))
+
+    links = []
+    if page > 1:
+        links.append(page_link('Previous', page - 1))
+    if len(rows) > search_page_size:
+        links.append(page_link('Next', page + 1))
+    summary = P(f'No notes match "{query}"') if not rows else P(*links)
+    return Div(H1('Search notes'), form, table, summary)
+
+@app.get('/search')
+def get_search(q: str = '', page: int = 1, employee: int = None, team: int = None):
+    """Search every note, or one employee's or team's notes.
+
+    Args:
+        q (str): The words to search for
+        page (int): Page of results, 20 notes per page
+        employee (int): Optional employee ID to limit the search to
+        team (int): Optional team ID to limit the search to
+
+    Returns:
+        fast_html component: The search form and results
+    """
+    model, scope = Employee, employee
+    if team is not None:
+        model, scope = Team, team
+    return search_results(q, max(page, 1), model(connection_factory=connection_factory), scope)
 
 # Keep the below code unchanged
 @app.get('/update_dropdown{r}')
 def update_dropdown(r):
     dropdown = DashboardFilters.children[1]
-    print('PARAM', r.query_params['profile_type'])
+    logger.debug('profile_type=%s', r.query_params['profile_type'])
     if r.query_params['profile_type'] == 'Team':
-        return dropdown(None, Team())
+        return dropdown(None, Team(connection_factory=connection_factory, snapshot=snapshot))
     elif r.query_params['profile_type'] == 'Employee':
-        return dropdown(None, Employee())
+        return dropdown(None, Employee(connection_factory=connection_factory, snapshot=snapshot))
 
 @app.post('/update_data')
 async def update_data(r):
-    from fasthtml.common import RedirectResponse
+    from fasthtml.core import RedirectResponse
     data = await r.form()
     profile_type = data._dict['profile_type']
     id = data._dict['user-selection']
@@ -0,0 +1,231 @@
+"""Opt-in timing of queries, component renders and predictions.
+
+Set DASHBOARD_METRICS=1 to enable it. The dashboard then:
+
+- records every employee_events query (SQL, rows returned, duration)
+- records the render time of every BaseComponent and CombinedComponent
+- records every predict_proba call of the recruitment risk model
+- serves all of it at /metrics in the Prometheus text format
+- logs queries slower than DASHBOARD_SLOW_QUERY_MS (default 100) to the
+  "dashboard.slow_query" logger, with their SQL and parameters
+
+Metrics live in process memory, so with server.py each worker reports
+its own numbers.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+slow_query_logger = logging.getLogger('dashboard.slow_query')
+
+# Upper bounds in seconds, covering sub-millisecond lookups to slow pages
+default_buckets = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def enabled():
+    """Whether instrumentation was requested through DASHBOARD_METRICS."""
+    return os.environ.get('DASHBOARD_METRICS', '').lower() in ('1', 'true', 'yes')
+
+
+def slow_query_threshold():
+    """Slow query threshold in seconds, from DASHBOARD_SLOW_QUERY_MS."""
+    return float(os.environ.get('DASHBOARD_SLOW_QUERY_MS', 100)) / 1000
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+
+
+class Histogram:
+    """Cumulative bucket counts, a sum and a count per label set."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=default_buckets):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self.values[label_values] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """The metrics exported at /metrics."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+query_duration = registry.register(Histogram(
+    'employee_events_query_duration_seconds',
+    'Time spent running employee_events queries.',
+    labels=['query'],
+))
+query_rows = registry.register(Counter(
+    'employee_events_query_rows_total',
+    'Rows returned by employee_events queries.',
+    labels=['query'],
+))
+query_errors = registry.register(Counter(
+    'employee_events_query_errors_total',
+    'employee_events queries that raised a database error.',
+    labels=['query'],
+))
+render_duration = registry.register(Histogram(
+    'report_component_render_seconds',
+    'Time spent rendering a report component, including its children.',
+    labels=['component'],
+))
+predict_duration = registry.register(Histogram(
+    'report_predict_proba_seconds',
+    'Time spent in predict_proba of the recruitment risk model.',
+))
+predict_rows = registry.register(Counter(
+    'report_predict_proba_rows_total',
+    'Rows scored by the recruitment risk model.',
+))
+
+
+def record_query(event):
+    """employee_events query listener feeding the query metrics."""
+    query_duration.observe(event.duration, event.name)
+    if event.error is not None:
+        query_errors.inc(event.name)
+    else:
+        query_rows.inc(event.name, amount=event.rows)
+
+    if event.duration >= slow_query_threshold():
+        slow_query_logger.warning(
+            "%s took %.1fms (%s rows): %s params=%r",
+            event.name, event.duration * 1000, event.rows,
+            ' '.join(event.sql.split()), event.params,
+        )
+
+
+def timed_call(call):
+    """Wrap a component's __call__ to record its render time."""
+    @functools.wraps(call)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return call(self, *args, **kwargs)
+        finally:
+            render_duration.observe(time.perf_counter() - start, type(self).__name__)
+    wrapper.instrumented = True
+    return wrapper
+
+
+class InstrumentedModel:
+    """Proxy for a fitted model that times its predict_proba calls."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict_proba(self, X):
+        start = time.perf_counter()
+        try:
+            return self.model.predict_proba(X)
+        finally:
+            predict_duration.observe(time.perf_counter() - start)
+            predict_rows.inc(amount=len(X))
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def install(app):
+    """Turn on instrumentation and add the /metrics route to `app`."""
+    from employee_events import add_query_listener, query_listeners
+    from base_components import BaseComponent
+    from combined_components import CombinedComponent
+    from utils import LazyModel
+    from starlette.responses import Response
+
+    if record_query not in query_listeners:
+        add_query_listener(record_query)
+
+    for cls in (BaseComponent, CombinedComponent):
+        if not getattr(cls.__call__, 'instrumented', False):
+            cls.__call__ = timed_call(cls.__call__)
+
+    LazyModel.wrap = InstrumentedModel
+
+    @app.get('/metrics')
+    def metrics():
+        return Response(
+            registry.exposition(),
+            media_type='text/plain; version=0.0.4; charset=utf-8',
+        )
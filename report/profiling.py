@@ -0,0 +1,186 @@
+"""Opt-in sampling profiler for live report requests.
+
+Set DASHBOARD_PROFILE_RATE to the fraction of report requests to profile,
+e.g. 0.01 for 1%. While a sampled request runs, a background thread reads
+the stack of the thread serving it every DASHBOARD_PROFILE_INTERVAL_MS
+milliseconds (default 5). Stacks are aggregated in the folded format used
+by flamegraph.pl, speedscope and inferno:
+
+    get_employee;dashboard.py:__call__;dashboard.py:visualization 42
+
+Requests that are not sampled only pay for one random() call.
+
+The profile is downloadable from /admin/profile, which is only enabled
+when DASHBOARD_ADMIN_TOKEN is set and requires that token as a bearer
+token or a `token` query parameter. Add `?reset=1` to clear it after
+downloading. With server.py each worker keeps its own profile.
+"""
+import functools
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def sample_rate():
+    """Fraction of requests to profile, from DASHBOARD_PROFILE_RATE."""
+    return float(os.environ.get('DASHBOARD_PROFILE_RATE', 0))
+
+
+def admin_token():
+    """Token guarding the admin routes, from DASHBOARD_ADMIN_TOKEN."""
+    return os.environ.get('DASHBOARD_ADMIN_TOKEN', '')
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{Path(code.co_filename).name}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads from a background thread."""
+
+    def __init__(self, interval=0.005):
+        """Initialize the profiler.
+
+        Args:
+            interval (float): Seconds between samples
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id, root, code):
+        """Start sampling `thread_id` until `stop` is called.
+
+        Args:
+            thread_id (int): Thread serving the request
+            root (str): Name of the stack root, usually the route
+            code: Code object of the route function; frames above it are dropped
+        """
+        with self.lock:
+            self.targets[thread_id] = (root, code)
+            self.requests += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='sampling-profiler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def stop(self, thread_id):
+        with self.lock:
+            self.targets.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                targets = dict(self.targets)
+                if not targets:
+                    # Cleared under the lock, so a `start` adding a target
+                    # after the copy always sets it again afterwards
+                    self.wakeup.clear()
+            if not targets:
+                self.wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id, (root, code) in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.record(root, code, frame)
+            del frames
+
+            time.sleep(self.interval)
+
+    def record(self, root, code, frame):
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame))
+            if frame.f_code is code:
+                break
+            frame = frame.f_back
+        stack = ';'.join([root, *reversed(names)])
+        with self.lock:
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Return the aggregated stacks in the folded flamegraph format."""
+        with self.lock:
+            items = sorted(self.stacks.items())
+        return ''.join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.requests = 0
+
+
+profiler = SamplingProfiler(
+    interval=float(os.environ.get('DASHBOARD_PROFILE_INTERVAL_MS', 5)) / 1000,
+)
+
+
+def sampled(func):
+    """Profile a sample of calls to a synchronous route function.
+
+    Returns `func` unchanged when DASHBOARD_PROFILE_RATE is not set.
+    """
+    rate = sample_rate()
+    if rate <= 0:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if random.random() >= rate:
+            return func(*args, **kwargs)
+
+        thread_id = threading.get_ident()
+        profiler.start(thread_id, func.__name__, func.__code__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.stop(thread_id)
+    return wrapper
+
+
+def authorized(request):
+    """Whether `request` carries the admin token."""
+    token = admin_token()
+    if not token:
+        return False
+
+    supplied = request.query_params.get('token', '')
+    header = request.headers.get('authorization', '')
+    if header.lower().startswith('bearer '):
+        supplied = header[len('bearer '):]
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def install(app):
+    """Add the guarded /admin/profile download route to `app`."""
+    from starlette.responses import Response
+
+    @app.get('/admin/profile')
+    def admin_profile(request):
+        if not authorized(request):
+            return Response('Not Found', status_code=404)
+
+        body = profiler.folded()
+        headers = {
+            'Content-Disposition': 'attachment; filename="profile.folded"',
+            'X-Profile-Samples': str(profiler.samples),
+            'X-Profile-Requests': str(profiler.requests),
+        }
+        if request.query_params.get('reset'):
+            profiler.reset()
+        return Response(body, media_type='text/plain; charset=utf-8', headers=headers)
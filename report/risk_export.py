@@ -0,0 +1,194 @@
+"""Export the predicted recruitment risk of every employee and team.
+
+Scoring one report at a time runs a query and a prediction per entity.
+The export runs one aggregate query over employee_events
+(`Employee.all_model_data`) and predicts every employee of a chunk with a
+single `predict_proba` call on the whole feature matrix. A team's risk is
+the mean of its members' risks, like the dashboard's bar chart.
+Employees without events are scored with event counts of 0, so every
+employee and every team with members is exported.
+
+Rows are streamed: the query is read `chunk_size` employees at a time
+and each row is written as soon as it is scored, so memory depends on
+the chunk size, not on the headcount. With the default chunk size the
+whole company is one chunk and one `predict_proba` call. Employees come
+ordered by team, each team's row following its last member.
+
+A sharded layout (`--shards`, see employee_events/shards.py) is scored
+shard by shard, reading ahead in parallel, in the same team order.
+
+Columns: type ("employee" or "team"), id, name, team_id,
+positive_events, negative_events and risk.
+
+Usage:
+
+    python risk_export.py > risk.csv
+    python risk_export.py --format jsonl --output risk.jsonl
+    python risk_export.py --shards shards/ > risk.csv
+
+or GET /export/risk.csv and /export/risk.jsonl from the dashboard.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+from utils import feature_matrix, load_model
+
+columns = ('type', 'id', 'name', 'team_id', 'positive_events',
+           'negative_events', 'risk')
+
+formats = ('csv', 'jsonl')
+
+media_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def score(predictor, connection_factory=None, chunk_size=10000, router=None):
+    """Yield the risk of every employee and team as dicts of `columns`.
+
+    Args:
+        predictor: Fitted model with a `predict_proba` method
+        connection_factory (ConnectionFactory): Factory used to read the
+            database
+        chunk_size (int): Employees queried and predicted at a time
+        router (ShardRouter): Read a sharded layout instead
+    """
+    from employee_events import Employee
+
+    employees = Employee(connection_factory=connection_factory, router=router)
+    team = None
+    for data in employees.all_model_data(chunk_size):
+        X = feature_matrix(predictor, data)
+        risks = predictor.predict_proba(X)[:, 1]
+
+        for row, risk in zip(data.tolist(), risks.tolist()):
+            (team_id, team_name, employee_id, full_name,
+             positive, negative) = row
+            if team is not None and team['id'] != team_id:
+                yield team_row(team)
+                team = None
+            if team is None:
+                team = {'id': team_id, 'name': team_name,
+                        'positive_events': 0, 'negative_events': 0,
+                        'risk': 0.0, 'members': 0}
+            team['positive_events'] += positive
+            team['negative_events'] += negative
+            team['risk'] += risk
+            team['members'] += 1
+
+            yield {'type': 'employee', 'id': employee_id, 'name': full_name,
+                   'team_id': team_id, 'positive_events': positive,
+                   'negative_events': negative, 'risk': risk}
+
+    if team is not None:
+        yield team_row(team)
+
+
+def team_row(team):
+    return {'type': 'team', 'id': team['id'], 'name': team['name'],
+            'team_id': team['id'],
+            'positive_events': team['positive_events'],
+            'negative_events': team['negative_events'],
+            'risk': team['risk'] / team['members']}
+
+
+def csv_lines(rows):
+    """Yield a CSV header, then one CSV line per row."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator='\n')
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield flush()
+    for row in rows:
+        writer.writerow(row)
+        yield flush()
+
+
+def jsonl_lines(rows):
+    """Yield one JSON object per line per row."""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def export_lines(predictor, format='csv', connection_factory=None,
+                 chunk_size=10000, router=None):
+    """Yield the lines of the export in `format`, "csv" or "jsonl"."""
+    if format not in formats:
+        raise ValueError(f"format must be one of {formats}, not {format!r}")
+    rows = score(predictor, connection_factory, chunk_size, router)
+    return csv_lines(rows) if format == 'csv' else jsonl_lines(rows)
+
+
+def install(app, predictor, connection_factory=None):
+    """Add the /export/risk.csv and /export/risk.jsonl routes to `app`.
+
+    Args:
+        app: The FastHTML app
+        predictor: Object whose `predictor` attribute is the model, e.g.
+            BarChart, so the model is only loaded by the first export
+        connection_factory (ConnectionFactory): Factory used to read the
+            database
+    """
+    from starlette.responses import StreamingResponse
+
+    @app.get('/export/risk.{format}')
+    def export_risk(format: str):
+        if format not in formats:
+            from starlette.responses import Response
+            return Response(f"Unknown format {format!r}", status_code=404)
+        lines = export_lines(predictor.predictor, format, connection_factory)
+        disposition = f'attachment; filename="risk.{format}"'
+        return StreamingResponse(lines, media_type=media_types[format],
+                                 headers={'Content-Disposition': disposition})
+    return export_risk
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the predicted risk of every employee and team")
+    parser.add_argument('--format', choices=formats, default='csv')
+    parser.add_argument('--output',
+                        help="file to write, standard output by default")
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help="employees queried and predicted at a time")
+    parser.add_argument('--shards',
+                        help="directory of a sharded layout to read instead "
+                             "of the database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import warnings
+
+    args = parse_args(argv)
+    # The predictor gets a plain array with the features in fitting order
+    warnings.filterwarnings('ignore',
+                            message='X does not have valid feature names',
+                            category=UserWarning)
+
+    router = None
+    if args.shards:
+        from employee_events import ReadOnlyConnectionFactory, ShardRouter
+        router = ShardRouter.from_directory(args.shards,
+                                            ReadOnlyConnectionFactory)
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        output.writelines(export_lines(load_model(), args.format,
+                                       chunk_size=args.chunk_size,
+                                       router=router))
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,354 @@
+"""Pre-forking production server for the dashboard.
+
+`python dashboard.py` runs FastHTML's single-process development server.
+This module instead loads everything expensive once in a parent process
+(the database connection factory, the pickled predictor, matplotlib's font
+cache, the component tree, and optionally the in-memory snapshot of the
+database and warmed chart caches) and then forks worker processes that
+share those pages copy-on-write. Every worker serves the same listening socket.
+
+Signals sent to the parent process:
+
+    SIGHUP           graceful reload: reload the predictor and the database
+                     snapshot, start a new generation of workers, then let
+                     the old generation finish its in-flight requests and exit.
+                     The pids of both generations are printed.
+    SIGTERM/SIGINT   graceful shutdown
+
+Code changes still need a full restart.
+
+Usage:
+
+    python server.py --workers 4 --threads 8
+    python server.py scale --max-workers 8
+"""
+import argparse
+import asyncio
+import gc
+import io
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+
+def preload(reload=False):
+    """Load the app and its shared state in the current process.
+
+    Args:
+        reload (bool): Re-read the pickled predictor from disk
+
+    Returns:
+        The FastHTML app from dashboard.py
+    """
+    import dashboard
+    import warmup
+    from base_components import load_matplotlib
+
+    # The app defers its heavy imports until first use to start quickly.
+    # Here we want the opposite: load everything once, before forking.
+    import pandas  # noqa: F401
+    import fasthtml.components  # noqa: F401
+    import fasthtml.pico  # noqa: F401
+
+    if reload:
+        vars(dashboard.BarChart)['predictor'].reload()
+    dashboard.BarChart.predictor
+
+    dashboard.connection_factory.preload()
+    if dashboard.snapshot is not None:
+        dashboard.snapshot.reload()
+
+    # Build the font cache and load the default font file by rendering
+    # one throwaway figure, so workers never do it on their first request
+    Figure = load_matplotlib()
+    import matplotlib.pyplot  # noqa: F401  (used by DataFrame.plot)
+    fig = Figure()
+    fig.text(0.5, 0.5, 'preload')
+    fig.savefig(io.BytesIO(), format='png')
+
+    # Render every report once, within DASHBOARD_WARMUP_BUDGET seconds, so
+    # workers inherit filled chart and risk caches. A reload may come with
+    # a new predictor, so cached risks and charts are dropped first.
+    for cache in (dashboard.chart_cache, dashboard.risk_cache):
+        if cache is not None and reload:
+            cache.clear()
+    if warmup.budget() > 0:
+        stats = warmup.warm(
+            warmup.all_paths(dashboard.connection_factory),
+            warmup.report_renderer(dashboard.report, dashboard.connection_factory, dashboard.snapshot),
+            warmup.concurrency(),
+            warmup.budget(),
+        )
+        print(f"Warmed {stats['warmed']} reports in {stats['elapsed']:.1f}s "
+              f"({stats['failed']} failed, {stats['skipped']} skipped)", flush=True)
+
+    # Move everything loaded so far out of the garbage collector's
+    # generations. Otherwise the first collection in each worker touches
+    # every object and un-shares the pages we just preloaded.
+    gc.freeze()
+
+    return dashboard.app
+
+
+def bind_socket(host, port, backlog=2048):
+    """Create the listening socket shared by every worker.
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free port
+        backlog (int): Listen backlog
+
+    Returns:
+        socket.socket: The bound, listening socket
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, threads, graceful_timeout):
+    """Serve `app` on `sock` until the worker receives SIGTERM.
+
+    Args:
+        app: The ASGI app
+        sock (socket.socket): The shared listening socket
+        threads (int): Size of the thread pool that runs synchronous routes
+        graceful_timeout (int): Seconds to wait for in-flight requests on shutdown
+    """
+    import anyio.to_thread
+    import uvicorn
+
+    config = uvicorn.Config(
+        app,
+        lifespan='off',
+        log_level='warning',
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+    server = uvicorn.Server(config)
+
+    async def serve():
+        # FastHTML runs synchronous route handlers in anyio's thread pool,
+        # so its size is the number of concurrent renders per worker
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+        await server.serve(sockets=[sock])
+
+    asyncio.run(serve())
+
+
+class PreforkServer:
+    """Parent process that forks, supervises and reloads workers."""
+
+    def __init__(self, host='127.0.0.1', port=5001, workers=None, threads=8, graceful_timeout=30):
+        """Initialize the server.
+
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind
+            workers (int): Number of worker processes, defaults to the CPU count
+            threads (int): Concurrent requests per worker
+            graceful_timeout (int): Seconds old workers get to finish on reload or shutdown
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.pids = set()
+        self.app = None
+        self.sock = None
+        self._retiring = set()
+        self._stopping = False
+        self._reload_requested = False
+
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            status = 0
+            try:
+                run_worker(self.app, self.sock, self.threads, self.graceful_timeout)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        self.pids.add(pid)
+        return pid
+
+    def spawn_workers(self):
+        return {self.spawn_worker() for _ in range(self.workers)}
+
+    def stop_workers(self, pids, sig=signal.SIGTERM):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.pids.discard(pid)
+
+    def reap(self):
+        """Collect exited workers and return their pids."""
+        exited = set()
+        while self.pids:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            self.pids.discard(pid)
+            exited.add(pid)
+        return exited
+
+    def reload(self):
+        """Reload shared state and replace every worker without dropping requests."""
+        old = set(self.pids)
+        self.app = preload(reload=True)
+        new = self.spawn_workers()
+        self.stop_workers(old)
+        self._retiring.update(old)
+        print(f"Reloaded: workers {format_pids(new)} replace {format_pids(old)}", flush=True)
+
+    def handle_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        else:
+            self._stopping = True
+
+    def run(self):
+        self.app = preload()
+        self.sock = bind_socket(self.host, self.port)
+        self.port = self.sock.getsockname()[1]
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_signal)
+
+        pids = self.spawn_workers()
+        print(f"Serving on http://{self.host}:{self.port} "
+              f"with {self.workers} workers x {self.threads} threads "
+              f"(workers {format_pids(pids)})", flush=True)
+
+        while not self._stopping:
+            if self._reload_requested:
+                self._reload_requested = False
+                self.reload()
+
+            for pid in self.reap():
+                # Replace workers that died unexpectedly, but not the ones
+                # we retired during a reload
+                if pid in self._retiring:
+                    self._retiring.discard(pid)
+                elif not self._stopping:
+                    self.spawn_worker()
+
+            time.sleep(0.1)
+
+        self.stop_workers(set(self.pids))
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.pids and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        self.stop_workers(set(self.pids), signal.SIGKILL)
+        self.sock.close()
+
+
+def format_pids(pids):
+    """Worker pids as logged, e.g. "101 102"."""
+    return ' '.join(str(pid) for pid in sorted(pids))
+
+
+def wait_until_ready(url, timeout=60):
+    """Poll `url` until it answers or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not become ready within {timeout}s")
+
+
+def measure_throughput(url, duration=10.0, concurrency=16):
+    """Request `url` from `concurrency` client threads for `duration` seconds.
+
+    Returns:
+        float: Completed requests per second
+    """
+    deadline = time.monotonic() + duration
+
+    def client():
+        done = 0
+        while time.monotonic() < deadline:
+            with urlopen(url, timeout=30) as response:
+                response.read()
+            done += 1
+        return done
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        total = sum(pool.map(lambda _: client(), range(concurrency)))
+    return total / (time.monotonic() - start)
+
+
+def scale(args):
+    """Measure throughput of `args.path` for 1..`args.max_workers` workers."""
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        proc = subprocess.Popen([
+            sys.executable, __file__,
+            '--host', args.host, '--port', str(args.port),
+            '--workers', str(workers), '--threads', str(args.threads),
+        ], cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL)
+        try:
+            url = f"http://{args.host}:{args.port}{args.path}"
+            wait_until_ready(url)
+            rps = measure_throughput(url, args.duration, args.concurrency)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait()
+        baseline = baseline or rps
+        print(f"{workers:>8} {rps:>10.1f} {rps / baseline:>7.2f}x", flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'scale'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=8,
+                        help="concurrent requests per worker")
+    parser.add_argument('--graceful-timeout', type=int, default=30)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                        help="scale: largest worker count to measure")
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help="scale: seconds of load per worker count")
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help="scale: concurrent client connections")
+    parser.add_argument('--path', default='/employee/1',
+                        help="scale: route to request")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'scale':
+        scale(args)
+    else:
+        PreforkServer(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            graceful_timeout=args.graceful_timeout,
+        ).run()
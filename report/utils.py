@@ -1,13 +1,17 @@
+import os
 import pickle
+import threading
 from pathlib import Path
 
 # Using the Path object, create a project_root variable
 # set to the absolute path for the root of this project directory
-project_root = Path(__file__).parent.absolute()
+project_root = Path(__file__).parent.parent.absolute()
 
 # Using the project_root variable, create a model_path variable
-# that points to the file model.pkl inside the assets directory
-model_path = project_root / "assets" / "model.pkl"
+# that points to the file model.pkl inside the assets directory.
+# Set DASHBOARD_MODEL to serve another pickled model, e.g. one retrained
+# with `build_project_assets.py --train-only`.
+model_path = Path(os.environ.get('DASHBOARD_MODEL') or project_root / "assets" / "model.pkl")
 
 def load_model():
     """Load a machine learning model from a pickle file.
@@ -18,3 +22,54 @@ def load_model():
     with model_path.open('rb') as file:
         model = pickle.load(file)
     return model
+
+
+def feature_matrix(predictor, data):
+    """Stack the predictor's features from a structured array into a float matrix.
+
+    Features are picked by name, in the order the predictor was fitted on.
+
+    Args:
+        predictor: A fitted model, ideally with `feature_names_in_`
+        data (numpy.ndarray): Structured array with one field per feature
+
+    Returns:
+        numpy.ndarray: Array of shape (len(data), number of features)
+    """
+    import numpy as np
+
+    features = getattr(predictor, 'feature_names_in_', data.dtype.names)
+    return np.column_stack([data[name].astype(float) for name in features])
+
+
+class LazyModel:
+    """Class attribute that loads the model on first access.
+
+    Unpickling the model imports scikit-learn, which dominates start-up
+    time, so it is deferred until a chart actually needs a prediction.
+
+    Example:
+        class BarChart(MatplotlibViz):
+            predictor = LazyModel()
+    """
+
+    # Optional callable applied to every model after it is loaded, used by
+    # instrumentation.py to time predictions
+    wrap = None
+
+    def __init__(self, loader=load_model):
+        self.loader = loader
+        self.model = None
+        self.lock = threading.Lock()
+
+    def __get__(self, instance, owner=None):
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    self.reload()
+        return self.model
+
+    def reload(self):
+        """Load the model now, replacing any previously loaded one."""
+        model = self.loader()
+        self.model = self.wrap(model) if self.wrap else model
@@ -0,0 +1,228 @@
+"""Warm the dashboard before users hit it.
+
+After a deploy or restart, the first request for every employee and team
+pays for the queries, the prediction and both charts. Warming renders
+every report page once, with at most `concurrency` pages rendering at a
+time. Pages still waiting when the time budget runs out are skipped.
+
+Warming fills what the serving process keeps between requests: the
+chart and risk caches when DASHBOARD_CACHE_SIZE is set (see caching.py)
+and the snapshot when DASHBOARD_SNAPSHOT is set. Query results are not
+cached. Running the queries only loads the database pages into the
+memory map and the OS page cache.
+
+Pages are every employee and team from `Employee.names()` and
+`Team.names()`, or the paths listed one per line in a recent-traffic
+file, e.g. `/employee/3`.
+
+Those caches live in the memory of the process serving the pages, so
+they have to be filled there:
+
+- Startup hook: set DASHBOARD_WARMUP_BUDGET to a number of seconds.
+  server.py then warms up in the parent process before forking, so every
+  worker inherits the caches, and `python dashboard.py` warms up in a
+  background thread. DASHBOARD_WARMUP_CONCURRENCY sets the concurrency
+  (default 4).
+- Command line: requests every page from a running server at `--url`,
+  e.g. after a deploy without the startup hook. It lists the pages from
+  the database in DASHBOARD_DB, as the dashboard does.
+
+Usage:
+
+    python warmup.py --url http://127.0.0.1:5001
+    python warmup.py --url http://127.0.0.1:5001 --recent recent.txt \
+        --budget 30 --concurrency 8
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.request import urlopen
+
+logger = logging.getLogger('dashboard.warmup')
+
+
+def budget():
+    """Startup warm-up budget in seconds, from DASHBOARD_WARMUP_BUDGET.
+
+    0 disables the startup warm-up.
+    """
+    return float(os.environ.get('DASHBOARD_WARMUP_BUDGET', 0))
+
+
+def concurrency():
+    """Pages warmed at once, from DASHBOARD_WARMUP_CONCURRENCY."""
+    return int(os.environ.get('DASHBOARD_WARMUP_CONCURRENCY', 4))
+
+
+def all_paths(connection_factory=None):
+    """Report paths of every employee and team in the database."""
+    from employee_events import Employee, Team
+
+    paths = []
+    for model in (Employee(connection_factory=connection_factory),
+                  Team(connection_factory=connection_factory)):
+        paths.extend(f'/{model.name}/{id}' for _, id in model.names())
+    return paths
+
+
+def read_paths(file):
+    """Report paths listed in a recent-traffic file, most important first.
+
+    Blank lines, duplicates and paths that are not employee or team
+    reports are ignored.
+    """
+    paths = []
+    with open(file) as lines:
+        for line in lines:
+            path = line.strip()
+            if path.startswith(('/employee/', '/team/')) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def report_renderer(report, connection_factory=None, snapshot=None):
+    """Return a function rendering the report page of a path here.
+
+    Only warms this process. Used by the startup hook, in the process that
+    serves the pages.
+    """
+    from employee_events import Employee, Team
+
+    models = {'employee': Employee, 'team': Team}
+
+    def render(path):
+        _, name, id = path.split('/')
+        report(int(id), models[name](connection_factory=connection_factory,
+                                     snapshot=snapshot))
+    return render
+
+
+def url_fetcher(base_url):
+    """Return a function requesting a path from a running server."""
+    def fetch(path):
+        with urlopen(base_url.rstrip('/') + path, timeout=60) as response:
+            response.read()
+    return fetch
+
+
+def log_progress(done, total, path, seconds, error=None):
+    if error is not None:
+        logger.warning("[%d/%d] %s failed after %.0fms: %s",
+                       done, total, path, seconds * 1000, error)
+    else:
+        logger.info("[%d/%d] %s %.0fms", done, total, path, seconds * 1000)
+
+
+def warm(paths, render, concurrency=4, budget=None, progress=log_progress):
+    """Call `render(path)` for every path, `concurrency` at a time.
+
+    Args:
+        paths (list[str]): Report paths, in the order to warm them
+        render (callable): Renders one path
+        concurrency (int): Renders running at once
+        budget (float): Seconds after which no new render is started.
+            Renders already running are finished. None for no limit.
+        progress (callable): Called after each render with the number of
+            finished renders, the total, the path, its duration in
+            seconds and the exception it raised, if any
+
+    Returns:
+        dict: Counts of warmed, failed and skipped paths, and the elapsed
+            seconds
+    """
+    start = time.monotonic()
+    deadline = start + budget if budget else float('inf')
+    stats = {'warmed': 0, 'failed': 0, 'skipped': 0}
+
+    def timed(path):
+        t0 = time.perf_counter()
+        try:
+            render(path)
+        except Exception as e:
+            return path, time.perf_counter() - t0, e
+        return path, time.perf_counter() - t0, None
+
+    remaining = iter(paths)
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix='warmup') as pool:
+        running = set()
+        while True:
+            while len(running) < concurrency and time.monotonic() < deadline:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                running.add(pool.submit(timed, path))
+            if not running:
+                break
+
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, seconds, error = future.result()
+                stats['failed' if error else 'warmed'] += 1
+                if progress:
+                    done = stats['warmed'] + stats['failed']
+                    progress(done, len(paths), path, seconds, error)
+
+    stats['skipped'] = len(paths) - stats['warmed'] - stats['failed']
+    stats['elapsed'] = time.monotonic() - start
+    return stats
+
+
+def start_background(report, connection_factory=None, snapshot=None):
+    """Warm every report page in a daemon thread, within `budget()` seconds."""
+    def run():
+        render = report_renderer(report, connection_factory, snapshot)
+        stats = warm(all_paths(connection_factory), render,
+                     concurrency(), budget())
+        logger.info("Warm-up finished: %(warmed)d warmed, %(failed)d failed, "
+                    "%(skipped)d skipped in %(elapsed).1fs", stats)
+
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Request every report page once to warm a running "
+                    "dashboard")
+    # Warming this process would fill caches that are gone once it exits,
+    # see the startup hook to warm a server as it starts
+    parser.add_argument('--url', required=True,
+                        help="base URL of the server to warm")
+    parser.add_argument('--recent',
+                        help="file of report paths to warm, one per line, "
+                             "instead of every entity")
+    parser.add_argument('--concurrency', type=int, default=concurrency())
+    parser.add_argument('--budget', type=float, default=budget() or None,
+                        help="seconds after which no new page is started")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    render = url_fetcher(args.url)
+    if args.recent:
+        paths = read_paths(args.recent)
+    else:
+        from employee_events import ReadOnlyConnectionFactory, db_path
+        path = os.environ.get('DASHBOARD_DB') or db_path
+        paths = all_paths(ReadOnlyConnectionFactory(path))
+
+    def progress(done, total, path, seconds, error=None):
+        status = f"failed: {error}" if error else f"{seconds * 1000:.0f}ms"
+        print(f"[{done}/{total}] {path} {status}", flush=True)
+
+    stats = warm(paths, render, args.concurrency, args.budget, progress)
+    print(f"Warmed {stats['warmed']} of {len(paths)} pages "
+          f"in {stats['elapsed']:.1f}s "
+          f"({stats['failed']} failed, {stats['skipped']} skipped)")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
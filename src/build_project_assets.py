@@ -1,175 +1,448 @@
 import pandas as pd
 from pathlib import Path
 import numpy as np
-import random, pickle, json
+import argparse, os, pickle, json, sys
+from concurrent.futures import ProcessPoolExecutor
 from sqlite3 import connect
 from datetime import timedelta, date
 from sklearn.linear_model import LogisticRegression
-from scipy.stats import norm, expon, uniform, skewnorm
 
 
-cwd = Path('.').resolve()
+src_path = Path(__file__).resolve().parent
+data_path = src_path / 'generated_data'
+default_db_path = src_path.parent / 'python-package' / 'employee_events' / 'employee_events.db'
+default_model_path = src_path.parent / 'assets' / 'model.pkl'
 
-def left_skew(a, loc, size=500):
-    r = skewnorm.rvs(a = a , loc=loc, size=size) 
-    r = r - min(r)     
-    r= r / max(r) 
-    r = r * loc  
-    r = r.astype(int)       
-    return random.choice(r)
+sys.path.insert(0, str(src_path.parent / 'python-package'))
+from employee_events import create_indexes, create_notes_index, create_team_timelines
 
+def left_skew(rng, loc, size, samples=500):
+    """Draw `size` values from a strongly left-skewed distribution on [0, loc].
 
+    Each value is one of `samples` skew-normal draws with a large negative
+    shape, rescaled to [0, loc] and truncated to an integer. With that
+    shape, skew-normal draws are minus the absolute value of a standard
+    normal.
+    """
+    r = -np.abs(rng.standard_normal((size, samples)))
+    r = r - r.min(axis=1, keepdims=True)
+    r = r / r.max(axis=1, keepdims=True)
+    pick = rng.integers(samples, size=size)
+    return (r[np.arange(size), pick] * loc).astype(int)
+
+
+# Daily positive and negative event counts of each behaviour profile, as
+# functions of a np.random.Generator and the number of days, and the
+# chance that an employee of the profile was recruited
 profiles = {
     'good': {
-        'positive': lambda: norm.rvs(loc=norm.rvs(4), scale=1).astype(int),
-        'negative': lambda: expon.rvs(loc=0, scale=np.random.choice([.5, 1])).astype(int),
+        'positive': lambda rng, size: rng.normal(rng.normal(4, 1, size), 1).astype(int),
+        'negative': lambda rng, size: rng.exponential(rng.choice([.5, 1], size)).astype(int),
         'chance': .5
     },
     'normal': {
-        'positive': lambda: norm.rvs(loc=norm.rvs(3), scale=1).astype(int),
-        'negative': lambda: norm.rvs(loc=2, scale=np.random.choice([.5, 1,2,3])).astype(int),
+        'positive': lambda rng, size: rng.normal(rng.normal(3, 1, size), 1).astype(int),
+        'negative': lambda rng, size: rng.normal(2, rng.choice([.5, 1, 2, 3], size)).astype(int),
         'chance': .15
     },
     'poor': {
-        'positive': lambda: expon.rvs(loc=0, scale=.5).astype(int),
-        'negative': lambda: norm.rvs(loc=.5).astype(int),
+        'positive': lambda rng, size: rng.exponential(.5, size).astype(int),
+        'negative': lambda rng, size: rng.normal(.5, 1, size).astype(int),
         'chance': .1
     },
     'chaotic_good': {
-        'positive': lambda: left_skew(-1000, 5).astype(int),
-        'negative': lambda: np.random.choice([0, np.random.choice([50, 200])], p=[.98, .02]),
+        'positive': lambda rng, size: left_skew(rng, 5, size),
+        'negative': lambda rng, size: np.where(rng.random(size) < .02, rng.choice([50, 200], size), 0),
         'chance': .2
     },
     'chotic_bad': {
-        'positive': lambda: expon.rvs(loc=0, scale=5).astype(int),
-        'negative': lambda: left_skew(-1000, 10).astype(int),
+        'positive': lambda rng, size: rng.exponential(5, size).astype(int),
+        'negative': lambda rng, size: left_skew(rng, 10, size),
         'chance': .2
     }
 }
 
-employees = {}
-is_recruited = lambda x: np.random.choice([0, 1], p=[1-x, x])
-
-for employee_id in range(1, 26):
-
 
-    employee_type = random.choice(list(profiles.keys()))
-    event_distribution = profiles[employee_type]
-    team_id = random.choice(range(1, 6))
-    recruited = is_recruited(event_distribution['chance'])
-
-    employees[employee_id] = dict(
-        employee_type=employee_type,
-        event_distribution=event_distribution,
-        team_id=team_id,
-        recruited=recruited
+def weekdays(days=365, end=None):
+    """The weekdays of the `days` days up to `end` (default: today) as YYYY-MM-DD."""
+    end = end or date.today()
+    daterange = pd.date_range(end - timedelta(days=days), end)
+    return daterange[daterange.weekday < 5].strftime('%Y-%m-%d').to_numpy()
+
+
+def generate_partition(employee_ids, seeds, n_teams, n_days):
+    """Generate the settings and daily events of a range of employees.
+
+    Every employee draws from its own generator, seeded by its entry in
+    `seeds`, so an employee's data does not depend on which partition or
+    process generated it.
+
+    Args:
+        employee_ids (list[int]): Employees to generate
+        seeds (list[np.random.SeedSequence]): One seed per employee
+        n_teams (int): Number of teams to assign employees to
+        n_days (int): Number of weekdays to generate events for
+
+    Returns:
+        tuple: Employee settings keyed by employee_id, and the positive
+            and negative event counts as (employees, days) arrays
+    """
+    names = list(profiles)
+    employees = {}
+    positive = np.empty((len(employee_ids), n_days), dtype=np.int64)
+    negative = np.empty((len(employee_ids), n_days), dtype=np.int64)
+
+    for i, (employee_id, seed) in enumerate(zip(employee_ids, seeds)):
+        rng = np.random.default_rng(seed)
+        employee_type = names[rng.integers(len(names))]
+        distribution = profiles[employee_type]
+        employees[employee_id] = dict(
+            employee_type=employee_type,
+            team_id=int(rng.integers(1, n_teams + 1)),
+            recruited=int(rng.random() < distribution['chance']),
+        )
+        positive[i] = distribution['positive'](rng, n_days)
+        negative[i] = distribution['negative'](rng, n_days)
+
+    return employees, positive, negative
+
+
+def generate_events(seed_sequence, n_employees=25, n_teams=5, days=365, end=None, workers=1):
+    """Generate employees and one row of daily event counts per employee and weekday.
+
+    Employees are split into partitions generated by a pool of `workers`
+    processes. The output only depends on `seed_sequence`, never on the
+    number of workers.
+
+    Args:
+        seed_sequence (np.random.SeedSequence): Root seed; one child is
+            spawned per employee
+        n_employees (int): Number of employees
+        n_teams (int): Number of teams
+        days (int): Days of event history
+        end (date): Last day of the history, default today
+        workers (int): Processes generating partitions, 1 to generate in
+            this process
+
+    Returns:
+        pd.DataFrame: One row per weekday and employee, ordered by date
+            then employee
+    """
+    dates = weekdays(days, end)
+    ids = list(range(1, n_employees + 1))
+    seeds = seed_sequence.spawn(n_employees)
+
+    # A few partitions per worker keep every process busy until the end
+    bounds = np.linspace(0, n_employees, max(1, min(n_employees, workers * 4)) + 1).astype(int)
+    partitions = [(ids[start:stop], seeds[start:stop], n_teams, len(dates))
+                  for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(generate_partition, *zip(*partitions)))
+    else:
+        results = [generate_partition(*partition) for partition in partitions]
+
+    employees = {}
+    for partition_employees, _, _ in results:
+        employees.update(partition_employees)
+    positive = np.concatenate([positive for _, positive, _ in results])
+    negative = np.concatenate([negative for _, _, negative in results])
+
+    # Date-major order: every employee's row for the first day, then the next
+    n_days = len(dates)
+    return pd.DataFrame({
+        'employee_id': np.tile(ids, n_days),
+        'team_id': np.tile([employees[id]['team_id'] for id in ids], n_days),
+        'event_date': np.repeat(dates, n_employees),
+        'positive_events': positive.T.ravel(),
+        'negative_events': negative.T.ravel(),
+        'recruited': np.tile([employees[id]['recruited'] for id in ids], n_days),
+    })
+
+
+def load_generated_data():
+    """Load the names, managers, shifts and notes in generated_data/."""
+    generated = {}
+    for name in ['employees', 'managers', 'shifts', 'team_names']:
+        with (data_path / f'{name}.json').open('r') as file:
+            generated[name] = json.load(file)
+    return generated
+
+
+def build_tables(df, generated, rng):
+    """Split the generated events into the employee_events database tables.
+
+    Employees and teams beyond the ones listed in generated_data/ reuse
+    those names, notes and shifts in order.
+
+    Args:
+        df (pd.DataFrame): Output of `generate_events`
+        generated (dict): Output of `load_generated_data`
+        rng (np.random.Generator): Draws note dates and team managers
+
+    Returns:
+        tuple: The employee, team, notes and employee_events DataFrames,
+            plus the merged DataFrame used to train the model
+    """
+    employee = generated['employees']
+    managers = generated['managers']
+    shift = generated['shifts']
+    team_names = generated['team_names']
+
+    _ = []
+    for idx in range(1, df.employee_id.max() + 1):
+        e = employee[(idx - 1) % len(employee)]
+
+        for note in e['notes']:
+            _.append([idx, e['name'], note])
+
+    notes = pd.DataFrame(_, columns=['employee_id', 'employee_name', 'note']).assign(
+                event_date=rng.choice(df.event_date.to_numpy(), size=len(_), replace=True)
     )
-    
 
-today = date.today()
-last_year = today - timedelta(days=365)
-daterange = pd.date_range(last_year, today)
-data = []
 
-for day in daterange:
+    df = df.merge(notes[['employee_id', 'event_date', 'note']], on=['employee_id', 'event_date'], how='left').merge(notes[['employee_id', 'employee_name']].drop_duplicates(), on=['employee_id'])
 
-    if day.weekday() < 5:
+    df = df.assign(shift=df.team_id.apply(lambda x: shift[(x-1) % len(shift)]))
 
-        for employee, config in employees.items():
-            config['events'] = config.get('events', {})
-            employee_type = config['employee_type']
-            positive = profiles[employee_type]['positive']() 
-            negative = profiles[employee_type]['negative']()
-            data.append([
-                employee,
-                config['team_id'],
-                day.strftime('%Y-%m-%d'),
-                positive,
-                negative,
-                config['recruited'],
-                ]
-                
-                )
+    team_map = {}
+    for team in df.team_id.unique():
+        team_map[team] = managers[rng.integers(len(managers))]
 
+    def team_name(x):
+        name = team_names[(x-1) % len(team_names)]
+        repeat = (x-1) // len(team_names)
+        return f'{name} {repeat + 1}' if repeat else name
 
-df = pd.DataFrame(data, columns=['employee_id', 'team_id', 'event_date', 'positive_events', 'negative_events', 'recruited'])
+    df['manager_name'] = df.team_id.map(team_map)
+    df['team_name'] = df.team_id.apply(team_name)
 
-data_path = cwd / 'generated_data'
-employees_path = data_path / 'employees.json'
-managers_path = data_path / 'managers.json'
-shifts_path = data_path / 'shifts.json'
-teams_path = data_path / 'team_names.json'
 
-with employees_path.open('r') as file:
-    employee = json.load(file)
+    employee = df.drop_duplicates('employee_id').assign(
+        first_name = lambda x: x.employee_name.str.split().str[0],
+        last_name = lambda x: x.employee_name.str.split().str[1],
+    )[['employee_id', 'first_name', 'last_name', 'team_id']]
 
-with managers_path.open('r') as file:
-    managers = json.load(file)   
+    events = df[['event_date', 'employee_id', 'team_id', 'positive_events', 'negative_events']]
 
-with shifts_path.open('r') as file:
-    shift = json.load(file)
+    team = df.drop_duplicates('team_id')[['team_id', 'team_name', 'shift', 'manager_name']]
 
-with teams_path.open('r') as file:
-    team_names = json.load(file)
+    notes = df.dropna()[['employee_id', 'team_id', 'note', 'event_date']].rename(columns={'event_date':'note_date'})
+    # Explicit ids keep the notes search index valid across a VACUUM, see search.py
+    notes.insert(0, 'note_id', range(1, len(notes) + 1))
 
-_ = []
-for idx, e in enumerate(employee, start=1):
+    return employee, team, notes, events, df
 
-    for note in e['notes']:
-        _.append([idx, e['name'], note])
 
-notes = pd.DataFrame(_, columns=['employee_id', 'employee_name', 'note']).assign(
-            event_date=np.random.choice(df.event_date, size=len(_), replace=True)
-)
+# Bumped whenever the features or the estimator change, so loaders can
+# tell which models they understand
+model_format_version = 1
 
+features = ['positive_events', 'negative_events']
 
-df = df.merge(notes[['employee_id', 'event_date', 'note']], on=['employee_id', 'event_date'], how='left').merge(notes[['employee_id', 'employee_name']].drop_duplicates(), on=['employee_id'])
 
-df = df.assign(shift=df.team_id.apply(lambda x: shift[x-1]))
+def employee_features(db_path, chunk_size=10000):
+    """Sum every employee's events in SQL and read the sums in chunks.
 
-team_map = {}
-for team in df.team_id.unique():
-    team_map[team] = random.choice(managers)
+    SQLite aggregates `employee_events` with a sort that spills to disk,
+    and only one chunk of sums is converted at a time, so memory grows
+    with the number of employees, never with the number of events.
 
-df['manager_name'] = df.team_id.map(team_map)
-df['team_name'] = df.team_id.apply(lambda x: team_names[x-1])
+    Returns:
+        pd.DataFrame: The `features` of every employee with events,
+            indexed and ordered by employee_id
+    """
+    from employee_events import Employee
 
+    query = f"""
+        SELECT employee_id
+             , {', '.join(f'SUM({name}) AS {name}' for name in features)}
+        FROM employee_events
+        GROUP BY employee_id
+    """
 
-employee = df.drop_duplicates('employee_id').assign(
-    first_name = lambda x: x.employee_name.str.split().str[0],
-    last_name = lambda x: x.employee_name.str.split().str[1],
-)[['employee_id', 'first_name', 'last_name', 'team_id']]
+    columns = {name: [] for name in ['employee_id', *features]}
+    for chunk in Employee(db_path).fetch_chunks(query, size=chunk_size, result='array'):
+        for name, values in columns.items():
+            values.append(chunk[name])
 
-events = df[['event_date', 'employee_id', 'team_id', 'positive_events', 'negative_events']]
+    sums = pd.DataFrame({name: np.concatenate(values) if values else np.array([], dtype=np.int64)
+                         for name, values in columns.items()})
+    return sums.set_index('employee_id').sort_index()
 
-team = df.drop_duplicates('team_id')[['team_id', 'team_name', 'shift', 'manager_name']]
 
-notes = df.dropna()[['employee_id', 'team_id', 'note', 'event_date']].rename(columns={'event_date':'note_date'})
+def read_labels(path):
+    """Read recruited labels from a CSV file with employee_id and recruited columns.
 
-model = LogisticRegression(penalty=None)
+    Returns:
+        pd.Series: 1 for recruited employees and 0 otherwise, indexed by employee_id
+    """
+    return pd.read_csv(path, index_col='employee_id')['recruited']
 
-X = events.groupby('employee_id')[['positive_events', 'negative_events']].sum()
-y = X.join(df.drop_duplicates('employee_id').set_index('employee_id')[['recruited']]).recruited
 
-model.fit(X, y)
+def train_model(X, y):
+    """Fit the recruitment risk model on per-employee event sums.
 
-X.assign(true=y, pred=model.predict_proba(X)[:,1])
+    Args:
+        X (pd.DataFrame): `features` per employee, from `employee_features`
+        y (pd.Series): recruited label per employee
 
+    Returns:
+        LogisticRegression: The fitted model, with its `metadata_`
+    """
+    y = y.reindex(X.index)
+    if y.isna().any():
+        missing = list(X.index[y.isna()][:5])
+        raise ValueError(f"No recruited label for employees {missing}...")
 
-model_path = cwd.parent / 'assets' / 'model.pkl'
+    model = LogisticRegression(penalty=None)
+    model.fit(X[features], y.astype(int))
+    model.metadata_ = model_metadata(X, y)
+    return model
 
-with model_path.open('wb') as file:
 
-    pickle.dump(model, file)
+def model_metadata(X, y):
+    """Describe a model's training data and environment.
 
+    Contains no timestamp, so retraining on the same data pickles the
+    same bytes. `data_sha256` identifies the training data instead.
+    """
+    import hashlib
+    import platform
+    import sklearn
 
-db_path = cwd.parent / 'python-package' / 'employee_events' / 'employee_events.db'
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X.index.to_numpy(dtype=np.int64)).tobytes())
+    digest.update(np.ascontiguousarray(X[features].to_numpy(dtype=np.int64)).tobytes())
+    digest.update(np.ascontiguousarray(y.to_numpy(dtype=np.int64)).tobytes())
 
-connection = connect(db_path)
+    return {
+        'format_version': model_format_version,
+        'features': list(features),
+        'n_employees': len(X),
+        'n_recruited': int(y.sum()),
+        'total_events': int(X[features].to_numpy().sum()),
+        'data_sha256': digest.hexdigest(),
+        'python_version': platform.python_version(),
+        'numpy_version': np.__version__,
+        'pandas_version': pd.__version__,
+        'sklearn_version': sklearn.__version__,
+    }
 
-employee.to_sql('employee', connection, if_exists='replace')
-team.to_sql('team', connection, if_exists='replace')
-notes.to_sql('notes', connection, if_exists='replace')
-events.to_sql('employee_events', connection, if_exists='replace')
 
-connection.close()
\ No newline at end of file
+def train(db_path, labels, model_path=default_model_path, chunk_size=10000):
+    """Train the model on the events in `db_path` and pickle it to `model_path`.
+
+    Args:
+        db_path (Path): Database to read employee_events from
+        labels (pd.Series): recruited label per employee_id
+        model_path (Path): Where to pickle the model
+        chunk_size (int): Employees read at a time
+
+    Returns:
+        LogisticRegression: The fitted model
+    """
+    model = train_model(employee_features(db_path, chunk_size), labels)
+    with Path(model_path).open('wb') as file:
+        pickle.dump(model, file)
+    return model
+
+
+def write_database(db_path, employee, team, notes, events):
+    """Write the tables to the SQLite database at `db_path`."""
+    connection = connect(db_path)
+
+    employee.to_sql('employee', connection, if_exists='replace')
+    team.to_sql('team', connection, if_exists='replace')
+    notes.to_sql('notes', connection, if_exists='replace', index=False, dtype={'note_id': 'INTEGER PRIMARY KEY'})
+    events.to_sql('employee_events', connection, if_exists='replace')
+
+    # Replacing the tables drops their indexes and the triggers
+    # maintaining the team timelines and the notes search index, so they
+    # are recreated and backfilled here
+    create_indexes(connection)
+    create_team_timelines(connection)
+    create_notes_index(connection)
+
+    connection.close()
+
+
+def build(db_path=default_db_path, model_path=default_model_path, n_employees=25, n_teams=5, days=365,
+          seed=None, end=None, workers=1, labels_path=None):
+    """Generate the employee_events database and train the model.
+
+    The database is bit-identical for the same seed, size and end date,
+    whatever the number of workers.
+
+    Args:
+        db_path (Path): Where to write the database
+        model_path (Path | None): Where to pickle the model, None to skip training
+        n_employees (int): Number of employees
+        n_teams (int): Number of teams
+        days (int): Days of event history
+        seed (int | None): Seed of every random draw, None for fresh entropy
+        end (date | None): Last day of the event history, default today
+        workers (int | None): Processes generating events, None for one per CPU
+        labels_path (Path | None): Where to write the recruited label of
+            every employee as CSV, for training with `--train-only`
+
+    Returns:
+        int: The seed used, to reproduce a build made with fresh entropy
+    """
+    root = np.random.SeedSequence(seed)
+    events_seed, tables_seed = root.spawn(2)
+
+    df = generate_events(events_seed, n_employees, n_teams, days, end, workers or os.cpu_count() or 1)
+    employee, team, notes, events, df = build_tables(df, load_generated_data(), np.random.default_rng(tables_seed))
+
+    write_database(db_path, employee, team, notes, events)
+
+    labels = df.drop_duplicates('employee_id').set_index('employee_id')['recruited']
+    if labels_path is not None:
+        labels.to_csv(labels_path)
+    if model_path is not None:
+        train(db_path, labels, model_path)
+    return root.entropy
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate employee_events.db and model.pkl")
+    parser.add_argument('--train-only', action='store_true',
+                        help="train model.pkl from the events already in --db-path and the --labels file")
+    parser.add_argument('--labels', type=Path,
+                        help="CSV of employee_id,recruited: written by a build, read by --train-only")
+    parser.add_argument('--db-path', type=Path, default=default_db_path)
+    parser.add_argument('--model-path', type=Path, default=default_model_path)
+    parser.add_argument('--no-model', action='store_true', help="skip training the model")
+    parser.add_argument('--employees', type=int, default=25)
+    parser.add_argument('--teams', type=int, default=5)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, help="seed for a reproducible build (default: fresh entropy)")
+    parser.add_argument('--end-date', type=date.fromisoformat, help="last day of events, YYYY-MM-DD (default: today)")
+    parser.add_argument('--workers', type=int, default=None, help="generator processes (default: one per CPU)")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.train_only:
+        if args.labels is None:
+            sys.exit("--train-only needs --labels")
+        model = train(args.db_path, read_labels(args.labels), args.model_path)
+        print(f"Trained {args.model_path} on {model.metadata_['n_employees']} employees "
+              f"({model.metadata_['data_sha256'][:12]})")
+        sys.exit()
+
+    seed = build(
+        db_path=args.db_path,
+        model_path=None if args.no_model else args.model_path,
+        n_employees=args.employees,
+        n_teams=args.teams,
+        days=args.days,
+        seed=args.seed,
+        end=args.end_date,
+        workers=args.workers,
+        labels_path=args.labels,
+    )
+    print(f"Built {args.db_path} with --seed {seed}")
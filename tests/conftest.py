@@ -0,0 +1,54 @@
+import sys
+from datetime import date
+from pathlib import Path
+from sqlite3 import connect
+
+import pytest
+
+# The report app and the employee_events package are run from their own
+# directories, so make both importable the same way for the test suite.
+# The project root makes the benchmarks package importable.
+project_root = Path(__file__).resolve().parent.parent
+
+for path in (project_root, project_root / 'report', project_root / 'python-package'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+@pytest.fixture
+def small_db(tmp_path):
+    """Write a small employee_events database with known contents.
+
+    Employees 1 and 2 are in team 1, employee 3 is in team 2. Employee 1
+    has one positive and one negative event on each weekday of January
+    2024, employee 2 has two positive events on the same days and
+    employee 3 has none.
+
+    Returns:
+        Path: Path to the database file
+    """
+    db_path = tmp_path / 'employee_events.db'
+    conn = connect(db_path)
+    conn.executescript("""
+        CREATE TABLE employee ("index" INTEGER, employee_id INTEGER, first_name TEXT, last_name TEXT, team_id INTEGER);
+        CREATE TABLE team ("index" INTEGER, team_id INTEGER, team_name TEXT, shift TEXT, manager_name TEXT);
+        CREATE TABLE notes ("index" INTEGER, employee_id INTEGER, team_id INTEGER, note TEXT, note_date TEXT);
+        CREATE TABLE employee_events ("index" INTEGER, event_date TEXT, employee_id INTEGER, team_id INTEGER, positive_events INTEGER, negative_events INTEGER);
+
+        INSERT INTO employee VALUES (0, 1, 'Ada', 'Lovelace', 1), (1, 2, 'Alan', 'Turing', 1), (2, 3, 'Grace', 'Hopper', 2);
+        INSERT INTO team VALUES (0, 1, 'Alpha Team', 'Morning', 'Sophia Reynolds'), (1, 2, 'Bravo Team', 'Night', 'James Carter');
+        INSERT INTO notes VALUES
+            (0, 1, 1, 'Fixed the conveyor belt before the morning shift', '2024-01-03'),
+            (1, 2, 1, 'Trained two new hires on the packing line', '2024-01-10'),
+            (2, 3, 2, 'Missed the safety briefing', '2024-01-15');
+    """)
+    days = [f'2024-01-{day:02d}' for day in range(1, 32)]
+    weekdays = [day for day in days if date.fromisoformat(day).weekday() < 5]
+    rows = []
+    for day in weekdays:
+        rows.append((len(rows), day, 1, 1, 1, 1))
+        rows.append((len(rows), day, 2, 1, 2, 0))
+    conn.executemany("INSERT INTO employee_events VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return db_path
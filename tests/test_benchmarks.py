@@ -0,0 +1,93 @@
+import pytest
+from sqlite3 import connect
+
+from benchmarks import (Context, compare, generated_until, generator_version,
+                        load_build_script, measure, suites)
+from benchmarks.readers import compare_profiles
+
+
+@pytest.fixture(scope='module')
+def context(tmp_path_factory):
+    """Generate a tiny database with the build script."""
+    return Context(tmp_path_factory.mktemp('bench'), employees=10, days=14)
+
+
+def test_context_generates_requested_size(context):
+    """The build script honours the employee, team and day counts."""
+    conn = connect(context.db_path)
+    employees = conn.execute("SELECT COUNT(*) FROM employee").fetchone()[0]
+    teams = conn.execute("SELECT COUNT(*) FROM team").fetchone()[0]
+    teams_with_employees = conn.execute("SELECT COUNT(DISTINCT team_id) FROM employee").fetchone()[0]
+    dates = [row[0] for row in conn.execute("SELECT DISTINCT event_date FROM employee_events ORDER BY 1")]
+    conn.close()
+
+    assert employees == 10
+    assert teams == teams_with_employees == context.teams == 2
+    # One row per weekday of the `days` days up to the pinned end date
+    assert dates == list(load_build_script().weekdays(context.days, generated_until))
+
+
+def test_cached_databases_are_named_by_version_and_seed(context, monkeypatch):
+    """A cached database is reused only for the same version, size and seed."""
+    data_dir = context.db_path.parent
+    assert context.db_path.name == f'employee_events_v{generator_version}_10x14_seed0.db'
+
+    built = []
+
+    class BuildScript:
+        @staticmethod
+        def build(db_path, **kwargs):
+            built.append(db_path.name)
+            db_path.touch()
+
+    monkeypatch.setattr('benchmarks.load_build_script', BuildScript)
+
+    assert Context(data_dir, employees=10, days=14).db_path == context.db_path
+    assert built == []
+    Context(data_dir, employees=10, days=14, seed=1)
+    monkeypatch.setattr('benchmarks.generator_version', generator_version + 1)
+    Context(data_dir, employees=10, days=14)
+    assert built == [
+        f'employee_events_v{generator_version}_10x14_seed1.db.partial',
+        f'employee_events_v{generator_version + 1}_10x14_seed0.db.partial',
+    ]
+
+
+def test_every_suite_runs(context):
+    """Every registered benchmark runs once against a generated database."""
+    names = []
+    for bench_suite in suites:
+        for name, func in bench_suite(context):
+            func()
+            names.append(f'{bench_suite.__name__}.{name}')
+
+    assert 'queries.employee.event_counts' in names
+    assert 'pages.team.report' in names
+
+
+def test_measure_reports_statistics():
+    """measure returns timing statistics for at least min_rounds rounds."""
+    stats = measure(lambda: None, min_rounds=3, min_time=0)
+
+    assert stats['rounds'] >= 3
+    assert 0 <= stats['min'] <= stats['median']
+
+
+def test_compare_flags_regressions():
+    """Only benchmarks slower than the threshold are reported."""
+    baseline = {'results': {'a': {'median': 1.0}, 'b': {'median': 1.0}}}
+    current = {'results': {'a': {'median': 1.1}, 'b': {'median': 2.0}, 'c': {'median': 5.0}}}
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert [name for name, *_ in regressions] == ['b']
+
+
+def test_compare_profiles_reports_every_profile(context):
+    """Every connection profile is measured across reader processes."""
+    results = compare_profiles(context, readers=2, n_queries=10)
+
+    assert set(results) == {'default', 'read_only'}
+    for stats in results.values():
+        assert 0 < stats['p50'] <= stats['p99']
+        assert stats['queries_per_second'] > 0
@@ -0,0 +1,90 @@
+from datetime import date
+from sqlite3 import connect
+
+import numpy as np
+import pytest
+
+from benchmarks import load_build_script
+
+build_script = load_build_script()
+
+
+def build(path, **kwargs):
+    options = dict(model_path=None, n_employees=12, n_teams=3, days=30, seed=1, end=date(2024, 6, 30))
+    options.update(kwargs)
+    return build_script.build(db_path=path, **options)
+
+
+def test_output_does_not_depend_on_workers(tmp_path):
+    """The same seed writes a byte-for-byte identical database."""
+    build(tmp_path / 'serial.db', workers=1)
+    build(tmp_path / 'parallel.db', workers=3)
+
+    assert (tmp_path / 'serial.db').read_bytes() == (tmp_path / 'parallel.db').read_bytes()
+
+
+def test_seeds_change_the_data(tmp_path):
+    assert build(tmp_path / 'a.db') == 1
+    build(tmp_path / 'b.db', seed=2)
+
+    rows = [connect(tmp_path / name).execute("SELECT * FROM employee_events").fetchall() for name in ('a.db', 'b.db')]
+    assert rows[0] != rows[1]
+
+
+def test_events_cover_every_employee_and_weekday(tmp_path):
+    df = build_script.generate_events(np.random.SeedSequence(0), n_employees=5, n_teams=2,
+                                      days=13, end=date(2024, 6, 30))
+
+    # 2024-06-17 to 2024-06-30 has ten weekdays
+    assert len(df) == 5 * 10
+    assert df.event_date.is_monotonic_increasing
+    assert df.groupby('employee_id').team_id.nunique().max() == 1
+    assert df.team_id.between(1, 2).all()
+
+
+@pytest.mark.parametrize('profile', list(build_script.profiles))
+def test_profiles_draw_one_count_per_day(profile):
+    rng = np.random.default_rng(0)
+    for kind in ('positive', 'negative'):
+        counts = build_script.profiles[profile][kind](rng, 100)
+        assert counts.shape == (100,)
+        assert counts.dtype.kind == 'i'
+
+
+def test_employee_features_sum_every_event(small_db):
+    events = build_script.pd.read_sql("SELECT * FROM employee_events", connect(small_db))
+    expected = events.groupby('employee_id')[build_script.features].sum()
+
+    for chunk_size in (1, 10000):
+        features = build_script.employee_features(small_db, chunk_size)
+        build_script.pd.testing.assert_frame_equal(features, expected, check_dtype=False)
+
+
+def test_training_is_reproducible(tmp_path):
+    labels_path = tmp_path / 'labels.csv'
+    build(tmp_path / 'a.db', model_path=tmp_path / 'built.pkl', labels_path=labels_path, n_employees=40)
+
+    model = build_script.train(tmp_path / 'a.db', build_script.read_labels(labels_path), tmp_path / 'trained.pkl')
+
+    assert (tmp_path / 'built.pkl').read_bytes() == (tmp_path / 'trained.pkl').read_bytes()
+    assert model.metadata_['format_version'] == build_script.model_format_version
+    assert model.metadata_['n_employees'] == 40
+    assert list(model.feature_names_in_) == build_script.features
+
+
+def test_training_needs_every_label(small_db):
+    labels = build_script.pd.Series({1: 0}, name='recruited')
+
+    with pytest.raises(ValueError, match='No recruited label'):
+        build_script.train_model(build_script.employee_features(small_db), labels)
+
+
+def test_notes_have_explicit_ids(tmp_path):
+    build(tmp_path / 'a.db')
+
+    conn = connect(tmp_path / 'a.db')
+    columns = conn.execute("PRAGMA table_info(notes)").fetchall()
+    ids = [row[0] for row in conn.execute("SELECT note_id FROM notes ORDER BY note_id")]
+    conn.close()
+    assert [(name, type, pk) for _, name, type, _, _, pk in columns if pk] == [('note_id', 'INTEGER', 1)]
+    assert ids == list(range(1, len(ids) + 1))
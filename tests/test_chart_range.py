@@ -0,0 +1,94 @@
+import pytest
+from starlette.testclient import TestClient
+
+import caching
+import dashboard
+from dashboard import ChartRange, LineChart, chart_range, parse_chart_range
+from employee_events import ConnectionFactory, Employee
+
+
+class RecordingEmployee(Employee):
+    """Employee model recording the options of every event_counts call."""
+
+    calls = []
+
+    def event_counts(self, id, **kwargs):
+        self.calls.append(kwargs)
+        return super().event_counts(id, **kwargs)
+
+
+@pytest.fixture
+def model(small_db):
+    RecordingEmployee.calls = []
+    return RecordingEmployee(connection_factory=ConnectionFactory(small_db))
+
+
+def plotted(chart, model, requested=ChartRange()):
+    token = chart_range.set(requested)
+    try:
+        chart(1, model)
+    finally:
+        chart_range.reset(token)
+    return model.calls[-1]
+
+
+def test_default_window_ends_at_the_last_event(model):
+    assert plotted(LineChart(window=7), model) == {
+        'start': '2024-01-25', 'end': None, 'bucket': 'day', 'cumulative': True,
+    }
+    assert plotted(LineChart(end='2024-01-14', window=7), model)['start'] == '2024-01-08'
+    assert plotted(LineChart(window=None), model)['start'] is None
+
+
+def test_requested_range_overrides_defaults(model):
+    options = plotted(LineChart(window=7), model, ChartRange('2024-01-08', '2024-01-20', 'week'))
+
+    assert options == {'start': '2024-01-08', 'end': '2024-01-20', 'bucket': 'week', 'cumulative': True}
+
+
+def test_ranges_are_cached_separately(model):
+    chart = LineChart()
+    chart.cache = caching.VersionedCache(8, model.connection_factory.signature)
+
+    plotted(chart, model)
+    plotted(chart, model, ChartRange(bucket='week'))
+    plotted(chart, model, ChartRange(bucket='week'))
+
+    assert [options['bucket'] for options in model.calls] == ['day', 'week']
+    assert (chart.cache.hits, chart.cache.misses) == (1, 2)
+
+
+def test_parse_chart_range():
+    assert parse_chart_range() == ChartRange()
+    assert parse_chart_range('2024-01-08', '', 'month') == ChartRange('2024-01-08', None, 'month')
+    for start in ('last week', '20240108', '2024-02-30'):
+        with pytest.raises(ValueError):
+            parse_chart_range(start=start)
+    with pytest.raises(ValueError, match='bucket'):
+        parse_chart_range(bucket='year')
+
+
+def test_report_routes_take_the_range():
+    client = TestClient(dashboard.app)
+
+    response = client.get('/team/1', params={'start': '2024-06-01', 'bucket': 'week'})
+    assert response.status_code == 200
+    assert 'action="/team/1"' in response.text
+    assert 'value="2024-06-01"' in response.text
+    assert '<option value="week" selected="selected">' in response.text
+
+    assert client.get('/employee/1', params={'bucket': 'year'}).status_code == 400
+    assert client.get('/employee/1', params={'end': 'soon'}).status_code == 400
+
+
+def test_render_state_stays_with_the_thread(model):
+    """Rendering leaves the shared chart as it was, apart from its templates."""
+    chart = LineChart()
+    before = dict(vars(chart))
+
+    chart(1, model)
+    # Employee 3 has no events, so the chart falls back to the empty limits
+    chart(3, model)
+
+    assert {name: value for name, value in vars(chart).items() if name != '_templates'} == before
+    assert chart.thread_state().empty_limits
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from base_components.downsampling import lttb, minmax
+
+
+@pytest.fixture
+def series():
+    """A noisy line with a single tall spike in the middle."""
+    rng = np.random.default_rng(0)
+    x = np.arange(5000)
+    y = np.cumsum(rng.normal(size=5000))
+    y[2500] += 1000
+    return x, y
+
+
+@pytest.mark.parametrize('downsample', [lttb, minmax])
+def test_short_series_are_unchanged(downsample):
+    x = np.arange(10)
+
+    assert downsample(x, x * 2, 100).tolist() == list(range(10))
+
+
+@pytest.mark.parametrize('downsample', [lttb, minmax])
+def test_point_count_is_capped(downsample, series):
+    """At most `threshold` points are kept, in order, including both ends."""
+    indices = downsample(*series, 300)
+
+    assert len(indices) <= 300
+    assert indices[0] == 0
+    assert indices[-1] == len(series[0]) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+@pytest.mark.parametrize('downsample', [lttb, minmax])
+def test_spikes_are_preserved(downsample, series):
+    """The visual shape survives: the spike is never dropped."""
+    indices = downsample(*series, 300)
+
+    assert 2500 in indices
+
+
+def test_lttb_keeps_exactly_threshold_points(series):
+    assert len(lttb(*series, 300)) == 300
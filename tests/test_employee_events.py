@@ -3,7 +3,7 @@ from pathlib import Path
 
 # Using pathlib create a project_root variable set to the absolute path
 # for the root of this project
-project_root = Path(__file__).parent.absolute()
+project_root = Path(__file__).parent.parent.absolute()
 
 # Apply the pytest fixture decorator to a db_path function
 @pytest.fixture
@@ -14,7 +14,7 @@ def db_path():
         Path: Pathlib object pointing to employee_events.db
     """
     # Using the project_root variable, return a pathlib object for employee_events.db
-    return project_root / "employee_events.db"
+    return project_root / "python-package" / "employee_events" / "employee_events.db"
 
 # Define a function called test_db_exists
 def test_db_exists(db_path):
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+# Cumulative import time budget in milliseconds. The default leaves
+# headroom for slow CI machines; override with IMPORT_BUDGET_MS.
+import_budget_ms = float(os.environ.get('IMPORT_BUDGET_MS', 1000))
+
+# Modules that must only be imported on first use
+heavy_modules = ['pandas', 'numpy', 'matplotlib', 'sklearn', 'scipy', 'IPython']
+
+
+def importtime(module):
+    """Import `module` in a fresh interpreter under `python -X importtime`.
+
+    Args:
+        module (str): The module to import
+
+    Returns:
+        dict: Cumulative import time in microseconds for each imported
+            module, keyed by its dotted name
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([
+        str(project_root / 'report'),
+        str(project_root / 'python-package'),
+    ])
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=project_root / 'report',
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('module', ['dashboard', 'employee_events'])
+def test_heavy_modules_are_deferred(module):
+    """Importing the app must not import pandas, matplotlib or sklearn."""
+    times = importtime(module)
+
+    imported = [name for name in heavy_modules if name in times]
+    assert not imported, f"importing {module} eagerly imports {imported}"
+
+
+@pytest.mark.parametrize('module', ['dashboard', 'employee_events'])
+def test_import_time_budget(module):
+    """Importing the app stays within the start-up budget."""
+    times = importtime(module)
+
+    elapsed_ms = times[module] / 1000
+    slowest = sorted(times.items(), key=lambda item: -item[1])[:10]
+    assert elapsed_ms <= import_budget_ms, (
+        f"importing {module} took {elapsed_ms:.0f}ms "
+        f"(budget {import_budget_ms:.0f}ms); slowest: {slowest}"
+    )
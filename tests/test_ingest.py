@@ -0,0 +1,163 @@
+import sqlite3
+import threading
+from sqlite3 import connect
+
+import pytest
+
+from employee_events import (
+    ConnectionFactory, Employee, EventWriter, ReadOnlyConnectionFactory, Team,
+    add_query_listener, create_team_timelines, remove_query_listener,
+)
+
+
+@pytest.fixture
+def db(small_db):
+    """The small database with team timelines, as ingestion expects."""
+    conn = connect(small_db)
+    create_team_timelines(conn)
+    conn.close()
+    return small_db
+
+
+def batch(day, size=10):
+    """`size` events for employee 1 in team 1, one positive event each."""
+    return [(f'2024-02-{day:02d}', 1, 1, 1, 0)] * size
+
+
+def team_total(db):
+    return Team(connection_factory=ReadOnlyConnectionFactory(db)).event_counts(1).positive_events.sum()
+
+
+def test_writer_enables_wal_and_updates_timelines(db):
+    with EventWriter(db) as writer:
+        assert writer.append_events(batch(1)) == 10
+
+    conn = connect(db)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute(
+        "SELECT positive_events FROM team_daily_events WHERE team_id = 1 AND event_date = '2024-02-01'"
+    ).fetchone() == (10,)
+    conn.close()
+    assert team_total(db) == 69 + 10
+
+
+def test_writer_needs_a_path():
+    """The packaged database is never switched to WAL by default."""
+    with pytest.raises(TypeError):
+        EventWriter()
+
+
+def test_readers_do_not_wait_for_an_open_write(db):
+    """Readers see the last committed snapshot while a write is in progress."""
+    with EventWriter(db) as writer:
+        writer.conn.execute("BEGIN IMMEDIATE")
+        writer.conn.executemany(
+            "INSERT INTO employee_events (event_date, employee_id, team_id, positive_events, negative_events) "
+            "VALUES (?, ?, ?, ?, ?)", batch(1, size=1000))
+
+        team = Team(connection_factory=ReadOnlyConnectionFactory(db, timeout=0))
+        assert team.event_counts(1).positive_events.sum() == 69
+
+        writer.conn.execute("COMMIT")
+        assert team.event_counts(1).positive_events.sum() == 69 + 1000
+
+
+def test_concurrent_readers_and_writers(db):
+    """Readers never fail or see totals go backwards while two writers append."""
+    errors = []
+
+    def listener(event):
+        if event.error is not None:
+            errors.append(event.error)
+
+    add_query_listener(listener)
+
+    writers_done = threading.Event()
+    totals = {}
+
+    def write(first_day):
+        with EventWriter(db, checkpoint_pages=10) as writer:
+            for day in range(first_day, first_day + 10):
+                writer.append_events(batch(day))
+
+    def read(reader_id):
+        team = Team(connection_factory=ReadOnlyConnectionFactory(db))
+        seen = totals[reader_id] = []
+        while not writers_done.is_set():
+            seen.append(team.event_counts(1).positive_events.sum())
+
+    readers = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+    writers = [threading.Thread(target=write, args=(day,)) for day in (1, 11)]
+    try:
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        writers_done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        remove_query_listener(listener)
+
+    assert errors == []
+    for seen in totals.values():
+        assert seen and seen == sorted(seen)
+    assert team_total(db) == 69 + 200
+
+    conn = connect(db)
+    assert conn.execute(
+        "SELECT SUM(positive_events) FROM team_daily_events WHERE team_id = 1"
+    ).fetchone() == (69 + 200,)
+    conn.close()
+
+
+def test_checkpoint_truncates_the_log(db):
+    writer = EventWriter(db)
+    writer.append_events(batch(1))
+    wal = db.with_name(db.name + '-wal')
+    assert wal.stat().st_size > 0
+
+    busy, _, _ = writer.checkpoint('truncate')
+
+    assert busy == 0
+    assert wal.stat().st_size == 0
+    with pytest.raises(ValueError):
+        writer.checkpoint('sometimes')
+    writer.close()
+
+
+def test_failed_append_rolls_back(db):
+    with EventWriter(db) as writer:
+        with pytest.raises(Exception):
+            writer.append_events(batch(1) + [('2024-02-02', 1)])
+
+        assert team_total(db) == 69
+
+
+@pytest.mark.parametrize('result', ['frame', 'tuples'])
+def test_busy_readers_raise_after_retrying(db, caplog, result):
+    """A reader still locked out after its retries raises instead of returning no rows."""
+    conn = connect(db)
+    conn.execute("BEGIN EXCLUSIVE")
+    try:
+        employee = Employee(connection_factory=ConnectionFactory(db, timeout=0))
+        with pytest.raises(sqlite3.OperationalError, match='locked'):
+            employee.event_counts(1, result=result)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    assert 'Database busy' in caplog.text
+
+
+def test_busy_readers_retry_until_the_lock_is_released(db):
+    conn = connect(db, check_same_thread=False)
+    conn.execute("BEGIN EXCLUSIVE")
+    release = threading.Timer(0.1, conn.rollback)
+    release.start()
+    try:
+        employee = Employee(connection_factory=ConnectionFactory(db, timeout=0))
+        assert len(employee.event_counts(1)) == 23
+    finally:
+        release.join()
+        conn.close()
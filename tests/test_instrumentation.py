@@ -0,0 +1,76 @@
+import logging
+import pytest
+from starlette.testclient import TestClient
+
+import dashboard
+import instrumentation
+from base_components import BaseComponent
+from combined_components import CombinedComponent
+from employee_events import remove_query_listener
+from utils import LazyModel
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Install instrumentation on the dashboard app and undo it afterwards.
+
+    Yields:
+        TestClient: Client for the instrumented dashboard app
+    """
+    monkeypatch.setattr(BaseComponent, '__call__', BaseComponent.__call__)
+    monkeypatch.setattr(CombinedComponent, '__call__', CombinedComponent.__call__)
+    monkeypatch.setattr(LazyModel, 'wrap', None)
+    # Force the predictor to be reloaded, and wrapped, on next use
+    monkeypatch.setattr(vars(dashboard.BarChart)['predictor'], 'model', None)
+
+    # install adds /metrics to the shared app, so the routes are restored
+    # for the tests that follow
+    routes = list(dashboard.app.router.routes)
+    instrumentation.install(dashboard.app)
+    yield TestClient(dashboard.app)
+    remove_query_listener(instrumentation.record_query)
+    dashboard.app.router.routes[:] = routes
+
+
+def test_histogram_exposition():
+    """Histograms render cumulative buckets, a sum and a count."""
+    histogram = instrumentation.Histogram('t_seconds', 'Test.', labels=['x'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'a')
+    histogram.observe(0.5, 'a')
+    histogram.observe(5.0, 'a')
+
+    lines = list(histogram.samples())
+
+    assert lines == [
+        't_seconds_bucket{x="a",le="0.1"} 1',
+        't_seconds_bucket{x="a",le="1.0"} 2',
+        't_seconds_bucket{x="a",le="+Inf"} 3',
+        't_seconds_sum{x="a"} 5.55',
+        't_seconds_count{x="a"} 3',
+    ]
+
+
+def test_metrics_endpoint_reports_queries_renders_and_predictions(client):
+    """A page request shows up in every metric family at /metrics."""
+    assert client.get('/employee/1').status_code == 200
+
+    response = client.get('/metrics')
+    body = response.text
+
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'employee_events_query_duration_seconds_count{query="Employee.event_counts"}' in body
+    assert 'employee_events_query_rows_total{query="Employee.names"}' in body
+    assert 'report_component_render_seconds_count{component="LineChart"}' in body
+    assert 'report_component_render_seconds_count{component="Report"}' in body
+    assert 'report_predict_proba_seconds_count' in body
+
+
+def test_slow_queries_are_logged(client, monkeypatch, caplog):
+    """Queries over the threshold are logged with their SQL and parameters."""
+    monkeypatch.setenv('DASHBOARD_SLOW_QUERY_MS', '0')
+
+    with caplog.at_level(logging.WARNING, logger='dashboard.slow_query'):
+        client.get('/team/1')
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any('Team.model_data' in message and 'params=(1,)' in message for message in messages)
@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import pytest
+
+import dashboard
+from benchmarks.load import entity_ids, load_test, route_mix, summarize, workload
+from employee_events import db_path
+
+
+def test_workload_is_reproducible():
+    """The same seed replays the same requests, in every route of the mix."""
+    requests = workload(range(1, 26), range(1, 6), 500, seed=3)
+
+    assert requests == workload(range(1, 26), range(1, 6), 500, seed=3)
+    assert requests != workload(range(1, 26), range(1, 6), 500, seed=4)
+    assert {route for route, *_ in requests} == set(route_mix)
+
+
+def test_workload_favours_popular_entities():
+    requests = workload(range(1, 101), range(1, 21), 2000, skew=1.1)
+
+    paths = [path for route, _, path, _ in requests if route == 'employee']
+    most_requested = max(paths.count(path) for path in set(paths))
+    assert most_requested > 5 * len(paths) / 100
+
+
+def test_summarize_percentiles():
+    samples = [('employee', i / 1000, 200) for i in range(1, 101)] + [('team', 0.5, 500)]
+
+    stats = summarize(samples, elapsed=2.0)
+
+    assert stats['employee']['p50'] == pytest.approx(0.0505)
+    assert stats['employee']['rps'] == 50
+    assert stats['team'] == {'requests': 1, 'errors': 1, 'rps': 0.5, 'p50': 0.5, 'p95': 0.5, 'p99': 0.5}
+    assert stats['all']['requests'] == 101
+
+
+def test_load_test_in_process():
+    """Every route of the mix answers without errors through ASGI."""
+    requests = workload(*entity_ids(db_path), 30, seed=1)
+
+    async def run():
+        transport = httpx.ASGITransport(app=dashboard.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://dashboard') as client:
+            return await load_test(client, requests, concurrency=4, warmup=5)
+
+    stats = asyncio.run(run())
+
+    assert stats['all']['requests'] == 25
+    assert stats['all']['errors'] == 0
+    assert 0 < stats['all']['p50'] <= stats['all']['p99']
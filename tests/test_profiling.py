@@ -0,0 +1,105 @@
+import sys
+import threading
+import time
+import pytest
+from fasthtml.core import FastHTML
+from starlette.testclient import TestClient
+
+import profiling
+
+
+def busy_route():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return 'done'
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    """Replace the module profiler with a fresh, fast-sampling one."""
+    fresh = profiling.SamplingProfiler(interval=0.001)
+    monkeypatch.setattr(profiling, 'profiler', fresh)
+    return fresh
+
+
+def test_disabled_by_default(monkeypatch):
+    """Without DASHBOARD_PROFILE_RATE the route function is left untouched."""
+    monkeypatch.delenv('DASHBOARD_PROFILE_RATE', raising=False)
+
+    assert profiling.sampled(busy_route) is busy_route
+
+
+def test_sampled_requests_are_folded(monkeypatch, profiler):
+    """Sampled calls produce folded stacks rooted at the route."""
+    monkeypatch.setenv('DASHBOARD_PROFILE_RATE', '1')
+    route = profiling.sampled(busy_route)
+
+    assert route() == 'done'
+
+    lines = profiler.folded().splitlines()
+    assert profiler.requests == 1
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith('busy_route;test_profiling.py:busy_route')
+        assert int(count) > 0
+
+
+def test_unsampled_requests_are_not_profiled(monkeypatch, profiler):
+    """Calls that lose the coin flip never start the sampler."""
+    monkeypatch.setenv('DASHBOARD_PROFILE_RATE', '0.01')
+    monkeypatch.setattr(profiling.random, 'random', lambda: 0.5)
+    route = profiling.sampled(busy_route)
+
+    route()
+
+    assert profiler.requests == 0
+    assert profiler.thread is None
+
+
+def test_request_starting_as_the_sampler_idles_is_sampled(profiler):
+    """A target added while the sampler goes to sleep wakes it up."""
+    thread_id = threading.get_ident()
+    code = sys._getframe().f_code
+    raced = []
+
+    class RacingEvent(threading.Event):
+        def clear(self):
+            # Start a request right as the sampler found no targets
+            if not raced:
+                raced.append(threading.Thread(target=profiler.start, args=(thread_id, 'race', code)))
+                raced[0].start()
+                raced[0].join(0.2)
+            super().clear()
+
+    profiler.wakeup = RacingEvent()
+    profiler.thread = threading.Thread(target=profiler.run, daemon=True)
+    profiler.thread.start()
+    try:
+        deadline = time.monotonic() + 2
+        while not profiler.samples and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        profiler.stop(thread_id)
+
+    assert raced and profiler.samples > 0
+
+
+def test_admin_route_requires_token(monkeypatch, profiler):
+    """The profile download is hidden without the admin token."""
+    monkeypatch.setenv('DASHBOARD_ADMIN_TOKEN', 'secret')
+    monkeypatch.setenv('DASHBOARD_PROFILE_RATE', '1')
+    app = FastHTML()
+    profiling.install(app)
+    profiling.sampled(busy_route)()
+    client = TestClient(app)
+
+    assert client.get('/admin/profile').status_code == 404
+    assert client.get('/admin/profile?token=wrong').status_code == 404
+
+    response = client.get('/admin/profile?reset=1', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert 'attachment' in response.headers['content-disposition']
+    assert response.text.startswith('busy_route;')
+    assert profiler.folded() == ''
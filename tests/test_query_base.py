@@ -0,0 +1,73 @@
+import pytest
+
+from employee_events import Employee, Team
+
+
+@pytest.fixture
+def employee(small_db):
+    return Employee(small_db)
+
+
+@pytest.fixture
+def team(small_db):
+    return Team(small_db)
+
+
+def test_event_counts_daily(employee):
+    """Without options one row per event date is returned."""
+    df = employee.event_counts(1)
+
+    assert len(df) == 23
+    assert df.event_date.iloc[0] == '2024-01-01'
+    assert df.positive_events.sum() == 23
+
+
+def test_event_counts_date_range(employee):
+    """start and end bound the returned dates inclusively."""
+    df = employee.event_counts(1, start='2024-01-08', end='2024-01-12')
+
+    assert df.event_date.tolist() == ['2024-01-08', '2024-01-09', '2024-01-10', '2024-01-11', '2024-01-12']
+
+
+def test_event_counts_cumulative_matches_cumsum(employee):
+    """SQL running totals match a pandas cumsum of the daily counts."""
+    daily = employee.event_counts(1).set_index('event_date')
+    cumulative = employee.event_counts(1, cumulative=True).set_index('event_date')
+
+    assert (daily.cumsum() == cumulative).all().all()
+
+
+def test_event_counts_cumulative_start_keeps_history(employee):
+    """Running totals include events before the start of the range."""
+    df = employee.event_counts(1, start='2024-01-31', cumulative=True)
+
+    assert df.event_date.tolist() == ['2024-01-31']
+    assert df.positive_events.tolist() == [23]
+
+
+def test_event_counts_weekly_buckets(employee):
+    """Weeks are labelled with their Monday."""
+    df = employee.event_counts(1, bucket='week')
+
+    assert df.event_date.tolist() == ['2024-01-01', '2024-01-08', '2024-01-15', '2024-01-22', '2024-01-29']
+    assert df.positive_events.tolist() == [5, 5, 5, 5, 3]
+
+
+def test_event_counts_monthly_cumulative(team):
+    """Team totals sum every member of the team."""
+    df = team.event_counts(1, bucket='month', cumulative=True)
+
+    assert df.event_date.tolist() == ['2024-01-01']
+    assert df.positive_events.tolist() == [69]
+    assert df.negative_events.tolist() == [23]
+
+
+def test_event_counts_rejects_unknown_bucket(employee):
+    with pytest.raises(ValueError):
+        employee.event_counts(1, bucket='year')
+
+
+def test_last_event_date(employee, team):
+    assert employee.last_event_date(1) == '2024-01-31'
+    assert team.last_event_date(2) is None
+    assert employee.last_event_date(99) is None
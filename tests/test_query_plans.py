@@ -0,0 +1,185 @@
+"""Query plan regression tests for every Employee and Team query.
+
+Every query method is called against a generated database with the query
+listeners recording the SQL it runs. `EXPLAIN QUERY PLAN` of that SQL,
+with the same parameters, must then:
+
+- never SCAN a table, unless the query returns the whole table
+- never build an AUTOMATIC index, which SQLite does when an index is
+  missing, scanning the table on every call
+- only sort in a TEMP B-TREE where the case allows it. Allowed sorts
+  order the rows of one employee or team, or the rows being returned,
+  never a whole table.
+
+A failure prints the offending plan. The fallbacks for databases built
+before the notes search index or the team timelines existed are not
+checked: they scan by design.
+"""
+import textwrap
+from collections import Counter
+from datetime import date
+from sqlite3 import connect
+from typing import NamedTuple
+
+import pytest
+
+from benchmarks import load_build_script
+from employee_events import (ConnectionFactory, Employee, QueryBase, Team,
+                             add_query_listener, remove_query_listener)
+
+# QueryBase methods that build queries rather than run them
+helpers = {'event_source', 'on_shard', 'shard_model', 'fan_out'}
+
+
+class Case(NamedTuple):
+    method: str
+    args: tuple = ()
+    kwargs: dict = {}
+    scans: bool = False
+    sorts: tuple = ()
+
+
+# `scans` queries may scan their own table, `sorts` lists the TEMP B-TREE
+# sorts a query may use, e.g. "GROUP BY"
+cases = [
+    Case('names', scans=True),
+    Case('username', (7,)),
+    Case('model_data', (7,)),
+    Case('notes', (7,)),
+    Case('event_counts', (7,)),
+    Case('event_counts', (7,), {'start': '2024-05-01', 'end': '2024-06-01'}),
+    Case('event_counts', (7,), {'bucket': 'week'}, sorts=('GROUP BY',)),
+    Case('event_counts', (7,), {'bucket': 'month'}, sorts=('GROUP BY',)),
+    Case('event_counts', (7,), {'start': '2024-05-01', 'cumulative': True},
+         sorts=('ORDER BY',)),
+    Case('event_counts', (7,),
+         {'bucket': 'week', 'start': '2024-05-01', 'cumulative': True},
+         sorts=('GROUP BY', 'ORDER BY')),
+    Case('last_event_date', (7,)),
+    # Matches are ranked in the full-text index, then only the returned
+    # page is sorted. Scoped searches also sort the scope's note ids.
+    Case('search_notes', ('safety',), sorts=('ORDER BY',)),
+    Case('search_notes', ('safety',), {'scope': 7},
+         sorts=('ORDER BY', 'ORDER BY')),
+    Case('all_model_data', scans=True),
+]
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp('plans') / 'employee_events.db'
+    load_build_script().build(db_path=path, model_path=None, n_employees=200,
+                              n_teams=40, days=60, seed=0,
+                              end=date(2024, 6, 30))
+    return path
+
+
+def query_methods(model_class):
+    """Names of the public query methods of an Employee or Team."""
+    return {
+        name
+        for cls in (QueryBase, model_class)
+        for name, value in vars(cls).items()
+        if callable(value) and not name.startswith('_')
+    } - helpers
+
+
+def run_queries(model, case):
+    """Call the case's method and return the QueryEvents of its queries."""
+    events = []
+    add_query_listener(events.append)
+    try:
+        result = getattr(model, case.method)(*case.args, **case.kwargs)
+        if case.method == 'all_model_data':
+            list(result)
+    finally:
+        remove_query_listener(events.append)
+    return events
+
+
+def query_plan(db, sql, params):
+    """The (depth, detail) lines of the query plan of `sql`."""
+    conn = connect(db)
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    finally:
+        conn.close()
+
+    depths = {0: -1}
+    lines = []
+    for id, parent, _, detail in rows:
+        depths[id] = depths.get(parent, -1) + 1
+        lines.append((depths[id], detail))
+    return lines
+
+
+def plan_problems(plan, tables, case, own_table):
+    """The lines of `plan` breaking the case's rules."""
+    problems = []
+    sorts = Counter(case.sorts)
+    for _, detail in plan:
+        words = detail.split()
+        scan = words[0] == 'SCAN' and words[1] in tables
+        if scan and 'VIRTUAL' not in words:
+            if not (case.scans and words[1] == own_table):
+                problems.append(detail)
+        elif 'AUTOMATIC' in words:
+            problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE FOR '):
+            sort = detail[len('USE TEMP B-TREE FOR '):]
+            if sorts[sort] > 0:
+                sorts[sort] -= 1
+            else:
+                problems.append(detail)
+    return problems
+
+
+@pytest.mark.parametrize('model_class', [Employee, Team])
+def test_every_query_has_a_case(model_class):
+    missing = query_methods(model_class) - {case.method for case in cases}
+    assert not missing, f"Add query plan cases for {sorted(missing)}"
+
+
+@pytest.mark.parametrize('model_class', [Employee, Team])
+@pytest.mark.parametrize(
+    'case', cases,
+    ids=lambda case: f'{case.method}{case.args}{case.kwargs}')
+def test_query_plan(db, model_class, case):
+    if not hasattr(model_class, case.method):
+        pytest.skip(f'{model_class.__name__} has no {case.method}')
+    conn = connect(db)
+    tables = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+
+    model = model_class(connection_factory=ConnectionFactory(db))
+    events = run_queries(model, case)
+    assert events, f"{case.method} ran no query"
+
+    for event in events:
+        assert event.error is None, event.error
+        plan = query_plan(db, event.sql, event.params)
+        problems = plan_problems(plan, tables, case, model_class.name)
+        assert not problems, "{} uses {}\n\n{}\n\nparams: {}\n\n{}".format(
+            event.name, ', '.join(problems),
+            textwrap.dedent(event.sql).strip(), event.params,
+            '\n'.join('    ' * depth + detail for depth, detail in plan),
+        )
+
+
+def test_problems_are_reported():
+    automatic = ('SEARCH employee_events USING AUTOMATIC COVERING INDEX '
+                 '(employee_id=?)')
+    plan = [(0, 'SCAN employee'), (0, automatic), (0, 'SCAN (subquery-1)'),
+            (0, 'USE TEMP B-TREE FOR GROUP BY'),
+            (0, 'USE TEMP B-TREE FOR ORDER BY')]
+    tables = {'employee', 'employee_events'}
+
+    case = Case('username', sorts=('ORDER BY',))
+    assert plan_problems(plan, tables, case, 'employee') == [
+        'SCAN employee',
+        automatic,
+        'USE TEMP B-TREE FOR GROUP BY',
+    ]
+    case = Case('names', scans=True)
+    assert plan_problems(plan, tables, case, 'team')[0] == 'SCAN employee'
@@ -0,0 +1,177 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from fasthtml.common import Div, H1, to_xml
+
+from base_components import BaseComponent, Dropdown, MatplotlibViz
+from combined_components import CombinedComponent, FormGroup
+
+
+class FakeModel:
+    """Minimal stand-in for Employee/Team with no database access."""
+
+    def __init__(self, name, size=5):
+        self.name = name
+        self.size = size
+
+    def names(self):
+        return [(f"{self.name}-{i}", i) for i in range(1, self.size + 1)]
+
+
+class ModelDropdown(Dropdown):
+
+    def component_label(self, entity_id, model):
+        return model.name
+
+    def component_data(self, entity_id, model):
+        return model.names()
+
+
+class Title(BaseComponent):
+
+    def build_component(self, entity_id, model):
+        return H1(f"{model.name}:{entity_id}")
+
+
+class Bars(MatplotlibViz):
+
+    def visualization(self, entity_id, model):
+        fig, ax = self.subplots()
+        ax.barh([''], [entity_id / model.size])
+        ax.set_xlim(0, 1)
+        ax.set_title(model.name)
+        self.set_axis_styling(ax, bordercolor='black', fontcolor='black')
+        return fig
+
+
+class TemplateBars(Bars):
+    """Bars drawn by updating a per-thread template figure."""
+
+    def __init__(self):
+        self.templates_created = 0
+
+    def create_template(self):
+        self.templates_created += 1
+        fig, ax = self.subplots()
+        ax.barh([''], [0])
+        ax.set_xlim(0, 1)
+        self.set_axis_styling(ax, bordercolor='black', fontcolor='black')
+        return fig
+
+    def update(self, fig, entity_id, model):
+        ax = fig.axes[0]
+        ax.patches[0].set_width(entity_id / model.size)
+        ax.set_title(model.name)
+
+
+class Filters(FormGroup):
+    id = "filters"
+    children = [ModelDropdown(id="selector", name="user-selection")]
+
+
+class Page(CombinedComponent):
+    outer_div_type = Div(cls='grid')
+    children = [Title(), Filters()]
+
+
+@pytest.fixture
+def page():
+    """Provide a single page instance shared by every render, as in the app."""
+    return Page()
+
+
+def render(page, entity_id, model):
+    return to_xml(page(entity_id, model))
+
+
+def test_outer_div_template_is_not_mutated(page):
+    """Rendering must leave the class-level outer_div_type untouched."""
+    page(1, FakeModel('employee'))
+    page(2, FakeModel('team'))
+
+    assert Page.outer_div_type.children == ()
+    assert Page.outer_div_type.attrs == {'class': 'grid'}
+
+
+def test_dropdown_label_is_per_render():
+    """The dropdown label follows the model without changing the instance."""
+    dropdown = ModelDropdown(label="default")
+
+    html = to_xml(dropdown(1, FakeModel('team')))
+
+    assert '>team</label>' in html
+    assert dropdown.label == "default"
+
+
+def test_repeated_renders_are_identical(page):
+    """Rendering the same entity twice produces the same markup."""
+    model = FakeModel('employee')
+
+    assert render(page, 3, model) == render(page, 3, model)
+
+
+def test_concurrent_renders_do_not_share_state(page):
+    """Stress a shared component tree from many threads at once.
+
+    Every render is compared against the output of a single-threaded
+    render for the same inputs, so any state leaking between requests
+    (labels, children, selected options) shows up as a mismatch.
+    """
+    models = {name: FakeModel(name, size=20) for name in ('employee', 'team')}
+    jobs = [(i % 20 + 1, name) for i in range(400) for name in models]
+
+    expected = {
+        (entity_id, name): render(page, entity_id, models[name])
+        for entity_id, name in set(jobs)
+    }
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(
+            lambda job: (job, render(page, job[0], models[job[1]])),
+            jobs,
+        ))
+
+    for job, html in results:
+        assert html == expected[job]
+
+
+def test_concurrent_chart_renders_match_serial():
+    """Charts rendered from several threads match their serial output."""
+    chart = Bars()
+    model = FakeModel('employee', size=8)
+    ids = list(range(1, 9))
+
+    expected = {i: to_xml(chart(i, model)) for i in ids}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: (i, to_xml(chart(i, model))), ids * 5))
+
+    for entity_id, html in results:
+        assert html == expected[entity_id]
+
+
+def test_template_renders_match_new_figures():
+    """Updating a reused template draws the same image as a new figure."""
+    chart, template_chart = Bars(), TemplateBars()
+    model = FakeModel('employee', size=8)
+
+    for entity_id in [3, 8, 1, 3]:
+        assert to_xml(template_chart(entity_id, model)) == to_xml(chart(entity_id, model))
+    assert template_chart.templates_created == 1
+
+
+def test_templates_are_per_thread():
+    """Each thread updates its own template, so concurrent renders match serial ones."""
+    chart = TemplateBars()
+    model = FakeModel('employee', size=8)
+    ids = list(range(1, 9))
+
+    expected = {i: to_xml(chart(i, model)) for i in ids}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda i: (i, to_xml(chart(i, model))), ids * 5))
+
+    for entity_id, html in results:
+        assert html == expected[entity_id]
+    # The main thread and at most four pool threads
+    assert chart.templates_created <= 5
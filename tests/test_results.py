@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+import pytest
+
+from employee_events import (ConnectionFactory, Employee, ShardRouter, SnapshotEngine, Team, add_query_listener,
+                             remove_query_listener, split_database)
+from employee_events.results import record_type, structured_array
+
+
+def test_records_have_slots_and_compare_by_value():
+    Row = record_type(('positive_events', 'negative_events'))
+    row = Row(23, 23)
+
+    assert (row.positive_events, row.negative_events) == (23, 23)
+    assert tuple(row) == (23, 23)
+    assert row == Row(23, 23)
+    assert not hasattr(row, '__dict__')
+    assert record_type(('positive_events', 'negative_events')) is Row
+
+
+def test_structured_array_types():
+    array = structured_array([(1, None, 'a'), (2, 1.5, 'b')], ['id', 'score', 'name'])
+
+    assert array.dtype['id'] == np.int64
+    assert array.dtype['score'] == np.float64
+    assert array.dtype['name'] == object
+    assert math.isnan(array['score'][0])
+
+
+@pytest.mark.parametrize('model', [Employee, Team])
+@pytest.mark.parametrize('snapshot', [False, True])
+def test_result_modes_hold_the_same_rows(small_db, model, snapshot):
+    model = model(small_db, snapshot=SnapshotEngine(path=small_db) if snapshot else None)
+
+    for method in (model.model_data, model.notes, model.event_counts):
+        frame = method(1)
+        rows = [tuple(row) for row in frame.itertuples(index=False)]
+
+        assert method(1, result='tuples') == rows
+        assert [tuple(record) for record in method(1, result='records')] == rows
+        array = method(1, result='array')
+        assert list(array.dtype.names) == frame.columns.tolist()
+        assert array.tolist() == rows
+
+
+def test_unknown_result_mode(small_db):
+    with pytest.raises(ValueError):
+        Employee(small_db).model_data(1, result='dict')
+
+
+def test_failed_queries_return_empty_results(tmp_path):
+    employee = Employee(tmp_path / 'empty.db')
+
+    assert employee.model_data(1, result='tuples') == []
+    assert len(employee.model_data(1, result='array')) == 0
+
+
+def test_listeners_name_the_calling_method(small_db):
+    names = []
+    listener = lambda event: names.append(event.name)
+    add_query_listener(listener)
+    try:
+        employee = Employee(small_db)
+        employee.model_data(1, result='records')
+        employee.model_data(1)
+        employee.names()
+    finally:
+        remove_query_listener(listener)
+
+    assert names == ['Employee.model_data', 'Employee.model_data', 'Employee.names']
+
+
+def test_listeners_name_routed_and_streamed_queries(small_db, tmp_path):
+    split_database(small_db, tmp_path / 'shards')
+    employee = Employee(router=ShardRouter.from_directory(tmp_path / 'shards'))
+    names = []
+    listener = lambda event: names.append(event.name)
+    add_query_listener(listener)
+    try:
+        employee.username(3)
+        list(employee.all_model_data())
+        employee.on_shard(ConnectionFactory(small_db)).query('SELECT 1', name='Employee.ping')
+    finally:
+        remove_query_listener(listener)
+
+    # The routing wrapper and the shard threads do not change the names
+    assert names[0] == 'Employee.username'
+    assert names[1:-1] == ['Employee.all_model_data'] * 2
+    assert names[-1] == 'Employee.ping'
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+
+import dashboard
+from employee_events import ConnectionFactory, Employee, Team
+from risk_export import export_lines, score
+
+
+class ShareOfPositive:
+    """Predicts the share of positive events as the risk."""
+    feature_names_in_ = np.array(['positive_events', 'negative_events'])
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        total = X[:, 0] + X[:, 1]
+        # No events is no risk
+        risk = np.divide(X[:, 0], total, out=np.zeros(len(X)), where=total > 0)
+        return np.column_stack([1 - risk, risk])
+
+
+def test_score_employees_then_their_team(small_db):
+    predictor = ShareOfPositive()
+
+    rows = list(score(predictor, ConnectionFactory(small_db)))
+
+    assert [(row['type'], row['id']) for row in rows] == [
+        ('employee', 1), ('employee', 2), ('team', 1), ('employee', 3), ('team', 2),
+    ]
+    assert rows[0] == {'type': 'employee', 'id': 1, 'name': 'Ada Lovelace', 'team_id': 1,
+                       'positive_events': 23, 'negative_events': 23, 'risk': 0.5}
+    assert rows[2]['risk'] == pytest.approx(0.75)
+    assert (rows[2]['name'], rows[2]['positive_events']) == ('Alpha Team', 69)
+    # Employee 3 has no events, and is scored with counts of 0
+    assert rows[3] == {'type': 'employee', 'id': 3, 'name': 'Grace Hopper', 'team_id': 2,
+                       'positive_events': 0, 'negative_events': 0, 'risk': 0.0}
+    assert (rows[4]['name'], rows[4]['positive_events'], rows[4]['risk']) == ('Bravo Team', 0, 0.0)
+    assert predictor.calls == [3]
+
+
+def test_teams_span_chunks(small_db):
+    predictor = ShareOfPositive()
+
+    rows = list(score(predictor, ConnectionFactory(small_db), chunk_size=1))
+
+    assert rows[2]['risk'] == pytest.approx(0.75)
+    assert predictor.calls == [1, 1, 1]
+
+
+def test_formats(small_db):
+    factory = ConnectionFactory(small_db)
+
+    lines = list(export_lines(ShareOfPositive(), 'csv', factory))
+    records = list(csv.DictReader(io.StringIO(''.join(lines))))
+    assert len(lines) == 6
+    assert records[1]['name'] == 'Alan Turing' and float(records[1]['risk']) == 1.0
+
+    lines = list(export_lines(ShareOfPositive(), 'jsonl', factory))
+    assert json.loads(lines[-1])['type'] == 'team'
+
+    with pytest.raises(ValueError):
+        export_lines(ShareOfPositive(), 'xml', factory)
+
+
+def test_matches_the_bar_chart():
+    """The export predicts the same risks as the dashboard, one entity at a time."""
+    chart = dashboard.BarChart()
+    rows = {(row['type'], row['id']): row['risk'] for row in score(dashboard.BarChart.predictor)}
+
+    for name, model in (('employee', Employee()), ('team', Team())):
+        for id in (1, 2, 3):
+            assert rows[name, id] == pytest.approx(chart.risk(id, model))
+
+
+def test_export_route():
+    client = TestClient(dashboard.app)
+
+    response = client.get('/export/risk.jsonl')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row['type'] for row in rows} == {'employee', 'team'}
+
+    assert client.get('/export/risk.csv').text.startswith('type,id,name,team_id')
+    assert client.get('/export/risk.xml').status_code == 404
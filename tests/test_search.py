@@ -0,0 +1,133 @@
+import pytest
+from sqlite3 import connect
+from starlette.testclient import TestClient
+
+import dashboard
+from employee_events import ConnectionFactory, Employee, EventWriter, Team, create_notes_index
+from employee_events.search import add_note_ids, match_expression
+
+
+@pytest.fixture
+def db(small_db):
+    """The small database with the notes search index."""
+    conn = connect(small_db)
+    create_notes_index(conn)
+    conn.close()
+    return small_db
+
+
+def search(db, query, model=Employee, **kwargs):
+    return model(connection_factory=ConnectionFactory(db)).search_notes(query, result='records', **kwargs)
+
+
+def test_match_expression_quotes_every_word():
+    assert match_expression('safety brief*') == '"safety" "brief"*'
+    assert match_expression('"NEAR( OR') == '"""NEAR(" "OR"'
+    assert match_expression(' * ') == ''
+
+
+def test_search_ranks_and_highlights(db):
+    rows = search(db, 'train')
+
+    # Stemming matches "Trained"
+    assert [(row.employee_id, row.full_name, row.team_name) for row in rows] == [(2, 'Alan Turing', 'Alpha Team')]
+    assert rows[0].snippet == '[Trained] two new hires on the packing line'
+    assert search(db, 'conveyor', highlight=('<', '>'))[0].snippet == 'Fixed the <conveyor> belt before the morning shift'
+
+
+def test_search_scope_and_paging(db):
+    assert {row.employee_id for row in search(db, 'the')} == {1, 2, 3}
+    assert {row.employee_id for row in search(db, 'the', Team, scope=1)} == {1, 2}
+    assert [row.employee_id for row in search(db, 'the', scope=3)] == [3]
+
+    everything = search(db, 'the')
+    assert search(db, 'the', limit=2) + search(db, 'the', limit=2, offset=2) == everything
+
+
+def test_queries_without_words_match_nothing(db):
+    assert search(db, '') == []
+    assert search(db, 'AND OR NOT') == []
+
+
+def test_index_follows_note_writes(db):
+    with EventWriter(db) as writer:
+        writer.append_notes([(3, 2, 'Led the forklift safety drill', '2024-02-01')])
+    assert sorted(row.note_date for row in search(db, 'safety')) == ['2024-01-15', '2024-02-01']
+
+    conn = connect(db)
+    with conn:
+        conn.execute("UPDATE notes SET note = 'Attended the briefing' WHERE note LIKE 'Missed%'")
+        conn.execute("DELETE FROM notes WHERE note LIKE 'Led%'")
+    conn.close()
+
+    assert search(db, 'safety') == []
+    assert [row.employee_id for row in search(db, 'attended')] == [3]
+
+
+def test_index_survives_vacuum(db):
+    conn = connect(db)
+    with conn:
+        conn.execute("DELETE FROM notes WHERE note LIKE 'Fixed%'")
+    conn.execute("VACUUM")
+    conn.close()
+
+    rows = search(db, 'the')
+    assert [(row.employee_id, row.note_date) for row in rows] == [(3, '2024-01-15'), (2, '2024-01-10')]
+    assert search(db, 'safety')[0].snippet == 'Missed the [safety] briefing'
+
+
+def test_notes_get_explicit_ids(small_db):
+    """Notes of older databases keep their rowids, columns and indexes as ids."""
+    conn = connect(small_db)
+    conn.execute("CREATE INDEX notes_employee ON notes (employee_id, note_date)")
+    conn.execute("DELETE FROM notes WHERE employee_id = 1")
+    conn.commit()
+    before = conn.execute("SELECT rowid, * FROM notes").fetchall()
+
+    assert add_note_ids(conn) is False
+    assert add_note_ids(conn) is False
+    assert conn.execute("SELECT * FROM notes").fetchall() == before == [
+        (2, 1, 2, 1, 'Trained two new hires on the packing line', '2024-01-10'),
+        (3, 2, 3, 2, 'Missed the safety briefing', '2024-01-15'),
+    ]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('notes_employee',)]
+    conn.close()
+
+    with EventWriter(small_db) as writer:
+        writer.append_notes([(1, 1, 'Led the forklift safety drill', '2024-02-01')])
+    conn = connect(small_db)
+    assert conn.execute("SELECT MAX(note_id) FROM notes").fetchone() == (4,)
+    conn.close()
+
+
+def test_writer_rekeys_an_index_on_implicit_rowids(small_db):
+    conn = connect(small_db)
+    conn.executescript("""
+        CREATE VIRTUAL TABLE notes_fts USING fts5(note, content='notes', content_rowid='rowid');
+        INSERT INTO notes_fts (notes_fts) VALUES ('rebuild');
+    """)
+    conn.close()
+
+    with EventWriter(small_db) as writer:
+        writer.append_notes([(1, 1, 'Led the forklift safety drill', '2024-02-01')])
+    sql = connect(small_db).execute("SELECT sql FROM sqlite_master WHERE name = 'notes_fts'").fetchone()[0]
+    assert "content_rowid='note_id'" in sql
+    assert sorted(row.note_date for row in search(small_db, 'safety')) == ['2024-01-15', '2024-02-01']
+
+
+def test_like_fallback_without_index(small_db):
+    rows = search(small_db, 'the')
+
+    assert [row.note_date for row in rows] == ['2024-01-15', '2024-01-10', '2024-01-03']
+    assert search(small_db, '100%') == []
+
+
+def test_search_route():
+    client = TestClient(dashboard.app)
+
+    response = client.get('/search', params={'q': 'train*'})
+    assert response.status_code == 200
+    assert '<mark>' in response.text
+
+    response = client.get('/search', params={'q': '<b>train</b>'})
+    assert '<b>train</b>' not in response.text
@@ -0,0 +1,155 @@
+import json
+import os
+import pickle
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from pathlib import Path
+from urllib.request import urlopen
+
+project_root = Path(__file__).resolve().parent.parent
+
+
+class Server:
+    """A running server.py process, its base URL and its output."""
+
+    def __init__(self, proc, model_path):
+        self.proc = proc
+        self.model_path = model_path
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read_output, daemon=True).start()
+        match = self.wait_for(r'Serving on (http://[\d.]+:\d+) .*\(workers ([\d ]+)\)')
+        self.url = match.group(1)
+        self.pids = parse_pids(match.group(2))
+
+    def read_output(self):
+        for line in self.proc.stdout:
+            self.lines.put(line)
+
+    def wait_for(self, pattern, timeout=60):
+        """The match of the first output line matching `pattern`."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise AssertionError(f"server.py printed nothing matching {pattern!r}")
+            match = re.search(pattern, line)
+            if match:
+                return match
+
+
+def parse_pids(text):
+    return {int(pid) for pid in text.split()}
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Start the pre-forking server with two workers on a free port.
+
+    The server loads its predictor from a copy of the model in `tmp_path`,
+    so a test can replace it.
+
+    Yields:
+        Server: The running server
+    """
+    model_path = tmp_path / 'model.pkl'
+    shutil.copy(project_root / 'assets' / 'model.pkl', model_path)
+    env = dict(os.environ, DASHBOARD_MODEL=str(model_path))
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(project_root / 'python-package'), env.get('PYTHONPATH')])
+    )
+    proc = subprocess.Popen(
+        [sys.executable, 'server.py', '--port', '0', '--workers', '2', '--threads', '2'],
+        cwd=project_root / 'report',
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    try:
+        yield Server(proc, model_path)
+    finally:
+        if proc.poll() is None:
+            # SIGTERM, so the master stops its workers before exiting
+            proc.terminate()
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+
+def get(url):
+    with urlopen(url, timeout=30) as response:
+        return response.status
+
+
+def risks(url):
+    """The risk of every employee and team served by the export route."""
+    with urlopen(f"{url}/export/risk.jsonl", timeout=30) as response:
+        return {(row['type'], row['id']): row['risk'] for row in map(json.loads, response)}
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def constant_model(risk):
+    """A predictor giving everyone the same `risk`, with the served features."""
+    import pandas as pd
+    from sklearn.dummy import DummyClassifier
+
+    features = pd.DataFrame({'positive_events': [0] * 4, 'negative_events': [0] * 4})
+    labels = [1] * round(4 * risk) + [0] * (4 - round(4 * risk))
+    return DummyClassifier(strategy='prior').fit(features, labels)
+
+
+def test_workers_serve_requests(server):
+    """Both employee and team pages render through the forked workers."""
+    assert get(f"{server.url}/employee/1") == 200
+    assert get(f"{server.url}/team/1") == 200
+
+
+def test_graceful_reload_and_shutdown(server):
+    """SIGHUP replaces the workers and the predictor without an outage, and SIGTERM exits cleanly."""
+    url = server.url
+    assert get(f"{url}/employee/1") == 200
+    before = risks(url)
+    assert set(before.values()) != {0.75}
+
+    partial = server.model_path.with_suffix('.partial')
+    partial.write_bytes(pickle.dumps(constant_model(0.75)))
+    os.replace(partial, server.model_path)
+    server.proc.send_signal(signal.SIGHUP)
+
+    match = server.wait_for(r'Reloaded: workers ([\d ]+) replace ([\d ]+)')
+    new, old = parse_pids(match.group(1)), parse_pids(match.group(2))
+    assert old == server.pids
+    assert len(new) == 2 and not new & old
+
+    # Requests keep succeeding while the old workers finish and exit
+    deadline = time.monotonic() + 60
+    while any(map(running, old)) and time.monotonic() < deadline:
+        assert get(f"{url}/employee/2") == 200
+    assert not any(map(running, old))
+    assert all(map(running, new))
+
+    # Only the new workers are left, serving the reloaded predictor
+    after = risks(url)
+    assert after.keys() == before.keys()
+    assert set(after.values()) == {0.75}
+
+    server.proc.send_signal(signal.SIGTERM)
+    assert server.proc.wait(timeout=60) == 0
+    assert not any(map(running, new))
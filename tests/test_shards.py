@@ -0,0 +1,142 @@
+import threading
+from sqlite3 import connect
+
+import pytest
+
+from employee_events import (ConnectionFactory, Employee, EventWriter,
+                             ShardRouter, Team, build_shard,
+                             create_notes_index, split_database)
+from employee_events.shards import shard_path
+from risk_export import score
+from test_risk_export import ShareOfPositive
+
+
+@pytest.fixture
+def layout(small_db, tmp_path):
+    """The small database, searchable, and split into one shard per team."""
+    conn = connect(small_db)
+    create_notes_index(conn)
+    conn.close()
+    split_database(small_db, tmp_path / 'shards')
+    return small_db, ShardRouter.from_directory(tmp_path / 'shards')
+
+
+def models(db, router, model):
+    return (model(connection_factory=ConnectionFactory(db)),
+            model(router=router))
+
+
+def test_split_by_team(layout, tmp_path):
+    _, router = layout
+
+    shards = sorted(path.name for path in (tmp_path / 'shards').iterdir())
+    assert shards == ['team_1-1.db', 'team_2-2.db']
+    assert router.ranges == [(1, 1), (2, 2)]
+    assert router.team_shard(2) is router.factories[1]
+    assert router.employee_shard(3) is router.factories[1]
+    assert router.team_shard(3) is None and router.employee_shard(4) is None
+    assert {'team_daily_events', 'notes_fts'} <= set(router.preload())
+
+
+@pytest.mark.parametrize('model', [Employee, Team])
+def test_routed_queries_match_one_database(layout, model):
+    single, sharded = models(*layout, model)
+
+    assert sharded.names() == single.names()
+    for id in (1, 2, 3, 99):
+        assert sharded.username(id) == single.username(id)
+        for query in ('model_data', 'notes'):
+            assert (getattr(sharded, query)(id, result='tuples')
+                    == getattr(single, query)(id, result='tuples'))
+        for options in ({}, {'bucket': 'week', 'cumulative': True}):
+            assert (sharded.event_counts(id, result='tuples', **options)
+                    == single.event_counts(id, result='tuples', **options))
+
+
+def test_search_merges_shards(layout):
+    single, sharded = models(*layout, Employee)
+
+    def search(model, query, **kwargs):
+        return model.search_notes(query, result='tuples', **kwargs)
+
+    matches = sharded.search_notes('the', result='records')
+    assert {row.employee_id for row in matches} == {1, 2, 3}
+    # Ranks come from each shard's own word frequencies
+    assert ([row[:6] for row in search(sharded, 'safety')]
+            == [row[:6] for row in search(single, 'safety')])
+    matches = sharded.search_notes('the', scope=3, result='records')
+    assert [row.employee_id for row in matches] == [3]
+
+    everything = search(sharded, 'the')
+    assert (search(sharded, 'the', limit=2)
+            + search(sharded, 'the', limit=2, offset=2)) == everything
+
+
+def test_bulk_risk_matches_one_database(layout):
+    db, router = layout
+
+    expected = list(score(ShareOfPositive(), ConnectionFactory(db)))
+    scores = score(ShareOfPositive(), router=router, chunk_size=1)
+    assert list(scores) == expected
+
+
+def test_rebuild_one_shard(layout):
+    db, router = layout
+    assert router.employee_shard(4) is None
+    with EventWriter(db) as writer:
+        writer.append_events([('2024-02-01', 3, 2, 5, 0)])
+    conn = connect(db)
+    with conn:
+        conn.execute(
+            "INSERT INTO employee VALUES (3, 4, 'Edsger', 'Dijkstra', 2)")
+    conn.close()
+
+    before = router.factories[0].path.read_bytes()
+    build_shard(db, shard_path(router.factories[1].path.parent, 2, 2), 2, 2)
+
+    assert router.factories[0].path.read_bytes() == before
+    model_data = Employee(router=router).model_data(3, result='tuples')
+    assert model_data == [(5, 0)]
+    # The directory of employees is reread for ids added since
+    assert router.employee_shard(4) is router.factories[1]
+
+
+def test_router_rejects_overlapping_shards(small_db):
+    factory = ConnectionFactory(small_db)
+    with pytest.raises(ValueError, match='overlap'):
+        ShardRouter({(1, 5): factory, (5, 9): factory})
+    with pytest.raises(ValueError, match='Snapshots'):
+        Employee(router=ShardRouter({(1, 1): factory}), snapshot=object())
+
+
+def test_chain_reads_ahead_and_stops_when_closed(small_db):
+    shards = {(i, i): ConnectionFactory(small_db) for i in range(4)}
+    router = ShardRouter(shards, max_workers=2)
+    started = []
+
+    def count(factory):
+        started.append(factory)
+        yield from range(100)
+
+    chain = router.chain(count, prefetch=1)
+    assert [next(chain) for _ in range(3)] == [0, 1, 2]
+    chain.close()
+
+    assert len(started) <= 2
+    assert threading.active_count() < 5
+
+    chained = router.chain(lambda factory: iter([factory]))
+    assert list(chained) == router.factories
+
+
+def test_chain_raises_shard_errors(small_db):
+    router = ShardRouter({(1, 1): ConnectionFactory(small_db),
+                          (2, 2): ConnectionFactory(small_db)})
+
+    def fail(factory):
+        if factory is router.factories[1]:
+            raise RuntimeError('shard is gone')
+        yield 1
+
+    with pytest.raises(RuntimeError, match='shard is gone'):
+        list(router.chain(fail))
@@ -0,0 +1,106 @@
+from sqlite3 import connect
+
+import pytest
+
+from employee_events import (Employee, EventWriter, Snapshot, SnapshotEngine,
+                             Team, add_query_listener, remove_query_listener)
+
+
+@pytest.fixture
+def engine(small_db):
+    return SnapshotEngine(path=small_db, check_interval=0)
+
+
+@pytest.fixture(params=[Employee, Team])
+def models(request, small_db, engine):
+    """The same model answering through SQL and through the snapshot."""
+    return request.param(small_db), request.param(small_db, snapshot=engine)
+
+
+def assert_same(sql, snapshot):
+    assert snapshot.columns.tolist() == sql.columns.tolist()
+    assert snapshot.values.tolist() == sql.values.tolist()
+
+
+@pytest.mark.parametrize('bucket', ['day', 'week', 'month'])
+@pytest.mark.parametrize('cumulative', [False, True])
+@pytest.mark.parametrize('start,end', [
+    (None, None),
+    ('2024-01-10', None),
+    (None, '2024-01-17'),
+    ('2024-01-09', '2024-01-24'),
+])
+def test_event_counts_match_sql(models, bucket, cumulative, start, end):
+    sql, snapshot = models
+    for id in (1, 2, 3, 99):
+        kwargs = dict(start=start, end=end, bucket=bucket,
+                      cumulative=cumulative)
+        assert_same(sql.event_counts(id, **kwargs),
+                    snapshot.event_counts(id, **kwargs))
+
+
+def test_model_data_and_notes_match_sql(models):
+    sql, snapshot = models
+    for id in (1, 2, 3):
+        assert_same(sql.model_data(id), snapshot.model_data(id))
+        assert_same(sql.notes(id), snapshot.notes(id))
+
+
+def test_last_event_date_matches_sql_without_queries(models):
+    sql, snapshot = models
+    snapshot.snapshot.current()
+    queries = []
+    add_query_listener(queries.append)
+    try:
+        dates = [snapshot.last_event_date(id) for id in (1, 2, 3, 99)]
+    finally:
+        remove_query_listener(queries.append)
+
+    assert dates == [sql.last_event_date(id) for id in (1, 2, 3, 99)]
+    assert queries == []
+
+
+def test_load_in_chunks(small_db):
+    conn = connect(small_db)
+    try:
+        whole = Snapshot.load(conn)
+        chunked = Snapshot.load(conn, chunk_size=7)
+    finally:
+        conn.close()
+
+    for name in ('employee', 'team'):
+        for id in (1, 2, 3):
+            assert_same(whole.event_counts(name, id),
+                        chunked.event_counts(name, id))
+            assert_same(whole.notes(name, id), chunked.notes(name, id))
+
+
+def test_unknown_employee_model_data_is_null(small_db, engine):
+    df = Employee(small_db, snapshot=engine).model_data(99)
+
+    assert df.isna().all().all() and len(df) == 1
+
+
+def test_snapshot_reloads_when_the_database_changes(small_db, engine):
+    team = Team(small_db, snapshot=engine)
+    first = engine.current()
+    assert team.model_data(1).positive_events.sum() == 69
+
+    with EventWriter(small_db) as writer:
+        writer.append_events([('2024-02-01', 3, 1, 5, 0)])
+
+    assert team.model_data(1).positive_events.tolist() == [23, 46, 5]
+    assert engine.current() is not first
+
+
+def test_snapshot_is_reused_between_checks(small_db):
+    engine = SnapshotEngine(path=small_db, check_interval=60)
+    first = engine.current()
+
+    with EventWriter(small_db) as writer:
+        writer.append_events([('2024-02-01', 3, 2, 5, 0)])
+
+    assert engine.current() is first
+    assert engine.reload() is not first
+    model_data = engine.current().model_data('employee', 3)
+    assert model_data.positive_events.tolist() == [5]
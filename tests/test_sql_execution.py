@@ -0,0 +1,85 @@
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from employee_events import ConnectionFactory, Employee, ReadOnlyConnectionFactory
+
+
+def test_read_only_connections_reject_writes(small_db):
+    conn = ReadOnlyConnectionFactory(small_db)()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM employee")
+    finally:
+        conn.close()
+
+
+def test_read_only_connections_are_configured(small_db):
+    factory = ReadOnlyConnectionFactory(small_db, mmap_size=2**20, cache_size=2**20)
+    conn = factory()
+    try:
+        pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                   for name in ['mmap_size', 'cache_size', 'temp_store', 'query_only']}
+    finally:
+        conn.close()
+
+    assert pragmas == {'mmap_size': 2**20, 'cache_size': -1024, 'temp_store': 2, 'query_only': 1}
+
+
+def test_immutable_uri(small_db):
+    assert ReadOnlyConnectionFactory(small_db).uri.endswith('?mode=ro')
+    assert ReadOnlyConnectionFactory(small_db, immutable=True).uri.endswith('?mode=ro&immutable=1')
+
+
+def test_read_only_factory_never_creates_the_database(tmp_path):
+    factory = ReadOnlyConnectionFactory(tmp_path / 'missing.db')
+
+    with pytest.raises(sqlite3.OperationalError):
+        factory()
+    assert not (tmp_path / 'missing.db').exists()
+
+
+@pytest.mark.parametrize('immutable', [False, True])
+def test_read_only_queries_match_default(small_db, immutable):
+    default = Employee(connection_factory=ConnectionFactory(small_db))
+    read_only = Employee(connection_factory=ReadOnlyConnectionFactory(small_db, immutable=immutable))
+
+    assert read_only.names() == default.names()
+    assert read_only.event_counts(1).equals(default.event_counts(1))
+
+
+def test_read_only_connections_are_reused_per_thread(small_db):
+    factory = ReadOnlyConnectionFactory(small_db)
+
+    def connections():
+        with factory.connection() as first, factory.connection() as second:
+            return first, second
+
+    first, second = connections()
+    assert first is second
+    with ThreadPoolExecutor(1) as pool:
+        other, _ = pool.submit(connections).result()
+    assert other is not first
+
+    with ReadOnlyConnectionFactory(small_db, reuse=False).connection() as conn:
+        pass
+    with pytest.raises(sqlite3.ProgrammingError, match='closed'):
+        conn.execute("SELECT 1")
+
+
+def test_reused_connection_follows_a_replaced_file(small_db, tmp_path):
+    employee = Employee(connection_factory=ReadOnlyConnectionFactory(small_db))
+    assert employee.username(3)
+
+    rebuilt = tmp_path / 'rebuilt.db'
+    shutil.copy(small_db, rebuilt)
+    conn = sqlite3.connect(rebuilt)
+    with conn:
+        conn.execute("DELETE FROM employee WHERE employee_id = 3")
+    conn.close()
+    os.replace(rebuilt, small_db)
+
+    assert employee.username(3) == []
@@ -0,0 +1,77 @@
+import pytest
+from sqlite3 import connect
+
+from employee_events import Team, create_team_timelines
+
+
+@pytest.fixture
+def conn(small_db):
+    """A connection to the small database with team timelines created."""
+    conn = connect(small_db)
+    create_team_timelines(conn)
+    yield conn
+    conn.close()
+
+
+def timeline(conn, team_id):
+    return conn.execute(
+        "SELECT event_date, positive_events, negative_events FROM team_daily_events "
+        "WHERE team_id = ? ORDER BY event_date", (team_id,)
+    ).fetchall()
+
+
+def aggregated(conn, team_id):
+    return conn.execute(
+        "SELECT event_date, SUM(positive_events), SUM(negative_events) FROM employee_events "
+        "WHERE team_id = ? GROUP BY event_date ORDER BY event_date", (team_id,)
+    ).fetchall()
+
+
+def test_backfill_matches_member_events(conn):
+    assert timeline(conn, 1) == aggregated(conn, 1)
+    assert timeline(conn, 1)[0] == ('2024-01-01', 3, 1)
+
+
+def test_inserts_update_the_timeline(conn):
+    with conn:
+        conn.execute("INSERT INTO employee_events VALUES (100, '2024-01-01', 1, 1, 5, 2)")
+        conn.execute("INSERT INTO employee_events VALUES (101, '2024-02-01', 3, 2, 1, 1)")
+
+    assert timeline(conn, 1)[0] == ('2024-01-01', 8, 3)
+    assert timeline(conn, 2) == [('2024-02-01', 1, 1)]
+
+
+def test_updates_and_deletes_update_the_timeline(conn):
+    with conn:
+        conn.execute("UPDATE employee_events SET positive_events = 10 WHERE employee_id = 2 AND event_date = '2024-01-02'")
+        conn.execute("DELETE FROM employee_events WHERE employee_id = 1 AND event_date = '2024-01-03'")
+
+    assert timeline(conn, 1) == aggregated(conn, 1)
+
+
+def test_team_event_counts_use_the_timeline(small_db, conn):
+    """Team.event_counts reads team_daily_events once it exists."""
+    team = Team(small_db)
+
+    assert team.event_source()[0] == 'team_daily_events'
+    assert team.event_counts(1, bucket='month', cumulative=True).positive_events.tolist() == [69]
+
+
+def test_team_event_counts_fall_back_without_timeline(small_db):
+    """Databases without team_daily_events aggregate member events."""
+    team = Team(small_db)
+
+    assert team.event_source()[0] != 'team_daily_events'
+    assert team.event_counts(1).positive_events.sum() == 69
+
+
+def test_timeline_is_used_once_created_while_serving(small_db):
+    """The factory's table list is reread when the database changes."""
+    team = Team(small_db)
+    assert team.event_source()[0] != 'team_daily_events'
+
+    conn = connect(small_db)
+    create_team_timelines(conn)
+    conn.close()
+
+    assert team.event_source()[0] == 'team_daily_events'
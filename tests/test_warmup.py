@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from base_components import BaseComponent
+from caching import VersionedCache
+from warmup import parse_args, read_paths, warm
+
+
+def test_cache_evicts_least_recently_used():
+    cache = VersionedCache(maxsize=2)
+    cache.get('a', lambda: 1)
+    cache.get('b', lambda: 2)
+    cache.get('a', lambda: None)
+    cache.get('c', lambda: 3)
+
+    assert list(cache.entries) == ['a', 'c']
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_cache_empties_when_the_version_changes():
+    version = [1]
+    cache = VersionedCache(version=lambda: version[0], check_interval=0)
+    cache.get('a', lambda: 'old')
+
+    version[0] = 2
+
+    assert cache.get('a', lambda: 'new') == 'new'
+
+
+def test_values_computed_across_a_version_change_are_not_stored():
+    version = [1]
+    cache = VersionedCache(version=lambda: version[0], check_interval=0)
+
+    def compute():
+        version[0] = 2
+        cache.current_version()
+        return 'stale'
+
+    assert cache.get('a', compute) == 'stale'
+    assert len(cache) == 0
+
+
+def test_components_render_once_per_cached_key():
+    renders = []
+
+    class Counted(BaseComponent):
+        cache = VersionedCache()
+
+        def build_component(self, entity_id, model):
+            renders.append(entity_id)
+            return entity_id
+
+    class Model:
+        name = 'employee'
+
+    component = Counted()
+    rendered = [component(1, Model()), component(1, Model()),
+                component(2, Model())]
+    assert rendered == [1, 1, 2]
+    assert renders == [1, 2]
+
+
+def test_warm_bounds_concurrency_and_reports_progress():
+    running, peak, lock = [0], [0], threading.Lock()
+    progress = []
+
+    def render(path):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        if path == '/team/1':
+            raise RuntimeError('boom')
+
+    paths = [f'/employee/{i}' for i in range(12)] + ['/team/1']
+    stats = warm(paths, render, concurrency=3,
+                 progress=lambda *args: progress.append(args))
+
+    assert peak[0] == 3
+    assert (stats['warmed'], stats['failed'], stats['skipped']) == (12, 1, 0)
+    assert [args[0] for args in progress] == list(range(1, 14))
+    assert all(args[1] == 13 for args in progress)
+
+
+def test_warm_stops_starting_renders_after_the_budget():
+    paths = [f'/employee/{i}' for i in range(20)]
+    stats = warm(paths, lambda path: time.sleep(0.05), concurrency=1,
+                 budget=0.12, progress=None)
+
+    assert 1 <= stats['warmed'] <= 4
+    assert stats['skipped'] == 20 - stats['warmed']
+
+
+def test_read_paths(tmp_path):
+    recent = tmp_path / 'recent.txt'
+    recent.write_text('/team/2\n\n/employee/7\n/team/2\n/update_dropdown\n')
+
+    assert read_paths(recent) == ['/team/2', '/employee/7']
+
+
+def test_command_line_warms_a_running_server():
+    # Caches are per process, so warming the command's own would be lost
+    with pytest.raises(SystemExit):
+        parse_args(['--recent', 'recent.txt'])
+    assert parse_args(['--url', 'http://127.0.0.1:5001']).url